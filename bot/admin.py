@@ -5,7 +5,9 @@ from django.contrib.auth.hashers import make_password
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 
-from .models import Book, StudentTask, ReadingSubmission, CustomUser
+from .models import Book, StudentTask, ReadingSubmission, CustomUser, NotificationOutbox, StudentReadingStats
+from .utils.pagination import EstimatedCountPaginator
+from .utils.periods import period_label
 import os
 
 def get_unique_username(length=8, allowed_chars=None):
@@ -93,9 +95,12 @@ class CustomUserAdmin(admin.ModelAdmin):
 
 @admin.register(Book)
 class BookAdmin(admin.ModelAdmin):
-    list_display = ('title', 'month', 'uploaded_by', 'upload_date', 'book_link')
-    list_filter = ('month', 'uploaded_by')
-    search_fields = ('title', 'month')
+    list_display = ('title', 'period', 'uploaded_by', 'upload_date', 'book_link')
+    list_select_related = ('uploaded_by',)
+    list_filter = ('period', 'uploaded_by')
+    # Prefix match in any case, served by book_title_upper_idx; %term% could use no index
+    search_fields = ('title__istartswith',)
+    search_help_text = "Title prefix"
     date_hierarchy = 'upload_date'
     raw_id_fields = ('uploaded_by',)
 
@@ -110,12 +115,22 @@ class BookAdmin(admin.ModelAdmin):
     def save_model(self, request, obj, form, change):
         if not change:
             obj.uploaded_by = request.user
+        elif 'file' in form.changed_data:
+            # Replaced file: the cached Telegram copy is stale
+            obj.telegram_file_id = ''
         super().save_model(request, obj, form, change)
 
 
 @admin.register(StudentTask)
 class StudentTaskAdmin(admin.ModelAdmin):
-    list_display = ('student', 'task_name', 'submission_date', 'video_link')
+    list_display = ('student', 'task_name', 'submission_date', 'media_status', 'video_link')
+    list_select_related = ('student',)
+    list_filter = ('media_status',)
+    search_fields = ('student__username__exact',)
+    date_hierarchy = 'submission_date'
+    raw_id_fields = ('student',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def video_link(self, obj):
         if obj.video_file:
@@ -128,10 +143,18 @@ class StudentTaskAdmin(admin.ModelAdmin):
 
 @admin.register(ReadingSubmission)
 class ReadingSubmissionAdmin(admin.ModelAdmin):
-    list_display = ('student', 'get_book_title', 'get_month', 'submission_date', 'voice_preview')
+    list_display = ('student', 'get_book_title', 'get_month', 'submission_date', 'media_status', 'voice_preview')
+    list_select_related = ('student', 'book', 'custom_book')
     readonly_fields = ('voice_preview',)
-    search_fields = ('student__username', 'book__title', 'custom_book__name') # Corrected custom_book field to 'name'
-    list_filter = ('book__month', 'submission_date') # Changed 'month' to 'book__month'
+    # Exact username (unique index) and title prefixes in any case (the *_upper_idx indexes);
+    # %term% could use no index
+    search_fields = ('student__username__exact', 'book__title__istartswith', 'custom_book__name__istartswith')
+    search_help_text = "Exact username, or book title prefix"
+    list_filter = ('period', 'media_status')
+    date_hierarchy = 'submission_date'
+    raw_id_fields = ('student', 'book', 'custom_book')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def get_book_title(self, obj):
         # Corrected for custom_book to use 'name' instead of 'title'
@@ -139,24 +162,48 @@ class ReadingSubmissionAdmin(admin.ModelAdmin):
     get_book_title.short_description = "Book Title"
 
     def get_month(self, obj):
-        """Retrieves the month from the associated Book object."""
-        if obj.book:
-            return obj.book.month
-        return "N/A" # Or None, or an empty string, depending on desired display
+        if obj.period:
+            return period_label(obj.period)
+        return "N/A"
     get_month.short_description = "Month"
+    get_month.admin_order_field = 'period'
 
     def voice_preview(self, obj):
-        if obj.voice_file:
+        if obj.voice_file or obj.voice_message_id:
+            # Voices kept on Telegram are fetched when played, so nothing is loaded with the page
+            url = reverse('view_reading_voice', args=[obj.id])
             return mark_safe(f'''
-                <audio controls>
-                    <source src="{obj.voice_file.url}" type="audio/ogg">
+                <audio controls preload="none">
+                    <source src="{url}" type="audio/ogg">
                     Your browser does not support the audio element.
                 </audio>
-                <a href="{obj.voice_file.url}" download>Download</a>
-            ''')
-        elif obj.voice_message_id:
-            return mark_safe(f'''
-                <span>Telegram Voice Message ID: {obj.voice_message_id}</span>
+                <a href="{url}" download>Download</a>
             ''')
         return "No voice file"
-    voice_preview.short_description = "Voice Preview"
\ No newline at end of file
+    voice_preview.short_description = "Voice Preview"
+
+
+@admin.register(StudentReadingStats)
+class StudentReadingStatsAdmin(admin.ModelAdmin):
+    """Read-only: the rows are maintained by bot.stats and rebuilt with manage.py rebuild_reading_stats."""
+    list_display = ('student', 'period', 'books_read', 'pages_read', 'tasks_submitted', 'submission_days')
+    list_select_related = ('student',)
+    list_filter = ('period',)
+    search_fields = ('student__username__exact',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ('run_key', 'chat_id', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'run_key')
+    search_fields = ('chat_id', 'recipient__username')
+    raw_id_fields = ('recipient',)
+    readonly_fields = ('created_at', 'sent_at')
@@ -0,0 +1,31 @@
+# bot/fsm.py
+from aiogram.fsm.storage.base import BaseEventIsolation, BaseStorage
+from aiogram.fsm.storage.memory import DisabledEventIsolation, MemoryStorage
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+
+def create_fsm_storage() -> tuple[BaseStorage, BaseEventIsolation]:
+    """Build the Dispatcher's FSM storage and event isolation from BOT_FSM_STORAGE.
+
+    ``memory`` keeps conversations in the process (development only: lost on
+    restart, one process). ``redis`` shares them between bot processes and lets
+    abandoned sessions expire after BOT_FSM_STATE_TTL / BOT_FSM_DATA_TTL seconds.
+    """
+    backend = settings.BOT_FSM_STORAGE
+    if backend == 'memory':
+        return MemoryStorage(), DisabledEventIsolation()
+
+    if backend == 'redis':
+        from aiogram.fsm.storage.redis import DefaultKeyBuilder, RedisStorage
+
+        storage = RedisStorage.from_url(
+            settings.BOT_FSM_REDIS_URL,
+            key_builder=DefaultKeyBuilder(prefix='fsm'),
+            state_ttl=settings.BOT_FSM_STATE_TTL,
+            data_ttl=settings.BOT_FSM_DATA_TTL,
+        )
+        # Updates from one user are handled one at a time across all processes
+        return storage, storage.create_isolation()
+
+    raise ImproperlyConfigured(f"Unknown BOT_FSM_STORAGE {backend!r}, expected 'memory' or 'redis'")
@@ -0,0 +1,216 @@
+# bot/media_queue.py
+import asyncio
+import logging
+from datetime import timedelta
+from typing import NamedTuple
+
+from aiogram import Bot
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import ReadingSubmission, StudentTask
+from ..services.reading_service import ReadingService
+from ..services.task_service import TaskService
+from .utils import download_telegram_file
+
+logger = logging.getLogger(__name__)
+
+
+class MediaJob(NamedTuple):
+    kind: str  # 'task' or 'voice'
+    object_id: int
+    attempt: int = 0
+
+
+async def _load_task(task_id):
+    task = await StudentTask.objects.select_related('student').filter(id=task_id).afirst()
+    if task is None:
+        return None, None
+    return task, task.telegram_file_id
+
+
+async def _store_task(bot, task, download):
+    filename = f"video_{task.student.telegram_id}_{task.id}.mp4"
+    video_file = await download(bot, task.telegram_file_id, filename, content_type='video/mp4')
+    try:
+        await TaskService.save_task_video_file(task, filename, video_file)
+    finally:
+        video_file.close()
+
+
+async def _load_voice(submission_id):
+    submission = await ReadingSubmission.objects.select_related(
+        'student', 'book', 'custom_book'
+    ).filter(id=submission_id).afirst()
+    if submission is None:
+        return None, None
+    return submission, submission.voice_message_id
+
+
+async def _store_voice(bot, submission, download):
+    filename = f"{submission.id}.ogg"
+    voice_file = await download(bot, submission.voice_message_id, filename, content_type='audio/ogg')
+    try:
+        await ReadingService.save_submission_voice_file(submission, filename, voice_file)
+    finally:
+        voice_file.close()
+
+
+# kind -> (model, load the row and its Telegram file_id, download and save the file)
+MEDIA_KINDS = {
+    'task': (StudentTask, _load_task, _store_task),
+    'voice': (ReadingSubmission, _load_voice, _store_voice),
+}
+
+
+class MediaPersistenceQueue:
+    """Copies submitted videos and voices from Telegram into storage in the background.
+
+    Handlers write the row with ``media_status='pending'`` and only enqueue its id, so
+    the student gets a reply without waiting for the download. A fixed pool of workers
+    does the copying; a failed copy is retried with a growing delay and marked
+    ``failed`` after ``max_attempts``. When the queue is full ``offer`` refuses the job
+    and the handler asks the student to try again, instead of piling up downloads.
+
+    Several processes (webhook workers, a restart overlapping the old process) may
+    queue the same row, so a worker first claims it: one UPDATE moves it to
+    ``copying`` with a lease, and only the process whose UPDATE matched copies it.
+    Every ``sweep_interval`` seconds each process queues the pending rows and the
+    rows whose lease ran out, which also picks up jobs ``offer`` had to refuse.
+    """
+
+    def __init__(self, maxsize, workers, max_attempts, retry_delay, lease=600, sweep_interval=60,
+                 download=download_telegram_file):
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.worker_count = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lease = lease
+        self.sweep_interval = sweep_interval
+        self.download = download
+        self.bot = None
+        self._workers = []
+        self._sweeper = None
+        self._background = set()
+        self._queued = set()  # (kind, id) of jobs waiting in the queue, so a sweep doesn't add them twice
+
+    def full(self):
+        return self.queue.full()
+
+    def offer(self, kind, object_id):
+        """Queue the row for copying; False when the queue is full (the next sweep picks it up)."""
+        try:
+            self.queue.put_nowait(MediaJob(kind, object_id))
+        except asyncio.QueueFull:
+            logger.warning(f"Media queue full; {kind} {object_id} waits for the next sweep")
+            return False
+        self._queued.add((kind, object_id))
+        return True
+
+    async def _claim(self, model, object_id):
+        """Take the row for this worker until the lease ends; False if another worker holds it or it is done."""
+        now = timezone.now()
+        claimable = Q(media_status='pending') | Q(media_status='copying', media_lease_until__lt=now)
+        return await model.objects.filter(claimable, id=object_id).aupdate(
+            media_status='copying', media_lease_until=now + timedelta(seconds=self.lease)
+        ) == 1
+
+    async def _persist(self, job):
+        model, load, store = MEDIA_KINDS[job.kind]
+        if not await self._claim(model, job.object_id):
+            return  # deleted meanwhile, already copied, or being copied by another process
+        obj, file_id = await load(job.object_id)
+        if obj is None:
+            return
+        if not file_id:
+            await model.objects.filter(id=obj.id).aupdate(media_status='failed')
+            return
+        await store(self.bot, obj, self.download)
+
+    async def _retry_later(self, job, delay):
+        await asyncio.sleep(delay)
+        await self._put(job)  # waits for room rather than dropping the job
+
+    async def _handle_failure(self, job):
+        job = job._replace(attempt=job.attempt + 1)
+        model = MEDIA_KINDS[job.kind][0]
+        if job.attempt < self.max_attempts:
+            delay = self.retry_delay * 2 ** (job.attempt - 1)
+            # Keep the claim through the back-off; it runs out just as the retry reclaims it
+            await model.objects.filter(id=job.object_id, media_status='copying').aupdate(
+                media_lease_until=timezone.now() + timedelta(seconds=delay)
+            )
+            self._in_background(self._retry_later(job, delay))
+            return
+        logger.error(f"Giving up on storing {job.kind} {job.object_id} after {job.attempt} attempts")
+        await model.objects.filter(id=job.object_id).aupdate(media_status='failed')
+
+    def _in_background(self, coro):
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _put(self, job):
+        await self.queue.put(job)
+        self._queued.add((job.kind, job.object_id))
+
+    async def _work(self):
+        while True:
+            job = await self.queue.get()
+            self._queued.discard((job.kind, job.object_id))
+            try:
+                await self._persist(job)
+            except Exception:
+                logger.exception(f"Failed to store {job.kind} {job.object_id} (attempt {job.attempt + 1})")
+                try:
+                    await self._handle_failure(job)
+                except Exception:
+                    logger.exception(f"Failed to record the failure of {job.kind} {job.object_id}")
+            finally:
+                self.queue.task_done()
+
+    async def _requeue_unclaimed(self):
+        now = timezone.now()
+        claimable = Q(media_status='pending') | Q(media_status='copying', media_lease_until__lt=now)
+        for kind, (model, _, _) in MEDIA_KINDS.items():
+            async for object_id in model.objects.filter(claimable).values_list('id', flat=True):
+                if (kind, object_id) not in self._queued:
+                    await self._put(MediaJob(kind, object_id))
+
+    async def _sweep(self):
+        while True:
+            try:
+                await self._requeue_unclaimed()
+            except Exception:
+                logger.exception("Could not queue pending media")
+            await asyncio.sleep(self.sweep_interval)
+
+    async def start(self, bot: Bot):
+        self.bot = bot
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.worker_count)]
+        self._sweeper = asyncio.create_task(self._sweep())
+
+    async def stop(self):
+        if self._sweeper:
+            self._sweeper.cancel()
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=30)
+        except asyncio.TimeoutError:
+            logger.warning(f"Shutting down with {self.queue.qsize()} media copies still queued; they stay pending")
+        tasks = [task for task in (self._sweeper, *self._workers, *self._background) if task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+
+
+def create_media_queue():
+    return MediaPersistenceQueue(
+        maxsize=settings.BOT_MEDIA_QUEUE_SIZE,
+        workers=settings.BOT_MEDIA_WORKERS,
+        max_attempts=settings.BOT_MEDIA_MAX_ATTEMPTS,
+        retry_delay=settings.BOT_MEDIA_RETRY_DELAY,
+        lease=settings.BOT_MEDIA_LEASE,
+        sweep_interval=settings.BOT_MEDIA_SWEEP_INTERVAL,
+    )
@@ -0,0 +1,21 @@
+# bot/middlewares.py
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from ..services.user_service import UserService
+
+
+class UserMiddleware(BaseMiddleware):
+    """Resolves the CustomUser behind an update once and passes it to handlers as ``user``."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        from_user = data.get('event_from_user')
+        data['user'] = await UserService.get_user_by_telegram_id(from_user.id) if from_user else None
+        return await handler(event, data)
@@ -1,20 +1,53 @@
 # bot/utils.py
 import logging
-import io
 from aiogram import Bot
 
+from ..utils.files import ChunkSpool
+
 logger = logging.getLogger(__name__)
 
-async def download_file_from_telegram(bot: Bot, file_id: str) -> io.BytesIO:
-    """Async function to download Telegram file into BytesIO."""
+# Bot API refuses getFile for anything bigger than this
+TELEGRAM_DOWNLOAD_LIMIT = 20 * 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+DOWNLOAD_TIMEOUT = 120
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+async def stream_file_from_telegram(bot: Bot, file_id: str, chunk_size: int = DOWNLOAD_CHUNK_SIZE):
+    """Yield a Telegram file chunk by chunk without holding it in memory."""
+    file = await bot.get_file(file_id)
+    url = bot.session.api.file_url(bot.token, file.file_path)
+    async for chunk in bot.session.stream_content(url, timeout=DOWNLOAD_TIMEOUT, chunk_size=chunk_size):
+        yield chunk
+
+async def download_telegram_file(bot: Bot, file_id: str, filename: str, content_type: str = None,
+                                 max_size: int = TELEGRAM_DOWNLOAD_LIMIT):
+    """Stream a Telegram file into a temporary upload ready for FieldFile.save().
+
+    The returned file carries ``size`` and ``sha256``; the caller closes it once saved.
+    """
+    spool = ChunkSpool(filename, content_type=content_type, max_size=max_size)
     try:
-        file = await bot.get_file(file_id)
-        file_path = file.file_path
-        downloaded_bytes_io = io.BytesIO()
-        await bot.download_file(file_path, destination=downloaded_bytes_io)
-        downloaded_bytes_io.seek(0) # Reset stream position to the beginning
-        return downloaded_bytes_io
+        async for chunk in stream_file_from_telegram(bot, file_id):
+            spool.write(chunk)
     except Exception as e:
+        spool.abort()
         logger.error(f"Error downloading file from Telegram: {e}")
         raise
+    return spool.finish()
+
+async def pack_lines(lines, limit: int = TELEGRAM_MESSAGE_LIMIT):
+    """Group an async iterable of lines into message texts of at most ``limit`` characters.
 
+    Each text is yielded as soon as it is full, so the first message can go out
+    before the remaining lines have been read.
+    """
+    buffer, length = [], 0
+    async for line in lines:
+        line = line[:limit]
+        if buffer and length + 1 + len(line) > limit:
+            yield "\n".join(buffer)
+            buffer, length = [], 0
+        length += len(line) + (1 if buffer else 0)
+        buffer.append(line)
+    if buffer:
+        yield "\n".join(buffer)
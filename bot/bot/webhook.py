@@ -0,0 +1,155 @@
+# bot/webhook.py
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiogram.webhook.aiohttp_server import setup_application
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryUpdateDeduplicator:
+    """Remembers update_ids seen by this process for ``ttl`` seconds."""
+
+    def __init__(self, ttl, maxsize=10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._seen = OrderedDict()
+
+    async def first_seen(self, update_id):
+        now = time.monotonic()
+        # Entries share one TTL, so the oldest always expires first
+        while self._seen and next(iter(self._seen.values())) < now:
+            self._seen.popitem(last=False)
+        if update_id in self._seen:
+            return False
+        self._seen[update_id] = now + self.ttl
+        if len(self._seen) > self.maxsize:
+            self._seen.popitem(last=False)
+        return True
+
+    async def forget(self, update_id):
+        self._seen.pop(update_id, None)
+
+
+class RedisUpdateDeduplicator:
+    """Shares seen update_ids between every bot process behind the load balancer."""
+
+    def __init__(self, redis, ttl):
+        self.redis = redis
+        self.ttl = ttl
+
+    async def first_seen(self, update_id):
+        return bool(await self.redis.set(f"bot:update:{update_id}", 1, nx=True, ex=self.ttl))
+
+    async def forget(self, update_id):
+        await self.redis.delete(f"bot:update:{update_id}")
+
+
+def create_deduplicator():
+    ttl = settings.BOT_UPDATE_DEDUP_TTL
+    if settings.BOT_FSM_STORAGE == 'redis':
+        from redis.asyncio import Redis
+        return RedisUpdateDeduplicator(Redis.from_url(settings.BOT_FSM_REDIS_URL), ttl)
+    return MemoryUpdateDeduplicator(ttl)
+
+
+class WebhookUpdateQueue:
+    """Accepts webhook requests immediately and hands updates to a fixed pool of workers.
+
+    When the queue is full the request is refused with 503 so Telegram redelivers
+    it later, instead of the process piling up unbounded handler tasks.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, deduplicator, maxsize, workers, secret_token=None):
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.deduplicator = deduplicator
+        self.secret_token = secret_token
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.worker_count = workers
+        self._workers = []
+
+    async def handle(self, request: web.Request):
+        if self.secret_token and request.headers.get('X-Telegram-Bot-Api-Secret-Token') != self.secret_token:
+            return web.Response(status=401)
+
+        try:
+            data = await request.json()
+            update_id = data['update_id']
+        except (ValueError, KeyError, TypeError):
+            return web.Response(status=400)
+
+        if self.queue.full():
+            return web.Response(status=503)
+        if not await self.deduplicator.first_seen(update_id):
+            return web.Response()
+
+        try:
+            self.queue.put_nowait(data)
+        except asyncio.QueueFull:
+            # Filled up while we checked; let Telegram redeliver it
+            await self.deduplicator.forget(update_id)
+            return web.Response(status=503)
+        return web.Response()
+
+    async def _work(self):
+        while True:
+            data = await self.queue.get()
+            try:
+                update = Update.model_validate(data, context={'bot': self.bot})
+                await self.dispatcher.feed_update(self.bot, update)
+            except Exception:
+                logger.exception(f"Failed to handle update {data.get('update_id')}")
+            finally:
+                self.queue.task_done()
+
+    async def start(self, app):
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.worker_count)]
+
+    async def stop(self, app):
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=10)
+        except asyncio.TimeoutError:
+            logger.warning(f"Shutting down with {self.queue.qsize()} updates still queued")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+
+
+def create_webhook_app(dispatcher: Dispatcher, bot: Bot) -> web.Application:
+    updates = WebhookUpdateQueue(
+        dispatcher,
+        bot,
+        create_deduplicator(),
+        maxsize=settings.BOT_WEBHOOK_QUEUE_SIZE,
+        workers=settings.BOT_WEBHOOK_WORKERS,
+        secret_token=settings.BOT_WEBHOOK_SECRET,
+    )
+
+    async def register_webhook(app):
+        if settings.BOT_WEBHOOK_URL:
+            await bot.set_webhook(
+                settings.BOT_WEBHOOK_URL.rstrip('/') + settings.BOT_WEBHOOK_PATH,
+                secret_token=settings.BOT_WEBHOOK_SECRET,
+                allowed_updates=dispatcher.resolve_used_update_types(),
+            )
+
+    app = web.Application()
+    app.router.add_post(settings.BOT_WEBHOOK_PATH, updates.handle)
+    app.on_startup.append(register_webhook)
+    app.on_startup.append(updates.start)
+    app.on_shutdown.append(updates.stop)
+    # Runs the dispatcher's startup/shutdown hooks, which also close the FSM storage
+    setup_application(app, dispatcher, bot=bot)
+
+    async def close_session(app):
+        await bot.session.close()
+
+    app.on_cleanup.append(close_session)
+    return app
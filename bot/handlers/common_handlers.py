@@ -2,13 +2,12 @@
 from aiogram import Router
 from aiogram.filters import Command
 from aiogram.types import Message
-from ..services.user_service import UserService
+from ..models import CustomUser
 
 common_router = Router()
 
 @common_router.message(Command('help'))
-async def handle_help(message: Message):
-    user = await UserService.get_user_by_telegram_id(message.from_user.id)
+async def handle_help(message: Message, user: CustomUser | None):
     if not user:
         return
 
@@ -18,6 +17,7 @@ async def handle_help(message: Message):
             "/book - Manage books\n" # Bu commandni keyinroq qo'shish kerak bo'ladi
             "Add Book - Upload new books\n"
             "List Books - View existing books\n"
+            "/books [YYYY-MM] [uploader] - List books by month or uploader\n"
             "/help - Show this help"
         )
     elif user.role == 'student':
@@ -25,6 +25,15 @@ async def handle_help(message: Message):
             "📖 <b>Student Commands</b>\n\n"
             "Reading - Access books\n"
             "Tasks - Submit video tasks\n"
+            "/progress - Your reading and task totals\n"
+            "/top [week|month] - Pages-read leaderboards of your class and branch\n"
+            "/help - Show this help"
+        )
+    elif user.role == 'parent':
+        help_text = (
+            "👪 <b>Parent Commands</b>\n\n"
+            "/progress - Your child's reading and task totals\n"
+            "/top [week|month] - Leaderboards of your child's class and branch\n"
             "/help - Show this help"
         )
     else:
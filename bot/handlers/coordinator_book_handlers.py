@@ -1,5 +1,6 @@
 # handlers/coordinator_book_handlers.py
 import logging
+import re
 import uuid
 import os
 from aiogram import Router, F, Bot
@@ -8,20 +9,22 @@ from aiogram.types import (
     ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
 )
 from aiogram.fsm.context import FSMContext
-from aiogram.filters import or_f
+from aiogram.filters import Command, CommandObject, or_f
 
-from ..bot.utils import download_file_from_telegram
+from ..bot.utils import download_telegram_file, pack_lines
+from ..models import CustomUser
 from ..states import RoleState
 from ..keyboards import get_main_keyboard
-from ..services.user_service import UserService
 from ..services.book_service import BookService
+from ..utils.periods import academic_year_periods, period_from_key, period_label, period_to_key
 
 coordinator_book_router = Router()
 logger = logging.getLogger(__name__)
 
+PERIOD_ARG = re.compile(r'^\d{4}-\d{2}$')
+
 @coordinator_book_router.message(RoleState.profile_menu, F.text == "📤 Add Book")
-async def add_book_start(message: Message, state: FSMContext):
-    user = await UserService.get_user_by_telegram_id(message.from_user.id)
+async def add_book_start(message: Message, state: FSMContext, user: CustomUser | None):
     if not user or user.role != "coordinator":
         await message.answer("Sizda bu funksiya mavjud emas.")
         return
@@ -36,9 +39,10 @@ async def process_book_title(message: Message, state: FSMContext):
 
     await state.update_data(book_title=message.text)
 
-    months = ["January", "February", "March", "April", "May", "June",
-              "July", "August", "September", "October", "November", "December"]
-    buttons = [InlineKeyboardButton(text=month, callback_data=f"bookmonth_{month}") for month in months]
+    buttons = [
+        InlineKeyboardButton(text=period_label(period), callback_data=f"bookmonth_{period_to_key(period)}")
+        for period in academic_year_periods()
+    ]
     markup = InlineKeyboardMarkup(inline_keyboard=[buttons[i:i + 3] for i in range(0, len(buttons), 3)])
 
     await message.answer("📅 Select the month for this book:", reply_markup=markup)
@@ -46,8 +50,7 @@ async def process_book_title(message: Message, state: FSMContext):
 
 @coordinator_book_router.callback_query(RoleState.uploading_book_month, F.data.startswith("bookmonth_"))
 async def process_book_month(callback: CallbackQuery, state: FSMContext):
-    month = callback.data.split('_')[1]
-    await state.update_data(book_month=month)
+    await state.update_data(book_period=callback.data.split('_')[1])
     await callback.message.answer(
         "📤 Please upload the book file (PDF or Word):",
         reply_markup=ReplyKeyboardMarkup(
@@ -59,7 +62,7 @@ async def process_book_month(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 @coordinator_book_router.message(RoleState.uploading_book_file, F.document)
-async def process_book_file(message: Message, state: FSMContext, bot: Bot):
+async def process_book_file(message: Message, state: FSMContext, bot: Bot, user: CustomUser | None):
     ALLOWED_TYPES = [
         'application/pdf',
         'application/msword',
@@ -72,18 +75,23 @@ async def process_book_file(message: Message, state: FSMContext, bot: Bot):
 
     try:
         data = await state.get_data()
-        user = await UserService.get_user_by_telegram_id(message.from_user.id)
-        file_bytes_io = await download_file_from_telegram(bot, message.document.file_id)
         filename = f"{uuid.uuid4()}_{message.document.file_name}"
-
-        await BookService.save_book(
-            user=user,
-            title=data['book_title'],
-            month=data['book_month'],
-            file_bytes=file_bytes_io.read(),
-            filename=filename
+        book_file = await download_telegram_file(
+            bot, message.document.file_id, filename, content_type=message.document.mime_type
         )
 
+        try:
+            await BookService.save_book(
+                user=user,
+                title=data['book_title'],
+                period=period_from_key(data['book_period']),
+                file=book_file,
+                filename=filename,
+                telegram_file_id=message.document.file_id
+            )
+        finally:
+            book_file.close()
+
         await message.answer(
             f"✅ Book '{data['book_title']}' uploaded successfully!",
             reply_markup=get_main_keyboard('coordinator')
@@ -98,29 +106,53 @@ async def process_book_file(message: Message, state: FSMContext, bot: Bot):
         )
         await state.set_state(RoleState.profile_menu)
 
+async def send_book_listing(message: Message, period=None, uploader=None):
+    """Stream the catalog to the chat as consecutive messages under Telegram's length limit."""
+    async def lines():
+        current_period = None
+        async for book_id, title, book_period, username in BookService.iter_book_listing(period, uploader):
+            if current_period is None:
+                yield "📚 Available Books:"
+            if book_period != current_period:
+                yield f"\n📅 {period_label(book_period)}:"
+                current_period = book_period
+            yield f"- {title} (ID: {book_id})" + (f" — {username}" if username else "")
+
+    sent = False
+    async for text in pack_lines(lines()):
+        await message.answer(text)
+        sent = True
+
+    if not sent:
+        await message.answer("No books available yet." if not (period or uploader) else "No books match these filters.")
+
 @coordinator_book_router.message(RoleState.profile_menu, F.text == "📋 List Books")
-async def list_books(message: Message):
-    user = await UserService.get_user_by_telegram_id(message.from_user.id)
+async def list_books(message: Message, user: CustomUser | None):
     if not user or user.role != "coordinator":
         await message.answer("Sizda bu funksiya mavjud emas.")
         return
 
-    books = await BookService.get_all_books_ordered()
+    await send_book_listing(message)
 
-    if not books:
-        await message.answer("No books available yet.")
+@coordinator_book_router.message(Command('books'))
+async def list_books_filtered(message: Message, command: CommandObject, user: CustomUser | None):
+    """/books [YYYY-MM] [uploader username] — either filter may be omitted."""
+    if not user or user.role != "coordinator":
+        await message.answer("Sizda bu funksiya mavjud emas.")
         return
 
-    response = ["📚 Available Books:"]
-    current_month = None
-
-    for book in books:
-        if book.month != current_month:
-            response.append(f"\n📅 {book.month}:")
-            current_month = book.month
-        response.append(f"- {book.title} (ID: {book.id})")
-
-    await message.answer("\n".join(response))
+    period = uploader = None
+    for arg in (command.args or "").split():
+        if PERIOD_ARG.match(arg):
+            try:
+                period = period_from_key(arg)
+            except ValueError:
+                await message.answer("Invalid month. Use YYYY-MM, e.g. /books 2026-10")
+                return
+        else:
+            uploader = arg.lstrip('@')
+
+    await send_book_listing(message, period=period, uploader=uploader)
 
 @coordinator_book_router.message(
     or_f(
@@ -1,16 +1,20 @@
 # handlers/profile_handlers.py
 from aiogram import Router, F
+from aiogram.filters import Command, CommandObject
 from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton
 from aiogram.fsm.context import FSMContext
+from ..models import CustomUser
 from ..states import RoleState
 from ..keyboards import get_main_keyboard, profile_keyboard, parent_keyboard, edit_keyboard
+from ..services.leaderboard_service import LeaderboardService
+from ..services.stats_service import StatsService
 from ..services.user_service import UserService
+from ..utils.periods import period_label
 
 profile_router = Router()
 
 @profile_router.message(RoleState.profile_menu, F.text == "Profile")
-async def show_profile(message: Message, state: FSMContext):
-    user = await UserService.get_user_by_telegram_id(message.from_user.id)
+async def show_profile(message: Message, state: FSMContext, user: CustomUser | None):
     if not user:
         await message.answer("Foydalanuvchi topilmadi.")
         await state.clear()
@@ -35,8 +39,7 @@ async def show_profile(message: Message, state: FSMContext):
         await message.answer(f"🧑‍💼 Koordinator profili:\n{profile_text}", reply_markup=profile_keyboard)
 
 @profile_router.message(RoleState.profile_menu, F.text == "Edit")
-async def edit_profile_start(message: Message, state: FSMContext):
-    user = await UserService.get_user_by_telegram_id(message.from_user.id)
+async def edit_profile_start(message: Message, state: FSMContext, user: CustomUser | None):
     if not user or user.role not in ["student", "coordinator"]:
         await message.answer("Faqat student va coordinatorlar o'z profilini tahrir qilishi mumkin.")
         return
@@ -44,7 +47,7 @@ async def edit_profile_start(message: Message, state: FSMContext):
     await state.set_state(RoleState.editing_field)
 
 @profile_router.message(RoleState.editing_field)
-async def ask_for_new_value(message: Message, state: FSMContext):
+async def ask_for_new_value(message: Message, state: FSMContext, user: CustomUser | None):
     field_map = {
         "Username": "username",
         "First name": "first_name",
@@ -53,7 +56,6 @@ async def ask_for_new_value(message: Message, state: FSMContext):
     }
 
     if message.text == "Bekor qilish":
-        user = await UserService.get_user_by_telegram_id(message.from_user.id)
         await message.answer(
             "Tahrirlash bekor qilindi.",
             reply_markup=get_main_keyboard(user.role)
@@ -71,10 +73,9 @@ async def ask_for_new_value(message: Message, state: FSMContext):
     await state.set_state(RoleState.editing_value)
 
 @profile_router.message(RoleState.editing_value)
-async def save_new_value(message: Message, state: FSMContext):
+async def save_new_value(message: Message, state: FSMContext, user: CustomUser | None):
     data = await state.get_data()
     field = data.get("edit_field")
-    user = await UserService.get_user_by_telegram_id(message.from_user.id)
 
     if not user:
         await message.answer("Foydalanuvchi topilmadi.")
@@ -90,8 +91,7 @@ async def save_new_value(message: Message, state: FSMContext):
     await state.set_state(RoleState.profile_menu)
 
 @profile_router.message(RoleState.profile_menu, F.text == "Logout")
-async def logout_user(message: Message, state: FSMContext):
-    user = await UserService.get_user_by_telegram_id(message.from_user.id)
+async def logout_user(message: Message, state: FSMContext, user: CustomUser | None):
     if user:
         user.telegram_id = None
         await UserService.save_user(user)
@@ -102,4 +102,68 @@ async def logout_user(message: Message, state: FSMContext):
             resize_keyboard=True
         )
     )
-    await state.clear()
\ No newline at end of file
+    await state.clear()
+
+@profile_router.message(Command('progress'))
+@profile_router.message(RoleState.profile_menu, F.text == "📊 Progress")
+async def show_progress(message: Message, user: CustomUser | None):
+    if not user or user.role not in ("student", "parent"):
+        await message.answer("Sizda bu funksiya mavjud emas.")
+        return
+
+    student = user if user.role == "student" else await StatsService.get_child(user)
+    if not student:
+        await message.answer("Farzandingiz ma'lumotlari topilmadi.")
+        return
+
+    rows = await StatsService.get_year_stats(student)
+    if not rows:
+        await message.answer("Bu o'quv yilida hali topshiriqlar yo'q.")
+        return
+
+    lines = [f"📊 {student.first_name or student.username} — o'quv yili natijalari:\n"]
+    for row in rows:
+        lines.append(
+            f"{period_label(row.period)}: 📚 {row.books_read} kitob, 📄 {row.pages_read} bet, "
+            f"🎥 {row.tasks_submitted} vazifa, 📅 {row.submission_days} kun"
+        )
+    lines.append(
+        f"\nJami: 📚 {sum(row.books_read for row in rows)} kitob, 📄 {sum(row.pages_read for row in rows)} bet, "
+        f"🎥 {sum(row.tasks_submitted for row in rows)} vazifa"
+    )
+    await message.answer("\n".join(lines))
+
+
+@profile_router.message(Command('top'))
+async def show_leaderboard(message: Message, command: CommandObject, user: CustomUser | None):
+    if not user or user.role not in ("student", "parent"):
+        await message.answer("Sizda bu funksiya mavjud emas.")
+        return
+
+    window = (command.args or "week").strip().lower()
+    if window not in ("week", "month"):
+        await message.answer("Foydalanish: /top [week|month]")
+        return
+
+    student = user if user.role == "student" else await StatsService.get_child(user)
+    if not student:
+        await message.answer("Farzandingiz ma'lumotlari topilmadi.")
+        return
+
+    boards = await LeaderboardService.get_boards(student, window)
+    if not boards:
+        await message.answer("Sinf yoki filial ko'rsatilmagan, reyting mavjud emas.")
+        return
+
+    title = "Haftalik" if window == "week" else "Oylik"
+    parts = []
+    for board in boards:
+        label = "Sinf" if board.scope == "class" else "Filial"
+        lines = [f"🏆 {title} reyting — {label}: {board.name}"]
+        lines += [f"{place}. {name} — {pages} bet" for place, (name, pages) in enumerate(board.top, start=1)]
+        if not board.top:
+            lines.append("Hali hech kim bet kiritmagan.")
+        if board.own:
+            lines.append(f"Sizning o'rningiz: {board.own[0]} ({board.own[1]} bet)")
+        parts.append("\n".join(lines))
+    await message.answer("\n\n".join(parts))
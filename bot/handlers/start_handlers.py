@@ -3,16 +3,17 @@ from aiogram import Router, F
 from aiogram.filters import CommandStart
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
+from django.conf import settings
+from ..models import CustomUser
 from ..states import RoleState
 from ..keyboards import get_main_keyboard
-from ..services.user_service import UserService
+from ..services.user_service import TooManyLoginAttempts, UserService
 from ..keyboards import start
 
 start_router = Router()
 
 @start_router.message(CommandStart())
-async def cmd_start(message: Message, state: FSMContext):
-    user = await UserService.get_user_by_telegram_id(message.from_user.id)
+async def cmd_start(message: Message, state: FSMContext, user: CustomUser | None):
     if user:
         await message.answer(
             "Siz allaqachon ro'yxatdan o'tgansiz.",
@@ -44,7 +45,14 @@ async def process_login(message: Message, state: FSMContext):
         await message.answer("Iltimos, login va parolni quyidagicha kiriting:\n`login123 password123`")
         return
 
-    user = await UserService.authenticate_user(username=login, password=password)
+    try:
+        user = await UserService.authenticate_user(
+            username=login, password=password, telegram_id=message.from_user.id
+        )
+    except TooManyLoginAttempts:
+        minutes = max(1, settings.BOT_LOGIN_FAILURE_WINDOW // 60)
+        await message.answer(f"Juda ko'p noto'g'ri urinishlar. Iltimos, {minutes} daqiqadan so'ng qayta urinib ko'ring.")
+        return
     expected_role = (await state.get_data()).get("selected_role")
 
     if user and user.role == expected_role:
@@ -1,40 +1,44 @@
 # handlers/student_reading_handlers.py
 import logging
 import os
-from datetime import datetime
 from aiogram import Router, F, Bot
 from aiogram.types import (
     Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton,
-    ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove, BufferedInputFile
+    ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove, FSInputFile
 )
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
-from asgiref.sync import sync_to_async
-from ..models import Book, CustomBook
+from django.conf import settings
+from ..models import Book, CustomBook, CustomUser
 from ..states import RoleState
 from ..keyboards import get_main_keyboard
-from ..services.user_service import UserService
 from ..services.book_service import BookService
+from ..services.menu_service import MenuService
 from ..services.reading_service import ReadingService
-from ..bot.utils import download_file_from_telegram
+from ..bot.media_queue import MediaPersistenceQueue
+from ..utils.executors import run_blocking
+from ..utils.periods import academic_year_periods, period_from_key, period_label, period_to_key
 import asyncio
 
 student_reading_router = Router()
 logger = logging.getLogger(__name__)
 
 @student_reading_router.message(RoleState.profile_menu, F.text == "Reading (Kitobxonlik)")
-async def show_reading_months(message: Message, state: FSMContext):
-    user = await UserService.get_user_by_telegram_id(message.from_user.id)
+async def show_reading_months(message: Message, state: FSMContext, user: CustomUser | None):
     if not user or user.role != "student":
         await message.answer("Sizda bu funksiya mavjud emas.")
         return
 
-    current_month = datetime.now().strftime("%B")
-    months = ["January", "February", "March", "April", "May", "June",
-              "July", "August", "September", "October", "November", "December"]
+    # Only months of the current academic year that actually have books
+    available = set(await BookService.get_available_periods())
+    periods = [period for period in academic_year_periods() if period in available]
+    if not periods:
+        await message.answer("Hozircha kitoblar mavjud emas.")
+        return
 
     buttons = []
-    for month in months:
-        buttons.append([InlineKeyboardButton(text=month, callback_data=f"month_{month}")])
+    for period in periods:
+        buttons.append([InlineKeyboardButton(text=period_label(period), callback_data=f"month_{period_to_key(period)}")])
 
     keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
     await message.answer("📚 Iltimos, kitob o'qish oyini tanlang:", reply_markup=keyboard)
@@ -43,30 +47,43 @@ async def show_reading_months(message: Message, state: FSMContext):
 
 @student_reading_router.callback_query(RoleState.choosing_month, F.data.startswith("month_"))
 async def month_selected(callback: CallbackQuery, state: FSMContext):
-    month = callback.data.split('_')[1]
-    await state.update_data(selected_month=month)
+    try:
+        period = period_from_key(callback.data.split('_')[1])
+    except ValueError:
+        await callback.answer()
+        return
+    await state.update_data(selected_period=period_to_key(period))
 
-    books = await BookService.get_books_by_month(month)
-    if not books:
+    keyboard = await MenuService.get_book_menu(period)
+    if not keyboard:
         await callback.message.answer("Bu oy uchun kitoblar topilmadi.")
         await callback.answer()
         return
 
-    buttons = []
-    for book in books:
-        buttons.append([InlineKeyboardButton(text=book.title, callback_data=f"book_{book.id}")])
-
-    buttons.append([InlineKeyboardButton(text="Boshqa kitob", callback_data="other_book")])
-    keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
-
     await callback.message.answer(
-        f"📖 '{month}' oyi uchun kitobni tanlang:",
+        f"📖 '{period_label(period)}' oyi uchun kitobni tanlang:",
         reply_markup=keyboard
     )
     await state.set_state(RoleState.choosing_book)
     await callback.answer()
 
 
+@student_reading_router.callback_query(RoleState.choosing_book, F.data.startswith("bookpage_"))
+async def book_page_selected(callback: CallbackQuery):
+    try:
+        _, period_key, page = callback.data.split('_')
+        keyboard = await MenuService.get_book_menu(period_from_key(period_key), int(page))
+    except ValueError:
+        keyboard = None  # the page counter button, or malformed data
+
+    if keyboard:
+        try:
+            await callback.message.edit_reply_markup(reply_markup=keyboard)
+        except TelegramBadRequest:
+            pass  # double tap: the message already shows this page
+    await callback.answer()
+
+
 @student_reading_router.callback_query(RoleState.choosing_book, F.data.startswith("book_"))
 async def book_selected(callback: CallbackQuery, state: FSMContext, bot: Bot):
     try:
@@ -78,32 +95,46 @@ async def book_selected(callback: CallbackQuery, state: FSMContext, bot: Bot):
             await callback.answer()
             return
 
-        # Check if the book file exists
-        if not book.file or not await sync_to_async(os.path.exists)(book.file.path):
-            await callback.message.answer("Kitob fayli topilmadi. Iltimos, admin bilan bog'laning.")
-            await callback.answer()
-            return
-
-        # Check file size before sending
-        file_size_bytes = await sync_to_async(lambda: book.file.size)()
-        if file_size_bytes > 50 * 1024 * 1024: # 50 MB limit for Telegram documents
-            await callback.message.answer(
-                f"❌ Fayl hajmi juda katta ({file_size_bytes / (1024 * 1024):.2f}MB). "
-                f"Telegramda maksimum 50MB gacha fayl yuborish mumkin."
-            )
-            await callback.answer()
-            return
+        caption = f"📖 {book.title}\n📅 Oy: {period_label(book.period)}"
+        sent = False
+
+        # Telegram already has this file: send it by file_id instead of re-uploading
+        if book.telegram_file_id:
+            try:
+                await bot.send_document(
+                    chat_id=callback.message.chat.id,
+                    document=book.telegram_file_id,
+                    caption=caption
+                )
+                sent = True
+            except TelegramBadRequest as e:
+                logger.warning(f"Cached file_id for book {book.id} rejected, re-uploading: {e}")
+
+        if not sent:
+            # Check if the book file exists
+            if not book.file or not await run_blocking(os.path.exists, book.file.path):
+                await callback.message.answer("Kitob fayli topilmadi. Iltimos, admin bilan bog'laning.")
+                await callback.answer()
+                return
 
-        # Fayl kontentini o'qish va yuborish
-        file_content = await sync_to_async(book.file.read)()
-        filename = os.path.basename(book.file.name)
+            # Check file size before sending
+            file_size_bytes = await run_blocking(lambda: book.file.size)
+            if file_size_bytes > 50 * 1024 * 1024: # 50 MB limit for Telegram documents
+                await callback.message.answer(
+                    f"❌ Fayl hajmi juda katta ({file_size_bytes / (1024 * 1024):.2f}MB). "
+                    f"Telegramda maksimum 50MB gacha fayl yuborish mumkin."
+                )
+                await callback.answer()
+                return
 
-        document = BufferedInputFile(file=file_content, filename=filename)
-        await bot.send_document(
-            chat_id=callback.message.chat.id,
-            document=document,
-            caption=f"📖 {book.title}\n📅 Oy: {book.month}"
-        )
+            # Faylni diskdan oqim bilan yuborish va file_id ni keyingi safar uchun saqlash
+            document = FSInputFile(book.file.path, filename=os.path.basename(book.file.name))
+            sent_message = await bot.send_document(
+                chat_id=callback.message.chat.id,
+                document=document,
+                caption=caption
+            )
+            await BookService.set_book_file_id(book.id, sent_message.document.file_id)
 
         # Kitob yuborilgandan so'ng, ovozli xabar so'rash
         await callback.message.answer(
@@ -147,19 +178,19 @@ async def custom_book_name_received(message: Message, state: FSMContext):
 
 
 @student_reading_router.message(RoleState.waiting_for_voice_message, F.voice)
-async def voice_message_received(message: Message, state: FSMContext, bot: Bot):
+async def voice_message_received(message: Message, state: FSMContext, user: CustomUser | None,
+                                 media_queue: MediaPersistenceQueue):
     try:
-        user = await UserService.get_user_by_telegram_id(message.from_user.id)
         if not user or user.role != "student":
             await message.answer("Sizda bu funksiya mavjud emas.")
             return
 
         data = await state.get_data()
-        selected_month = data.get('selected_month')
+        selected_period = data.get('selected_period')
         selected_book_id = data.get('selected_book_id')
         custom_book_name = data.get('custom_book_name')
 
-        if not selected_month:
+        if not selected_period:
             await message.answer("Oy tanlanmagan. Iltimos, qaytadan boshlang.", reply_markup=get_main_keyboard('student'))
             await state.clear()
             return
@@ -173,34 +204,31 @@ async def voice_message_received(message: Message, state: FSMContext, bot: Bot):
                 await state.clear()
                 return
         elif custom_book_name:
-            custom_book, created = await sync_to_async(CustomBook.objects.get_or_create)(
-                name=custom_book_name, defaults={'student': user} # Assuming student is needed for CustomBook creation
+            custom_book = await BookService.get_or_create_custom_book(
+                user, period_from_key(selected_period), custom_book_name
             )
         else:
             await message.answer("Kitob tanlanmagan. Iltimos, qaytadan boshlang.", reply_markup=get_main_keyboard('student'))
             await state.clear()
             return
 
-        voice_file_id = message.voice.file_id
-        file_info = await bot.get_file(voice_file_id)
-        file_path = file_info.file_path
-
-        # Download voice file
-        downloaded_file = await download_file_from_telegram(bot, file_path)
-        if not downloaded_file:
-            await message.answer("❌ Ovozli xabar yuklab olinmadi. Iltimos, qaytadan urinib ko'ring.")
+        if settings.VOICE_STORAGE_MODE != 'lazy' and media_queue.full():
+            await message.answer("⏳ Hozir yuklashlar juda ko'p. Iltimos, ovozli xabarni bir daqiqadan so'ng qayta yuboring.")
             return
 
         submission = await ReadingService.create_reading_submission(
             student=user,
-            month=selected_month,
-            voice_message_id=voice_file_id,
+            period=period_from_key(selected_period),
+            voice_message_id=message.voice.file_id,
+            voice_file_unique_id=message.voice.file_unique_id,
             book=book,
             custom_book=custom_book
         )
 
-        filename = f"{submission.id}_{message.voice.file_unique_id}.ogg"
-        await ReadingService.save_submission_voice_file(submission, filename, downloaded_file)
+        if submission.media_status == 'pending':
+            # Copied from Telegram into storage in the background. If the queue filled up since the
+            # check above, the row stays pending and the queue's next sweep picks it up.
+            media_queue.offer('voice', submission.id)
 
         await message.answer(
             "Rahmat! Endi o'qigan kitobingizdagi betlar sonini raqamda yuboring (masalan: 45).",
@@ -1,26 +1,24 @@
 # handlers/student_task_handlers.py
 import logging
-import time
 import tempfile
 from fileinput import filename
 from pathlib import Path
 import os
 from datetime import datetime
-from aiogram import Router, F, Bot
+from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
+from ..models import CustomUser
 from ..states import RoleState
 from ..keyboards import get_main_keyboard
-from ..services.user_service import UserService
 from ..services.task_service import TaskService
-from ..bot.utils import download_file_from_telegram # Assuming you'll create a utility for this
+from ..bot.media_queue import MediaPersistenceQueue
 
 student_task_router = Router()
 logger = logging.getLogger(__name__)
 
 @student_task_router.message(RoleState.profile_menu, F.text == "Tasks")
-async def show_tasks(message: Message, state: FSMContext):
-    user = await UserService.get_user_by_telegram_id(message.from_user.id)
+async def show_tasks(message: Message, state: FSMContext, user: CustomUser | None):
     if not user or user.role != "student":
         await message.answer("Sizda bu funksiya mavjud emas.")
         return
@@ -43,16 +41,13 @@ async def task_selected(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 @student_task_router.message(RoleState.waiting_for_task_video, F.video_note)
-async def process_task_video(message: Message, state: FSMContext, bot: Bot):
-    user = None
-    processing_msg = None
-
+async def process_task_video(message: Message, state: FSMContext, user: CustomUser | None,
+                             media_queue: MediaPersistenceQueue):
     try:
         if message.forward_from or message.forward_from_chat:
             await message.answer("❌ Forwarded videos are not allowed.")
             return
 
-        user = await UserService.get_user_by_telegram_id(message.from_user.id)
         data = await state.get_data()
         task_name = data.get("selected_task", "Unknown Task")
 
@@ -64,21 +59,18 @@ async def process_task_video(message: Message, state: FSMContext, bot: Bot):
             await message.answer("📦 File too large (max 20MB)")
             return
 
-        processing_msg = await message.answer("🔄 Processing your video...")
-
-        file_id = message.video_note.file_id
-        file_bytes_io = await download_file_from_telegram(bot, file_id)
-        video_bytes = file_bytes_io.getvalue()
-        file_bytes_io.close()
-
-        filename = f"video_{message.from_user.id}_{int(time.time())}.mp4"
+        if media_queue.full():
+            await message.answer("⏳ Too many uploads right now. Please send the video again in a minute.")
+            return
 
-        await TaskService.save_video_task_submission(
+        task = await TaskService.create_pending_video_submission(
             student=user,
             task_name=task_name,
-            video_bytes=video_bytes,
-            filename=filename
+            telegram_file_id=message.video_note.file_id
         )
+        # Copied from Telegram into storage in the background. If the queue filled up since the
+        # check above, the row stays pending and the queue's next sweep picks it up.
+        media_queue.offer('task', task.id)
 
         success_msg = (
             "✅ Video uploaded successfully!\n\n"
@@ -87,7 +79,6 @@ async def process_task_video(message: Message, state: FSMContext, bot: Bot):
             f"📅 {datetime.now().strftime('%Y-%m-%d %H:%M')}"
         )
 
-        await processing_msg.delete()
         await message.answer(success_msg, reply_markup=get_main_keyboard(user.role))
 
     except Exception as e:
@@ -100,11 +91,6 @@ async def process_task_video(message: Message, state: FSMContext, bot: Bot):
             "3. Retry in 5 minutes"
         )
 
-        if processing_msg:
-            try:
-                await processing_msg.delete()
-            except:
-                pass
         await message.answer(error_msg, reply_markup=get_main_keyboard(user.role if user else None))
 
 
@@ -10,7 +10,7 @@ def get_main_keyboard(user_role):
         return ReplyKeyboardMarkup(
             keyboard=[
                 [KeyboardButton(text="Profile"), KeyboardButton(text="Tasks")],
-                [KeyboardButton(text="Reading (Kitobxonlik)")]
+                [KeyboardButton(text="Reading (Kitobxonlik)"), KeyboardButton(text="📊 Progress")]
             ],
             resize_keyboard=True
         )
@@ -25,7 +25,7 @@ def get_main_keyboard(user_role):
     else:
         return ReplyKeyboardMarkup(
             keyboard=[
-                [KeyboardButton(text="Profile")]
+                [KeyboardButton(text="Profile"), KeyboardButton(text="📊 Progress")]
             ],
             resize_keyboard=True
         )
@@ -0,0 +1,238 @@
+import bisect
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+from redis.exceptions import WatchError
+
+from .models import ReadingSubmission
+
+logger = logging.getLogger(__name__)
+
+SCOPES = ('class', 'branch')
+WINDOWS = ('week', 'month')
+# Boards of past weeks/months are kept a while for "last week" style views, then expire
+WINDOW_TTL = {'week': 5 * 7 * 24 * 60 * 60, 'month': 400 * 24 * 60 * 60}
+# A reconcile swap interrupted by this many concurrent increments in a row gives up until the next run
+REPLACE_ATTEMPTS = 5
+
+
+def window_key(window, day):
+    if window == 'week':
+        year, week, _ = day.isocalendar()
+        return f"{year}-W{week:02d}"
+    return day.strftime("%Y-%m")
+
+
+def window_bounds(window, day):
+    """[start, end) dates of the week (Monday first) or month containing ``day``."""
+    if window == 'week':
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=7)
+    start = day.replace(day=1)
+    return start, (start + timedelta(days=32)).replace(day=1)
+
+
+def board_key(window, day, scope, value):
+    return f"lb:{window}:{window_key(window, day)}:{scope}:{value}"
+
+
+def student_boards(student_class, branch, day):
+    """Keys of every board a student with this class and branch appears on for ``day``."""
+    scopes = {'class': student_class, 'branch': branch}
+    return [
+        (window, board_key(window, day, scope, scopes[scope]))
+        for window in WINDOWS
+        for scope in SCOPES
+        if scopes[scope]
+    ]
+
+
+class RedisLeaderboards:
+    """Boards as Redis sorted sets: ZINCRBY to update, ZREVRANGE/ZREVRANK to read, all O(log n)."""
+
+    def __init__(self, redis):
+        self.redis = redis
+
+    def add(self, boards, member, amount):
+        pipe = self.redis.pipeline()
+        for window, key in boards:
+            pipe.zincrby(key, amount, member)
+            pipe.zremrangebyscore(key, '-inf', 0)  # a student whose pages were all withdrawn leaves the board
+            pipe.expire(key, WINDOW_TTL[window])
+        pipe.execute()
+
+    def top(self, key, count):
+        return [(member.decode(), int(score)) for member, score in self.redis.zrevrange(key, 0, count - 1, withscores=True)]
+
+    def rank(self, key, member):
+        """(1-based rank, score) of ``member``, or None when it is not on the board."""
+        pipe = self.redis.pipeline()
+        pipe.zrevrank(key, member)
+        pipe.zscore(key, member)
+        rank, score = pipe.execute()
+        return None if rank is None else (rank + 1, int(score))
+
+    def replace(self, prefix, snapshot, ttl):
+        """Swap every board under ``prefix`` for ``snapshot()`` ({key: {member: score}}) in one MULTI.
+
+        The boards are WATCHed before the snapshot is read, so an increment that lands
+        between reading the database and the swap aborts the MULTI instead of being
+        overwritten; the swap is then retried with a fresh snapshot. Returns the boards
+        swapped in, or None if every attempt was interrupted, leaving the incrementally
+        kept boards in place.
+        """
+        for _ in range(REPLACE_ATTEMPTS):
+            with self.redis.pipeline(transaction=True) as pipe:
+                existing = set(self.redis.scan_iter(match=f"{prefix}*", count=1000))
+                if existing:
+                    pipe.watch(*existing)
+                boards = snapshot()
+                keys = {key.encode() for key in boards}
+                created = keys - existing
+                if created:
+                    pipe.watch(*created)
+                    if pipe.exists(*created):
+                        continue  # an increment created the board after the scan
+                pipe.multi()
+                for key in existing - keys:
+                    pipe.delete(key)
+                for key, scores in boards.items():
+                    pipe.delete(key)
+                    pipe.zadd(key, scores)
+                    pipe.expire(key, ttl)
+                try:
+                    pipe.execute()
+                    return boards
+                except WatchError:
+                    continue
+        return None
+
+
+class _SortedBoard:
+    """Sorted set for one process: a score dict plus a list ordered by (-score, member)."""
+
+    def __init__(self):
+        self.scores = {}
+        self.order = []
+
+    def add(self, member, amount):
+        score = self.scores.get(member)
+        if score is not None:
+            del self.order[bisect.bisect_left(self.order, (-score, member))]
+        score = (score or 0) + amount
+        if score <= 0:
+            self.scores.pop(member, None)
+            return
+        self.scores[member] = score
+        bisect.insort(self.order, (-score, member))
+
+    def rank(self, member):
+        score = self.scores.get(member)
+        if score is None:
+            return None
+        return bisect.bisect_left(self.order, (-score, member)) + 1, score
+
+
+class MemoryLeaderboards:
+    """In-process boards for development and tests; every process has its own copy.
+
+    Ranks are found by bisection; an update also shifts the ordered list, which
+    is a memmove and fast at class and branch sizes.
+    """
+
+    def __init__(self):
+        self.boards = defaultdict(_SortedBoard)
+        self._lock = threading.Lock()
+
+    def add(self, boards, member, amount):
+        with self._lock:
+            for _, key in boards:
+                self.boards[key].add(member, amount)
+
+    def top(self, key, count):
+        with self._lock:
+            board = self.boards.get(key)
+            return [(member, -score) for score, member in board.order[:count]] if board else []
+
+    def rank(self, key, member):
+        with self._lock:
+            board = self.boards.get(key)
+            return board.rank(member) if board else None
+
+    def replace(self, prefix, snapshot, ttl):
+        boards = snapshot()
+        fresh = defaultdict(_SortedBoard)
+        for key, scores in boards.items():
+            for member, score in scores.items():
+                fresh[key].add(member, score)
+        with self._lock:
+            for key in [key for key in self.boards if key.startswith(prefix)]:
+                del self.boards[key]
+            self.boards.update(fresh)
+        return boards
+
+
+_leaderboards = None
+_lock = threading.Lock()
+
+
+def get_leaderboards():
+    global _leaderboards
+    if _leaderboards is None:
+        with _lock:
+            if _leaderboards is None:
+                if settings.LEADERBOARD_BACKEND == 'redis':
+                    from redis import Redis
+                    _leaderboards = RedisLeaderboards(Redis.from_url(settings.LEADERBOARD_REDIS_URL))
+                else:
+                    _leaderboards = MemoryLeaderboards()
+    return _leaderboards
+
+
+def record_pages(student_id, student_class, branch, day, pages):
+    """Move a student's score on their boards; meant for transaction.on_commit.
+
+    A failure only logs: reconcile_leaderboards rebuilds the boards from the database.
+    """
+    if not pages:
+        return
+    try:
+        get_leaderboards().add(student_boards(student_class, branch, day), str(student_id), pages)
+    except Exception:
+        logger.warning(f"Could not update leaderboards for student {student_id}", exc_info=True)
+
+
+def rebuild_window(window, day):
+    """Recompute every class and branch board of the week/month containing ``day`` from the database.
+
+    Returns the number of boards, or None if the swap kept being interrupted by new submissions.
+    """
+    start, end = window_bounds(window, day)
+
+    def snapshot():
+        submitted = ReadingSubmission.objects.filter(
+            submission_date__gte=timezone.make_aware(datetime.combine(start, time.min)),
+            submission_date__lt=timezone.make_aware(datetime.combine(end, time.min)),
+            page_count__gt=0,
+        )
+        rows = submitted.values('student_id', 'student__student_class', 'student__branch').annotate(
+            pages=Sum('page_count')
+        )
+        boards = defaultdict(dict)
+        for row in rows.iterator(chunk_size=2000):
+            scopes = {'class': row['student__student_class'], 'branch': row['student__branch']}
+            for scope in SCOPES:
+                if scopes[scope]:
+                    boards[board_key(window, day, scope, scopes[scope])][str(row['student_id'])] = row['pages']
+        return boards
+
+    boards = get_leaderboards().replace(f"lb:{window}:{window_key(window, day)}:", snapshot, WINDOW_TTL[window])
+    if boards is None:
+        logger.warning(f"Leaderboards for {window} {window_key(window, day)} kept changing; left as they are")
+        return None
+    return len(boards)
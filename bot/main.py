@@ -3,6 +3,9 @@ import asyncio
 import logging
 from aiogram import Bot, Dispatcher
 
+from bot.bot.fsm import create_fsm_storage
+from bot.bot.media_queue import create_media_queue
+from bot.bot.middlewares import UserMiddleware
 from bot.utils.telegram import BOT_TOKEN
 # Import routers from handlers
 from handlers.start_handlers import start_router
@@ -14,7 +17,13 @@ from handlers.common_handlers import common_router
 
 async def main():
     bot = Bot(token=BOT_TOKEN)
-    dp = Dispatcher()
+    storage, events_isolation = create_fsm_storage()
+    dp = Dispatcher(storage=storage, events_isolation=events_isolation)
+    dp.update.outer_middleware(UserMiddleware())
+    media_queue = create_media_queue()
+    dp['media_queue'] = media_queue
+    dp.startup.register(media_queue.start)
+    dp.shutdown.register(media_queue.stop)
 
     # Register all routers
     dp.include_router(start_router)
@@ -0,0 +1,127 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+import django
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections, transaction
+from django.db.backends.signals import connection_created
+
+CONFIGURED_OPTIONS = dict(connection.settings_dict.get('OPTIONS', {}))
+
+MODES = {
+    # What Django does out of the box: rollback journal, deferred transactions, 5s busy timeout
+    'default': {'options': {}, 'tuned': False},
+    # What schoolbot.settings configures for SQLite
+    'tuned': {'options': None, 'tuned': True},
+}
+
+
+def _use_database(path, mode):
+    # Imported here: the module must load in a spawned process before django.setup() has run
+    from bot.signals import tune_sqlite_connection
+
+    connections.close_all()
+    connection.settings_dict['NAME'] = path
+    connection.settings_dict['OPTIONS'] = dict(mode['options'] if mode['options'] is not None else CONFIGURED_OPTIONS)
+    if mode['tuned']:
+        connection_created.connect(tune_sqlite_connection)
+    else:
+        connection_created.disconnect(tune_sqlite_connection)
+
+
+def _worker(role, path, mode, operations, results):
+    """Write like one of the processes sharing the database and report how many writes failed."""
+    if not apps.ready:
+        django.setup()  # a spawned process starts without the app registry
+    _use_database(path, mode)
+    done = locked = 0
+    for i in range(operations):
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                if role == 'bot':
+                    # A handler: look something up, then record one submission
+                    cursor.execute('SELECT COUNT(*) FROM bench_writes WHERE role = %s', [role])
+                    cursor.execute('INSERT INTO bench_writes (role, value) VALUES (%s, %s)', [role, i])
+                else:
+                    # A Celery task: claim a batch of rows and mark them processed
+                    cursor.execute('SELECT id FROM bench_writes WHERE value >= 0 ORDER BY id LIMIT 50')
+                    ids = [row[0] for row in cursor.fetchall()]
+                    cursor.execute('INSERT INTO bench_writes (role, value) VALUES (%s, %s)', [role, i])
+                    if ids:
+                        cursor.execute(
+                            f"UPDATE bench_writes SET value = -1 WHERE id IN ({', '.join(['%s'] * len(ids))})", ids
+                        )
+            done += 1
+        except OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            locked += 1
+    results.put((role, done, locked))
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Run bot-like and Celery-like writers against one SQLite file at once, with default and tuned settings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bot-processes', type=int, default=4)
+        parser.add_argument('--celery-processes', type=int, default=2)
+        parser.add_argument('--operations', type=int, default=200, help='Transactions per process')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('This benchmark exercises the SQLite settings; the configured database is not SQLite.')
+
+        from bot.signals import tune_sqlite_connection
+
+        original = dict(connection.settings_dict)
+        context = multiprocessing.get_context()  # the platform default: fork is not available on Windows
+        try:
+            for name, mode in MODES.items():
+                with tempfile.TemporaryDirectory() as directory:
+                    path = os.path.join(directory, 'bench.sqlite3')
+                    self.run_mode(context, name, mode, path, options)
+        finally:
+            connections.close_all()
+            connection.settings_dict.update(original)
+            connection_created.connect(tune_sqlite_connection)
+
+    def run_mode(self, context, name, mode, path, options):
+        _use_database(path, mode)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TABLE bench_writes (id INTEGER PRIMARY KEY AUTOINCREMENT, role TEXT, value INTEGER)'
+            )
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+        connections.close_all()  # never share a connection across fork()
+
+        results = context.Queue()
+        roles = ['bot'] * options['bot_processes'] + ['celery'] * options['celery_processes']
+        workers = [
+            context.Process(target=_worker, args=(role, path, mode, options['operations'], results))
+            for role in roles
+        ]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        reports = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+        committed = sum(report[1] for report in reports)
+        locked = sum(report[2] for report in reports)
+        style = self.style.SUCCESS if not locked else self.style.ERROR
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{name} (journal_mode={journal_mode})'))
+        for role in ('bot', 'celery'):
+            role_reports = [report for report in reports if report[0] == role]
+            self.stdout.write(
+                f'  {role:<7} {sum(r[1] for r in role_reports):6} committed  '
+                f'{sum(r[2] for r in role_reports):6} "database is locked"'
+            )
+        self.stdout.write(style(f'  total   {committed:6} committed  {locked:6} locked  '
+                                f'{committed / elapsed:8.0f} tx/s'))
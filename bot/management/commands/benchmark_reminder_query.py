@@ -0,0 +1,126 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from bot.models import CustomUser, StudentTask
+from bot.tasks import get_reminder_recipients
+
+HOT_PATH_INDEXES = ('user_role_telegram_idx', 'task_student_date_idx')
+
+
+class Rollback(Exception):
+    pass
+
+
+def date_cast_recipients(day):
+    """The reminder query as it was before the range rewrite, for comparison."""
+    submitted = StudentTask.objects.filter(student=OuterRef('pk'), submission_date__date=day)
+    return (
+        CustomUser.objects
+        .filter(role='student', telegram_id__isnull=False)
+        .filter(~Exists(submitted))
+        .values_list('id', 'telegram_id')
+    )
+
+
+class Command(BaseCommand):
+    help = 'Time the daily reminder query and telegram_id lookups on synthetic data, with and without the hot-path indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=50000)
+        parser.add_argument('--tasks-per-student', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--explain', action='store_true', help='Print the query plans')
+
+    def handle(self, *args, **options):
+        # Everything happens inside one transaction that is rolled back at the end,
+        # so the synthetic rows and the dropped indexes never reach the real database.
+        try:
+            with transaction.atomic():
+                self.seed(options['students'], options['tasks_per_student'])
+                self.run_suite('with indexes', options)
+                self.drop_indexes()
+                self.run_suite('without indexes', options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, students, tasks_per_student):
+        self.stdout.write(f'Seeding {students} students with {tasks_per_student} tasks each...')
+        base = 9_000_000_000
+        CustomUser.objects.bulk_create(
+            (
+                CustomUser(username=f'bench{i}', role='student', telegram_id=base + i if i % 10 else None)
+                for i in range(students)
+            ),
+            batch_size=5000,
+        )
+        ids = list(CustomUser.objects.filter(username__startswith='bench').values_list('id', flat=True))
+        self.telegram_ids = [base + i for i in range(1, students, 10)]
+
+        now = timezone.now()
+        rng = random.Random(0)
+        tasks = (
+            StudentTask(
+                student_id=student_id,
+                task_name=f'Task {n}',
+                # Roughly half the students have already submitted something today
+                submission_date=now - timedelta(days=n if n or rng.random() < 0.5 else 1, minutes=rng.randint(0, 600)),
+            )
+            for student_id in ids
+            for n in range(tasks_per_student)
+        )
+        # auto_now_add would stamp every row with "now"; keep the spread-out dates instead
+        field = StudentTask._meta.get_field('submission_date')
+        field.auto_now_add = False
+        try:
+            StudentTask.objects.bulk_create(tasks, batch_size=5000)
+        finally:
+            field.auto_now_add = True
+        self.analyze()
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def drop_indexes(self):
+        with connection.cursor() as cursor:
+            for name in HOT_PATH_INDEXES:
+                cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+        self.analyze()
+
+    def time_it(self, repeat, func):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def run_suite(self, label, options):
+        today = timezone.localdate()
+        repeat = options['repeat']
+        queries = {
+            'reminder, __date cast': date_cast_recipients(today),
+            'reminder, range': get_reminder_recipients(today),
+        }
+
+        self.stdout.write(self.style.MIGRATE_HEADING(label))
+        for name, queryset in queries.items():
+            count = len(list(queryset))
+            ms = self.time_it(repeat, lambda: list(queryset.all()))
+            self.stdout.write(f'  {name:<24} {ms:9.1f} ms  ({count} recipients)')
+            if options['explain']:
+                self.stdout.write('    ' + queryset.explain().replace('\n', '\n    '))
+
+        sample = self.telegram_ids[:200]
+        ms = self.time_it(repeat, lambda: [
+            CustomUser.objects.filter(telegram_id=telegram_id).first() for telegram_id in sample
+        ])
+        self.stdout.write(f'  {"telegram_id lookup":<24} {ms / len(sample):9.3f} ms  (per lookup)')
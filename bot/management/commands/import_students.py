@@ -0,0 +1,134 @@
+import csv
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.crypto import get_random_string
+
+from bot.models import CustomUser
+
+USERNAME_CHARS = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+REQUIRED_COLUMNS = ('first_name', 'last_name')
+PROFILE_COLUMNS = ('first_name', 'last_name', 'branch', 'student_class')
+BATCH_SIZE = 1000
+
+
+def unique_student_usernames(count, length=8):
+    """``count`` unused student usernames whose ``<name>_p`` parent username is free as well.
+
+    Candidates are drawn in batches and each batch is checked with a single query.
+    """
+    chosen = []
+    seen = set()
+    while len(chosen) < count:
+        candidates = set()
+        while len(candidates) < count - len(chosen):
+            name = get_random_string(length, allowed_chars=USERNAME_CHARS)
+            if name not in seen:
+                candidates.add(name)
+        seen.update(candidates)
+        taken = set(CustomUser.objects.filter(
+            username__in=[*candidates, *(f'{name}_p' for name in candidates)]
+        ).values_list('username', flat=True))
+        chosen.extend(name for name in candidates if name not in taken and f'{name}_p' not in taken)
+    return chosen
+
+
+def hash_passwords(passwords, workers):
+    """make_password for every password, spread over ``workers`` processes."""
+    if workers <= 1:
+        return [make_password(password) for password in passwords]
+    # The platform's default start method, since fork is not available on Windows. Forked workers
+    # inherit the configured settings; spawned ones load them again through DJANGO_SETTINGS_MODULE.
+    context = multiprocessing.get_context()
+    chunksize = max(1, len(passwords) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        return list(pool.map(make_password, passwords, chunksize=chunksize))
+
+
+class Command(BaseCommand):
+    help = 'Create student accounts, each with a parent account, from a CSV file and write their credentials'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', help='Columns: first_name, last_name, branch, student_class')
+        parser.add_argument('--output', default='student_credentials.csv', help='Credentials sheet to write')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Password hashing processes')
+
+    def handle(self, *args, **options):
+        rows = self.read_rows(options['csv_file'])
+        if not rows:
+            raise CommandError('The CSV file has no students.')
+        if os.path.exists(options['output']):
+            raise CommandError(f"{options['output']} already exists; refusing to overwrite credentials.")
+
+        usernames = unique_student_usernames(len(rows))
+        student_passwords = [get_random_string(10) for _ in rows]
+        parent_passwords = [get_random_string(10) for _ in rows]
+        hashes = hash_passwords(student_passwords + parent_passwords, options['workers'])
+
+        users = []
+        for i, row in enumerate(rows):
+            profile = {
+                'first_name': row['first_name'],
+                'last_name': row['last_name'],
+                'branch': row.get('branch') or None,
+                'student_class': row.get('student_class') or None,
+            }
+            users.append(CustomUser(role='student', username=usernames[i], password=hashes[i], **profile))
+            users.append(CustomUser(
+                role='parent', username=f'{usernames[i]}_p', password=hashes[len(rows) + i], **profile
+            ))
+
+        # The sheet is written inside the transaction: accounts exist only if their credentials were saved
+        created_sheet = False
+        try:
+            with transaction.atomic():
+                CustomUser.objects.bulk_create(users, batch_size=BATCH_SIZE)
+                with open(options['output'], 'x', newline='', encoding='utf-8') as f:
+                    created_sheet = True
+                    writer = csv.writer(f)
+                    writer.writerow([
+                        'first_name', 'last_name', 'branch', 'student_class',
+                        'student_login', 'student_password', 'parent_login', 'parent_password',
+                    ])
+                    writer.writerows(
+                        [row['first_name'], row['last_name'], row.get('branch', ''), row.get('student_class', ''),
+                         usernames[i], student_passwords[i], f'{usernames[i]}_p', parent_passwords[i]]
+                        for i, row in enumerate(rows)
+                    )
+        except FileExistsError:
+            raise CommandError(f"{options['output']} appeared while importing; refusing to overwrite credentials.")
+        except Exception:
+            if created_sheet:
+                os.remove(options['output'])  # those accounts were rolled back
+            raise
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(rows)} students and {len(rows)} parents; credentials written to {options['output']}"
+        ))
+
+    def read_rows(self, path):
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as f:
+                reader = csv.DictReader(f)
+                missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+                if missing:
+                    raise CommandError(f"Missing column(s): {', '.join(missing)}")
+                rows = [
+                    {key: (value or '').strip() for key, value in row.items() if key}
+                    for row in reader
+                ]
+        except OSError as e:
+            raise CommandError(f'Cannot read {path}: {e}')
+
+        limits = {column: CustomUser._meta.get_field(column).max_length for column in PROFILE_COLUMNS}
+        for line, row in enumerate(rows, start=2):
+            if not row['first_name'] or not row['last_name']:
+                raise CommandError(f'Line {line}: first_name and last_name are required')
+            for column, max_length in limits.items():
+                if len(row.get(column) or '') > max_length:
+                    raise CommandError(f'Line {line}: {column} is longer than {max_length} characters')
+        return rows
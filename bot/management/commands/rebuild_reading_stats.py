@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from bot.models import CustomUser
+from bot.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute StudentReadingStats from the reading submissions and task videos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*', help='Only rebuild these students (default: everyone)')
+
+    def handle(self, *args, **options):
+        student_ids = None
+        if options['usernames']:
+            found = dict(CustomUser.objects.filter(username__in=options['usernames']).values_list('username', 'id'))
+            missing = sorted(set(options['usernames']) - set(found))
+            if missing:
+                raise CommandError(f"Unknown username(s): {', '.join(missing)}")
+            student_ids = list(found.values())
+
+        written = rebuild_stats(student_ids)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} monthly stats rows'))
@@ -1,13 +1,22 @@
+from django.conf import settings
 from django.core.management.base import BaseCommand
 import asyncio
-from bot.telegram_bot import main as run_telegram_bot
+from bot.telegram_bot import main as run_telegram_bot, run_webhook
 
 class Command(BaseCommand):
     help = 'Run the Telegram bot'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--webhook', action='store_true', help='Serve updates over a webhook instead of long polling')
+        parser.add_argument('--host', default=settings.BOT_WEBHOOK_HOST, help='Webhook listen address')
+        parser.add_argument('--port', type=int, default=settings.BOT_WEBHOOK_PORT, help='Webhook listen port')
+
     def handle(self, *args, **options):
         try:
-            asyncio.run(run_telegram_bot())
+            if options['webhook']:
+                run_webhook(options['host'], options['port'])
+            else:
+                asyncio.run(run_telegram_bot())
         except KeyboardInterrupt:
             self.stdout.write(self.style.SUCCESS('Bot stopped gracefully'))
         except Exception as e:
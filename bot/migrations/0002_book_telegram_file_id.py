@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 06:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='telegram_file_id',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+    ]
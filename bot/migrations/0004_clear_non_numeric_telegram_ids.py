@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+def clear_non_numeric_telegram_ids(apps, schema_editor):
+    """telegram_id becomes a bigint next; anything that isn't a number can't be kept."""
+    CustomUser = apps.get_model('bot', 'CustomUser')
+    for user in CustomUser.objects.exclude(telegram_id__isnull=True).only('id', 'telegram_id'):
+        value = str(user.telegram_id).strip()
+        if not value.lstrip('-').isdigit():
+            CustomUser.objects.filter(pk=user.pk).update(telegram_id=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0003_notification_outbox'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_non_numeric_telegram_ids, migrations.RunPython.noop),
+    ]
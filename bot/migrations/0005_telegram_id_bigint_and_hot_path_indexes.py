@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-18 06:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('bot', '0004_clear_non_numeric_telegram_ids'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='telegram_id',
+            field=models.BigIntegerField(blank=True, null=True, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['role', 'telegram_id'], name='user_role_telegram_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='readingsubmission',
+            index=models.Index(fields=['student', 'month'], name='reading_student_month_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studenttask',
+            index=models.Index(fields=['student', 'submission_date'], name='task_student_date_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.1 on 2026-10-18 06:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0005_telegram_id_bigint_and_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='period',
+            field=models.DateField(help_text='Any day of the month the book is assigned to; stored as the 1st', null=True),
+        ),
+        migrations.AddField(
+            model_name='custombook',
+            name='period',
+            field=models.DateField(null=True),
+        ),
+        migrations.AddField(
+            model_name='readingsubmission',
+            name='period',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='book',
+            name='month',
+            field=models.CharField(editable=False, max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='custombook',
+            name='month',
+            field=models.CharField(editable=False, max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='readingsubmission',
+            name='month',
+            field=models.CharField(blank=True, editable=False, max_length=50, null=True),
+        ),
+    ]
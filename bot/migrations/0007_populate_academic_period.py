@@ -0,0 +1,88 @@
+from datetime import date
+
+from django.db import migrations
+from django.utils import timezone
+
+MONTHS = ["january", "february", "march", "april", "may", "june",
+          "july", "august", "september", "october", "november", "december"]
+ACADEMIC_YEAR_START_MONTH = 9
+
+
+def period_for(month_name, created):
+    """The named month in the academic year the row was created in; the creation month if the name is unknown."""
+    created = timezone.localtime(created).date() if created else timezone.localdate()
+    try:
+        month = MONTHS.index((month_name or '').strip().lower()) + 1
+    except ValueError:
+        return created.replace(day=1)
+    start_year = created.year if created.month >= ACADEMIC_YEAR_START_MONTH else created.year - 1
+    return date(start_year if month >= ACADEMIC_YEAR_START_MONTH else start_year + 1, month, 1)
+
+
+def populate_periods(apps, schema_editor):
+    Book = apps.get_model('bot', 'Book')
+    CustomBook = apps.get_model('bot', 'CustomBook')
+    ReadingSubmission = apps.get_model('bot', 'ReadingSubmission')
+
+    # month is left as typed: rewriting it could collide with the (title, month) unique constraint
+    for book in Book.objects.only('id', 'month', 'upload_date').iterator():
+        Book.objects.filter(pk=book.pk).update(period=period_for(book.month, book.upload_date))
+
+    for custom_book in CustomBook.objects.only('id', 'month', 'creation_date').iterator():
+        CustomBook.objects.filter(pk=custom_book.pk).update(
+            period=period_for(custom_book.month, custom_book.creation_date)
+        )
+
+    submissions = ReadingSubmission.objects.select_related('book', 'custom_book').only(
+        'id', 'month', 'submission_date', 'book__period', 'custom_book__period'
+    )
+    for submission in submissions.iterator():
+        if submission.book_id:
+            period = submission.book.period
+        elif submission.custom_book_id:
+            period = submission.custom_book.period
+        elif submission.month:
+            period = period_for(submission.month, submission.submission_date)
+        else:
+            continue
+        ReadingSubmission.objects.filter(pk=submission.pk).update(period=period)
+
+    # (title, month) allowed "October" next to "october", and unknown month names fall back to the
+    # creation month; such rows now share a period, so rename them before 0008 makes it unique
+    rename_period_duplicates(Book, 'title', ())
+    rename_period_duplicates(CustomBook, 'name', ('created_by_id',))
+
+
+def rename_period_duplicates(model, name_field, scope_fields):
+    """Give every row but the oldest of a (name, scope, period) group a numbered name, e.g. "Alpomish (2)"."""
+    fields = (name_field, *scope_fields, 'period')
+    rows = list(model.objects.order_by('id').values_list('id', *fields))
+    taken = {tuple(row[1:]) for row in rows}
+    kept = set()
+    max_length = model._meta.get_field(name_field).max_length
+    for pk, *key in rows:
+        key = tuple(key)
+        if key not in kept:
+            kept.add(key)
+            continue
+        name, rest = key[0], key[1:]
+        number = 2
+        while True:
+            suffix = f' ({number})'
+            candidate = (name[:max_length - len(suffix)] + suffix, *rest)
+            if candidate not in taken:
+                break
+            number += 1
+        taken.add(candidate)
+        model.objects.filter(pk=pk).update(**{name_field: candidate[0]})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0006_add_academic_period'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_periods, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.1 on 2026-10-18 06:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0007_populate_academic_period'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='readingsubmission',
+            name='reading_student_month_idx',
+        ),
+        migrations.AlterUniqueTogether(
+            name='book',
+            unique_together=set(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='custombook',
+            unique_together=set(),
+        ),
+        migrations.AlterField(
+            model_name='book',
+            name='period',
+            field=models.DateField(help_text='Any day of the month the book is assigned to; stored as the 1st'),
+        ),
+        migrations.AlterField(
+            model_name='custombook',
+            name='period',
+            field=models.DateField(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='book',
+            unique_together={('title', 'period')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='custombook',
+            unique_together={('name', 'created_by', 'period')},
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['period', 'title'], name='book_period_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='readingsubmission',
+            index=models.Index(fields=['student', 'period'], name='reading_student_period_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:08
+
+import bot.models
+import bot.storage
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0008_academic_period_constraints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('size', models.PositiveBigIntegerField()),
+                ('refcount', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='book',
+            name='file',
+            field=models.FileField(storage=bot.storage.media_storage, upload_to=bot.models.book_upload_path, validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['pdf', 'doc', 'docx', 'txt'])]),
+        ),
+        migrations.AlterField(
+            model_name='readingsubmission',
+            name='voice_file',
+            field=models.FileField(blank=True, null=True, storage=bot.storage.media_storage, upload_to=bot.models.reading_voice_upload_path),
+        ),
+        migrations.AlterField(
+            model_name='studenttask',
+            name='video_file',
+            field=models.FileField(blank=True, null=True, storage=bot.storage.media_storage, upload_to=bot.models.task_video_upload_path, validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['mp4', 'mov', 'avi', 'mkv'])]),
+        ),
+    ]
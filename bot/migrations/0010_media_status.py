@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0009_media_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='readingsubmission',
+            name='media_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('stored', 'Stored'), ('failed', 'Failed')], default='stored', editable=False, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='studenttask',
+            name='media_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('stored', 'Stored'), ('failed', 'Failed')], default='stored', editable=False, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='studenttask',
+            name='telegram_file_id',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+    ]
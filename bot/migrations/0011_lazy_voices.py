@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0010_media_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='readingsubmission',
+            name='voice_file_unique_id',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='readingsubmission',
+            name='media_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('stored', 'Stored'), ('failed', 'Failed'), ('remote', 'On Telegram')], default='stored', editable=False, max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='studenttask',
+            name='media_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('stored', 'Stored'), ('failed', 'Failed'), ('remote', 'On Telegram')], default='stored', editable=False, max_length=10),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0011_lazy_voices'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['upload_date'], name='book_upload_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='readingsubmission',
+            index=models.Index(fields=['submission_date'], name='reading_submission_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studenttask',
+            index=models.Index(fields=['submission_date'], name='task_submission_date_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0012_admin_date_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentReadingStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField()),
+                ('books_read', models.PositiveIntegerField(default=0)),
+                ('pages_read', models.PositiveIntegerField(default=0)),
+                ('tasks_submitted', models.PositiveIntegerField(default=0)),
+                ('submission_days', models.PositiveIntegerField(default=0)),
+                ('last_submission_date', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reading_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'student reading stats',
+                'ordering': ['-period'],
+                'constraints': [models.UniqueConstraint(fields=('student', 'period'), name='unique_student_stats_period')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0013_student_reading_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='readingsubmission',
+            name='media_lease_until',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='studenttask',
+            name='media_lease_until',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='readingsubmission',
+            name='media_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('copying', 'Copying'), ('stored', 'Stored'), ('failed', 'Failed'), ('remote', 'On Telegram')], default='stored', editable=False, max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='studenttask',
+            name='media_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('copying', 'Copying'), ('stored', 'Stored'), ('failed', 'Failed'), ('remote', 'On Telegram')], default='stored', editable=False, max_length=10),
+        ),
+    ]
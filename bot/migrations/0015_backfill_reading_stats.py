@@ -0,0 +1,61 @@
+from collections import defaultdict
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def period_of(submitted_at, period=None):
+    """Month a submission counts towards: its reading period, else the month it was sent in."""
+    if period is not None:
+        return period.replace(day=1)
+    return timezone.localdate(submitted_at).replace(day=1)
+
+
+def backfill_reading_stats(apps, schema_editor):
+    """Build StudentReadingStats from the existing submissions.
+
+    A frozen copy of bot.stats.rebuild_stats, so later changes to it do not change this migration.
+    """
+    ReadingSubmission = apps.get_model('bot', 'ReadingSubmission')
+    StudentTask = apps.get_model('bot', 'StudentTask')
+    StudentReadingStats = apps.get_model('bot', 'StudentReadingStats')
+
+    totals = defaultdict(lambda: {'books_read': 0, 'pages_read': 0, 'tasks_submitted': 0, 'days': set()})
+    readings = ReadingSubmission.objects.values('student_id', 'period', 'submission_date', 'page_count')
+    for row in readings.iterator(chunk_size=2000):
+        entry = totals[row['student_id'], period_of(row['submission_date'], row['period'])]
+        entry['books_read'] += 1
+        entry['pages_read'] += row['page_count'] or 0
+        entry['days'].add(timezone.localdate(row['submission_date']))
+    for row in StudentTask.objects.values('student_id', 'submission_date').iterator(chunk_size=2000):
+        entry = totals[row['student_id'], period_of(row['submission_date'])]
+        entry['tasks_submitted'] += 1
+        entry['days'].add(timezone.localdate(row['submission_date']))
+
+    StudentReadingStats.objects.all().delete()
+    StudentReadingStats.objects.bulk_create(
+        [
+            StudentReadingStats(
+                student_id=student_id,
+                period=period,
+                books_read=entry['books_read'],
+                pages_read=entry['pages_read'],
+                tasks_submitted=entry['tasks_submitted'],
+                submission_days=len(entry['days']),
+                last_submission_date=max(entry['days']),
+            )
+            for (student_id, period), entry in totals.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0014_media_claims'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_reading_stats, migrations.RunPython.noop),
+    ]
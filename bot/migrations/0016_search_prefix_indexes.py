@@ -0,0 +1,21 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0015_backfill_reading_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['title'], name='book_title_like_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='custombook',
+            index=models.Index(fields=['name'], name='custombook_name_like_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
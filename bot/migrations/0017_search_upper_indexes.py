@@ -0,0 +1,55 @@
+from django.contrib.postgres.indexes import OpClass
+from django.db import migrations, models
+from django.db.models.functions import Upper
+
+# istartswith searches UPPER(column) LIKE UPPER('x%'). Under a non-C collation PostgreSQL only
+# serves that LIKE from a b-tree built with a pattern opclass, which SQLite does not understand,
+# so the database gets the opclass on PostgreSQL only and the model state records a plain index.
+UPPER_INDEXES = [
+    ('book', 'title', 'book_title_upper_idx'),
+    ('custombook', 'name', 'custombook_name_upper_idx'),
+]
+
+
+def upper_index(field, name, vendor):
+    expression = Upper(field)
+    if vendor == 'postgresql':
+        expression = OpClass(expression, name='varchar_pattern_ops')
+    return models.Index(expression, name=name)
+
+
+def add_upper_indexes(apps, schema_editor):
+    for model_name, field, name in UPPER_INDEXES:
+        index = upper_index(field, name, schema_editor.connection.vendor)
+        schema_editor.add_index(apps.get_model('bot', model_name), index)
+
+
+def remove_upper_indexes(apps, schema_editor):
+    for model_name, field, name in UPPER_INDEXES:
+        index = upper_index(field, name, schema_editor.connection.vendor)
+        schema_editor.remove_index(apps.get_model('bot', model_name), index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0016_search_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(model_name='book', name='book_title_like_idx'),
+        migrations.RemoveIndex(model_name='custombook', name='custombook_name_like_idx'),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunPython(add_upper_indexes, remove_upper_indexes)],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='book',
+                    index=models.Index(Upper('title'), name='book_title_upper_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='custombook',
+                    index=models.Index(Upper('name'), name='custombook_name_upper_idx'),
+                ),
+            ],
+        ),
+    ]
@@ -1,10 +1,14 @@
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import FileExtensionValidator
 from django.db import models
+from django.db.models.functions import Upper
 from django.core.exceptions import ValidationError
-from django.core.files.storage import default_storage
+from django.utils import timezone
 import os
 
+from .storage import media_storage
+from .utils.periods import academic_period, month_name
+
 # ========== Upload Paths ==========
 
 def book_upload_path(instance, filename):
@@ -22,6 +26,26 @@ def reading_voice_upload_path(instance, filename):
     else:
         return f'reading_voices/{instance.student.username}/unknown/{filename}'
 
+def normalize_period(instance):
+    """Keep ``period`` on the first of the month and ``month`` as its display name.
+
+    Rows created with only a month name get the period of that month in the current academic year.
+    """
+    if instance.period is None and instance.month:
+        instance.period = academic_period(instance.month)
+    if instance.period is not None:
+        instance.period = instance.period.replace(day=1)
+        instance.month = month_name(instance.period)
+
+# Whether an uploaded video/voice has been copied from Telegram into storage yet
+MEDIA_STATUS_CHOICES = (
+    ('pending', 'Pending'),
+    ('copying', 'Copying'),  # claimed by a media queue worker until media_lease_until
+    ('stored', 'Stored'),
+    ('failed', 'Failed'),
+    ('remote', 'On Telegram'),  # VOICE_STORAGE_MODE='lazy': fetched into the voice cache when played
+)
+
 # ========== User Model ==========
 
 class CustomUser(AbstractUser):
@@ -35,7 +59,12 @@ class CustomUser(AbstractUser):
     role = models.CharField(max_length=20, choices=ROLE_CHOICES)
     branch = models.CharField(max_length=100, blank=True, null=True)
     student_class = models.CharField(max_length=100, blank=True, null=True)
-    telegram_id = models.CharField(max_length=50, unique=True, null=True, blank=True)
+    telegram_id = models.BigIntegerField(unique=True, null=True, blank=True)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['role', 'telegram_id'], name='user_role_telegram_idx'),
+        ]
 
     def __str__(self):
         return self.username
@@ -43,34 +72,54 @@ class CustomUser(AbstractUser):
 # ========== Book Model ==========
 class Book(models.Model):
     title = models.CharField(max_length=255)
-    month = models.CharField(max_length=20)
-    file = models.FileField(upload_to=book_upload_path, validators=[FileExtensionValidator(allowed_extensions=['pdf', 'doc', 'docx', 'txt'])])
+    month = models.CharField(max_length=20, editable=False)
+    period = models.DateField(help_text="Any day of the month the book is assigned to; stored as the 1st")
+    file = models.FileField(upload_to=book_upload_path, storage=media_storage, validators=[FileExtensionValidator(allowed_extensions=['pdf', 'doc', 'docx', 'txt'])])
     uploaded_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, limit_choices_to={'role': 'coordinator'})
     upload_date = models.DateTimeField(auto_now_add=True)
+    telegram_file_id = models.CharField(max_length=255, blank=True, editable=False)
 
     class Meta:
         ordering = ['-upload_date']
-        unique_together = ('title', 'month')
+        unique_together = ('title', 'period')
+        indexes = [
+            models.Index(fields=['period', 'title'], name='book_period_title_idx'),
+            models.Index(fields=['upload_date'], name='book_upload_date_idx'),
+            # Admin search, UPPER(title) LIKE UPPER('x%'); 0017 adds varchar_pattern_ops on PostgreSQL
+            models.Index(Upper('title'), name='book_title_upper_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        normalize_period(self)
+        super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"{self.title} ({self.month})"
+        return f"{self.title} ({self.month} {self.period.year})" if self.period else self.title
 
     @property
     def file_exists(self):
         if self.file:
-            return default_storage.exists(self.file.name)
+            return self.file.storage.exists(self.file.name)
         return False
 
 # ========== Student Task Model ==========
 class StudentTask(models.Model):
     student = models.ForeignKey(CustomUser, on_delete=models.CASCADE, limit_choices_to={'role': 'student'})
     task_name = models.CharField(max_length=255)
-    video_file = models.FileField(upload_to=task_video_upload_path, null=True, blank=True, validators=[FileExtensionValidator(allowed_extensions=['mp4', 'mov', 'avi', 'mkv'])])
+    video_file = models.FileField(upload_to=task_video_upload_path, storage=media_storage, null=True, blank=True, validators=[FileExtensionValidator(allowed_extensions=['mp4', 'mov', 'avi', 'mkv'])])
+    telegram_file_id = models.CharField(max_length=255, blank=True, editable=False)
+    media_status = models.CharField(max_length=10, choices=MEDIA_STATUS_CHOICES, default='stored', editable=False)
+    media_lease_until = models.DateTimeField(null=True, blank=True, editable=False)
     submission_date = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-submission_date']
         unique_together = ('student', 'task_name')
+        indexes = [
+            models.Index(fields=['student', 'submission_date'], name='task_student_date_idx'),
+            # Admin ordering and date hierarchy
+            models.Index(fields=['submission_date'], name='task_submission_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student.username} - {self.task_name}"
@@ -80,12 +129,20 @@ class StudentTask(models.Model):
 class CustomBook(models.Model):
     name = models.CharField(max_length=255)
     created_by = models.ForeignKey(CustomUser, on_delete=models.CASCADE, limit_choices_to={'role': 'student'})
-    month = models.CharField(max_length=20)
+    month = models.CharField(max_length=20, editable=False)
+    period = models.DateField()
     creation_date = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-creation_date']
-        unique_together = ('name', 'created_by', 'month')
+        unique_together = ('name', 'created_by', 'period')
+        indexes = [
+            models.Index(Upper('name'), name='custombook_name_upper_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        normalize_period(self)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
@@ -94,11 +151,15 @@ class ReadingSubmission(models.Model):
     student = models.ForeignKey(CustomUser, on_delete=models.CASCADE, limit_choices_to={'role': 'student'})
     book = models.ForeignKey(Book, on_delete=models.CASCADE, null=True, blank=True)
     custom_book = models.ForeignKey(CustomBook, on_delete=models.CASCADE, null=True, blank=True)
-    voice_file = models.FileField(upload_to=reading_voice_upload_path, null=True, blank=True)
+    voice_file = models.FileField(upload_to=reading_voice_upload_path, storage=media_storage, null=True, blank=True)
     voice_message_id = models.CharField(max_length=255, blank=True)
+    voice_file_unique_id = models.CharField(max_length=64, blank=True, editable=False)
+    media_status = models.CharField(max_length=10, choices=MEDIA_STATUS_CHOICES, default='stored', editable=False)
+    media_lease_until = models.DateTimeField(null=True, blank=True, editable=False)
     page_count = models.PositiveIntegerField(null=True, blank=True)
     submission_date = models.DateTimeField(auto_now_add=True)
-    month = models.CharField(max_length=50, blank=True, null=True)
+    month = models.CharField(max_length=50, blank=True, null=True, editable=False)
+    period = models.DateField(null=True, blank=True)
 
     class Meta:
         ordering = ['-submission_date']
@@ -114,6 +175,11 @@ class ReadingSubmission(models.Model):
                 condition=models.Q(custom_book__isnull=False)
             )
         ]
+        indexes = [
+            models.Index(fields=['student', 'period'], name='reading_student_period_idx'),
+            # Admin ordering and date hierarchy
+            models.Index(fields=['submission_date'], name='reading_submission_date_idx'),
+        ]
 
     def clean(self):
         if not self.book and not self.custom_book:
@@ -122,9 +188,84 @@ class ReadingSubmission(models.Model):
             raise ValidationError("Only one of book or custom_book can be set.")
 
     def save(self, *args, **kwargs):
+        if self.period is None and self.book_id:
+            self.period = self.book.period
+        normalize_period(self)
         self.full_clean()
         super().save(*args, **kwargs)
 
     def __str__(self):
         book_title = self.book.title if self.book else self.custom_book.name
-        return f"{self.student.username} - {book_title} ({self.month})"
\ No newline at end of file
+        return f"{self.student.username} - {book_title} ({self.month})"
+
+
+# ========== Reading Stats Model ==========
+class StudentReadingStats(models.Model):
+    """Running totals for one student and month, maintained by bot.stats alongside the submissions.
+
+    ``manage.py rebuild_reading_stats`` recomputes them from ReadingSubmission and StudentTask.
+    """
+    student = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='reading_stats')
+    period = models.DateField()
+    books_read = models.PositiveIntegerField(default=0)
+    pages_read = models.PositiveIntegerField(default=0)
+    tasks_submitted = models.PositiveIntegerField(default=0)
+    submission_days = models.PositiveIntegerField(default=0)
+    last_submission_date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-period']
+        verbose_name_plural = 'student reading stats'
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'period'], name='unique_student_stats_period')
+        ]
+
+    def __str__(self):
+        return f"{self.student.username} - {self.period:%Y-%m}"
+
+
+# ========== Notification Outbox Model ==========
+class NotificationOutbox(models.Model):
+    """One row per recipient per notification run, so sends are idempotent and resumable."""
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+        ('skipped', 'Skipped'),
+    )
+    run_key = models.CharField(max_length=100)
+    recipient = models.ForeignKey(CustomUser, on_delete=models.CASCADE, null=True, blank=True)
+    chat_id = models.CharField(max_length=50)
+    message = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['run_key', 'chat_id'], name='unique_outbox_run_recipient')
+        ]
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx')
+        ]
+
+    def __str__(self):
+        return f"{self.run_key} -> {self.chat_id} ({self.status})"
+
+
+# ========== Deduplicated Media Models ==========
+class MediaBlob(models.Model):
+    """One stored copy of some file content; ``refcount`` is the number of media fields pointing at it."""
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    size = models.PositiveBigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.refcount} refs)"
+
@@ -0,0 +1,102 @@
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import NotificationOutbox
+from .utils.broadcast import OutgoingMessage, run_broadcast
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+CLAIM_LEASE = timedelta(minutes=5)  # a crashed worker's batch becomes due again after this
+RETRY_BASE_DELAY = timedelta(minutes=1)
+
+
+def enqueue_notifications(run_key, recipients, message, batch_size=1000):
+    """Create one pending outbox row per (user_id, chat_id); rows already in this run are left alone."""
+    rows = (
+        NotificationOutbox(run_key=run_key, recipient_id=user_id, chat_id=str(chat_id), message=message)
+        for user_id, chat_id in recipients
+    )
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            NotificationOutbox.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        NotificationOutbox.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def due_notifications(run_key=None):
+    qs = NotificationOutbox.objects.filter(
+        status__in=['pending', 'failed'],
+        attempts__lt=MAX_ATTEMPTS,
+        next_attempt_at__lte=timezone.now(),
+    )
+    if run_key:
+        qs = qs.filter(run_key=run_key)
+    return qs
+
+
+def _claim_batch(queryset, batch_size):
+    """Lease a batch of due rows so concurrent drainers never pick the same recipient."""
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            queryset.select_for_update(skip_locked=True)
+            .order_by('id')
+            .values('id', 'chat_id', 'message', 'attempts')[:batch_size]
+        )
+        NotificationOutbox.objects.filter(id__in=[row['id'] for row in rows]).update(
+            attempts=F('attempts') + 1,
+            next_attempt_at=now + CLAIM_LEASE,
+        )
+    return rows
+
+
+def _record_results(rows, result):
+    now = timezone.now()
+    NotificationOutbox.objects.filter(id__in=result.sent).update(status='sent', sent_at=now, last_error='')
+
+    attempts = {row['id']: row['attempts'] + 1 for row in rows}
+    for row_id in result.skipped:
+        NotificationOutbox.objects.filter(id=row_id).update(status='skipped', last_error=result.errors.get(row_id, ''))
+    for row_id in result.failed:
+        delay = RETRY_BASE_DELAY * 2 ** (attempts[row_id] - 1)
+        NotificationOutbox.objects.filter(id=row_id).update(
+            status='failed',
+            next_attempt_at=now + delay,
+            last_error=result.errors.get(row_id) or '',
+        )
+
+
+def deliver_outbox(queryset=None, batch_size=500, rate=None):
+    """Send due outbox rows in batches and record the outcome of each one.
+
+    Only pending and failed rows are picked up, so re-running a drain never
+    messages someone twice.
+    """
+    if queryset is None:
+        queryset = due_notifications()
+
+    totals = Counter(sent=0, skipped=0, failed=0)
+    while True:
+        rows = _claim_batch(queryset, batch_size)
+        if not rows:
+            break
+        result = run_broadcast(
+            (OutgoingMessage(chat_id=row['chat_id'], text=row['message'], key=row['id']) for row in rows),
+            max_attempts=2,
+            rate=rate,
+        )
+        _record_results(rows, result)
+        totals.update(result.summary())
+
+    if totals['failed']:
+        logger.warning(f"Outbox drain left {totals['failed']} notifications for retry")
+    return dict(totals)
@@ -1,39 +1,113 @@
 # services/book_service.py
+import logging
+import uuid
+from datetime import date
+from typing import NamedTuple
+
 from asgiref.sync import sync_to_async
-from django.core.files.base import ContentFile
 from django.core.cache import cache
-from bot.models import Book, CustomBook
+from bot.models import Book, CustomBook, normalize_period
+from bot.utils.executors import run_blocking
+from bot.utils.files import to_django_file
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION_KEY = "books:catalog:version"
+CATALOG_TIMEOUT = 60 * 60 * 24
+
+
+class BookRow(NamedTuple):
+    id: int
+    title: str
+    period: date
+    telegram_file_id: str
+
+
+async def _catalog_version():
+    version = await cache.aget(CATALOG_VERSION_KEY)
+    if version is None:
+        await cache.aadd(CATALOG_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = await cache.aget(CATALOG_VERSION_KEY)
+    return version
+
+
+def invalidate_book_catalog():
+    """Retire every cached catalog entry at once by moving to a new key version.
+
+    Called once the book change is committed, so a cache outage is logged instead of
+    failing the request that saved it; the catalog then stays stale for up to CATALOG_TIMEOUT.
+    """
+    try:
+        cache.set(CATALOG_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+    except Exception:
+        logger.warning("Could not invalidate the book catalog cache", exc_info=True)
+
+
+async def books_for_period(period):
+    """Catalog rows for the month starting at ``period``; empty months are cached too."""
+    cache_key = f"books:period:{await _catalog_version()}:{period.isoformat()}"
+    rows = await cache.aget(cache_key)
+    if rows is None:
+        books = Book.objects.filter(period=period).order_by('title')
+        rows = [row async for row in books.values_list('id', 'title', 'period', 'telegram_file_id')]
+        await cache.aset(cache_key, rows, timeout=CATALOG_TIMEOUT)
+    return [BookRow(*row) for row in rows]
+
 
 class BookService:
     @staticmethod
-    @sync_to_async
-    def save_book(user, title, month, file_bytes, filename):
-        book = Book(title=title, month=month, uploaded_by=user)
-        book.file.save(filename, ContentFile(file_bytes))
-        book.save()
+    async def save_book(user, title, period, file, filename, telegram_file_id=''):
+        """``file`` may be bytes, a file-like object or an iterable of chunks."""
+        book = Book(title=title, period=period, uploaded_by=user, telegram_file_id=telegram_file_id or '')
+        normalize_period(book)  # the upload path needs the month name before the file is written
+        await run_blocking(book.file.save, filename, to_django_file(file, filename), save=False)
+        await book.asave()
         return book
 
     @staticmethod
-    @sync_to_async
-    def get_books_for_month(month):
-        cache_key = f"books_{month.lower()}"
-        books = cache.get(cache_key)
-        if not books:
-            books = list(Book.objects.filter(month__iexact=month))
-            cache.set(cache_key, books, timeout=60 * 60)
-        return books
+    async def get_books_for_period(period):
+        return await books_for_period(period)
 
     @staticmethod
-    @sync_to_async
-    def get_book_by_id(book_id):
-        return Book.objects.get(id=book_id)
+    async def get_available_periods():
+        """Periods that have at least one book, oldest first."""
+        cache_key = f"books:periods:{await _catalog_version()}"
+        periods = await cache.aget(cache_key)
+        if periods is None:
+            periods = [
+                period async for period in
+                Book.objects.order_by('period').values_list('period', flat=True).distinct()
+            ]
+            await cache.aset(cache_key, periods, timeout=CATALOG_TIMEOUT)
+        return periods
 
     @staticmethod
-    @sync_to_async
-    def create_custom_book(student, month, name):
-        return CustomBook.objects.create(created_by=student, month=month, name=name)
+    async def get_book_by_id(book_id):
+        return await Book.objects.filter(id=book_id).afirst()
 
     @staticmethod
-    @sync_to_async
-    def get_all_books_ordered():
-        return list(Book.objects.all().order_by('month', 'title'))
\ No newline at end of file
+    async def set_book_file_id(book_id, telegram_file_id):
+        await Book.objects.filter(id=book_id).aupdate(telegram_file_id=telegram_file_id)
+        await sync_to_async(invalidate_book_catalog)()
+
+    @staticmethod
+    async def get_or_create_custom_book(student, period, name):
+        custom_book, _ = await CustomBook.objects.aget_or_create(created_by=student, period=period, name=name)
+        return custom_book
+
+    @staticmethod
+    async def iter_book_listing(period=None, uploader=None, chunk_size=500):
+        """Yield (id, title, period, uploader username) rows ordered by period, fetched in chunks.
+
+        Only the listed columns are selected and rows are streamed from the cursor,
+        so memory use does not grow with the catalog.
+        """
+        books = Book.objects.order_by('period', 'title')
+        if period:
+            books = books.filter(period=period)
+        if uploader:
+            books = books.filter(uploaded_by__username=uploader)
+        # values() rather than values_list(): the latter runs the query eagerly when it spans a relation
+        rows = books.values('id', 'title', 'period', 'uploaded_by__username')
+        async for row in rows.aiterator(chunk_size):
+            yield row['id'], row['title'], row['period'], row['uploaded_by__username']
\ No newline at end of file
@@ -0,0 +1,42 @@
+from typing import NamedTuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from bot.leaderboards import board_key, get_leaderboards
+from bot.models import CustomUser
+from bot.utils.executors import run_blocking
+
+
+class Leaderboard(NamedTuple):
+    scope: str
+    name: str
+    top: list  # (display name, pages)
+    own: tuple | None  # (rank, pages) of the student asked about
+
+
+class LeaderboardService:
+    @staticmethod
+    async def get_boards(student, window, today=None):
+        """The class and branch boards ``student`` is on for this week or month."""
+        day = today or timezone.localdate()
+        scopes = [('class', student.student_class), ('branch', student.branch)]
+        keys = [(scope, name, board_key(window, day, scope, name)) for scope, name in scopes if name]
+
+        def read():
+            leaderboards = get_leaderboards()
+            return [
+                (leaderboards.top(key, settings.LEADERBOARD_SIZE), leaderboards.rank(key, str(student.id)))
+                for _, _, key in keys
+            ]
+
+        results = await run_blocking(read)
+        ids = {int(member) for top, _ in results for member, _ in top}
+        names = {
+            row['id']: f"{row['first_name']} {row['last_name']}".strip() or row['username']
+            async for row in CustomUser.objects.filter(id__in=ids).values('id', 'first_name', 'last_name', 'username')
+        }
+        return [
+            Leaderboard(scope, name, [(names.get(int(member), '?'), pages) for member, pages in top], own)
+            for (scope, name, _), (top, own) in zip(keys, results)
+        ]
@@ -0,0 +1,64 @@
+# services/menu_service.py
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from django.conf import settings
+from django.core.cache import cache
+
+from bot.services.book_service import CATALOG_TIMEOUT, _catalog_version, books_for_period
+from bot.utils.periods import period_to_key
+
+OTHER_BOOK_BUTTON = InlineKeyboardButton(text="Boshqa kitob", callback_data="other_book")
+
+
+def _menu_key(version, period, page):
+    return f"books:menu:{version}:{period.isoformat()}:{page}"
+
+
+def build_book_menu_pages(period, books, page_size):
+    """One InlineKeyboardMarkup per page of ``books``, with previous/next buttons between pages."""
+    pages = [books[i:i + page_size] for i in range(0, len(books), page_size)]
+    markups = []
+    for number, page_books in enumerate(pages):
+        rows = [[InlineKeyboardButton(text=book.title, callback_data=f"book_{book.id}")] for book in page_books]
+        if len(pages) > 1:
+            nav = []
+            if number > 0:
+                nav.append(InlineKeyboardButton(
+                    text="⬅️", callback_data=f"bookpage_{period_to_key(period)}_{number - 1}"
+                ))
+            nav.append(InlineKeyboardButton(text=f"{number + 1}/{len(pages)}", callback_data="bookpage_noop"))
+            if number < len(pages) - 1:
+                nav.append(InlineKeyboardButton(
+                    text="➡️", callback_data=f"bookpage_{period_to_key(period)}_{number + 1}"
+                ))
+            rows.append(nav)
+        rows.append([OTHER_BOOK_BUTTON])
+        markups.append(InlineKeyboardMarkup(inline_keyboard=rows))
+    return markups
+
+
+class MenuService:
+    @staticmethod
+    async def get_book_menu(period, page=0):
+        """The serialized-and-cached keyboard for one page of ``period``'s books, or None if it has none.
+
+        A miss renders every page of the period at once, so paging through a month
+        never goes back to the database. Entries are keyed by the catalog version
+        and disappear with it.
+        """
+        version = await _catalog_version()
+        cached = await cache.aget(_menu_key(version, period, page))
+        if cached is None:
+            markups = build_book_menu_pages(period, await books_for_period(period), settings.BOT_BOOK_MENU_PAGE_SIZE)
+            if not markups:
+                return None
+            await cache.aset_many(
+                {
+                    _menu_key(version, period, number): markup.model_dump_json(exclude_none=True)
+                    for number, markup in enumerate(markups)
+                },
+                timeout=CATALOG_TIMEOUT,
+            )
+            if not 0 <= page < len(markups):
+                return None
+            return markups[page]
+        return InlineKeyboardMarkup.model_validate_json(cached)
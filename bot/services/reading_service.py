@@ -1,50 +1,52 @@
 from asgiref.sync import sync_to_async
-from django.core.files.base import ContentFile
-from bot.models import ReadingSubmission, Book, CustomBook
+from django.conf import settings
+from bot import stats
+from bot.models import Book, CustomBook
+from bot.utils.executors import run_blocking
+from bot.utils.files import to_django_file
 import logging
 
 logger = logging.getLogger(__name__)
 
-from django.db import transaction
-
 class ReadingService:
     @staticmethod
-    @sync_to_async
-    def create_reading_submission(student, month, voice_message_id, book=None, custom_book=None):
+    async def create_reading_submission(student, period, voice_message_id, voice_file_unique_id='',
+                                        book=None, custom_book=None):
+        """In lazy voice mode the voice stays on Telegram; otherwise the media queue copies it afterwards."""
         try:
-            with transaction.atomic():
-                submission_data = {
-                    "student": student,
-                    "month": month,
-                    "voice_message_id": voice_message_id,
-                }
-                if book:
-                    submission_data["book"] = book
-                if custom_book:
-                    submission_data["custom_book"] = custom_book
+            submission_data = {
+                "student": student,
+                "period": period,
+                "voice_message_id": voice_message_id,
+                "voice_file_unique_id": voice_file_unique_id,
+                "media_status": "remote" if settings.VOICE_STORAGE_MODE == "lazy" else "pending",
+            }
+            if book:
+                submission_data["book"] = book
+            if custom_book:
+                submission_data["custom_book"] = custom_book
 
-                submission = ReadingSubmission.objects.create(**submission_data)
-                return submission
+            # The student's monthly stats are counted in the same transaction
+            submission = await sync_to_async(stats.create_reading_submission)(**submission_data)
+            return submission
         except Exception as e:
             logger.error(f"Error creating reading submission: {str(e)}", exc_info=True)
             raise
 
     @staticmethod
-    @sync_to_async
-    def save_submission_voice_file(submission, filename, file_content):
-        submission.voice_file.save(filename, ContentFile(file_content))
-        submission.save()
+    async def save_submission_voice_file(submission, filename, file_content):
+        """``file_content`` may be bytes, a file-like object or an iterable of chunks."""
+        await run_blocking(
+            submission.voice_file.save, filename, to_django_file(file_content, filename), save=False
+        )
+        submission.media_status = 'stored'
+        await submission.asave(update_fields=['voice_file', 'media_status'])
         return submission
 
     @staticmethod
-    @sync_to_async
-    def update_submission_page_count(submission_id, page_count):
-        submission = ReadingSubmission.objects.get(id=submission_id)
-        submission.page_count = page_count
-        submission.save()
-        return submission
+    async def update_submission_page_count(submission_id, page_count):
+        return await sync_to_async(stats.set_page_count)(submission_id, page_count)
 
     @staticmethod
-    @sync_to_async
-    def delete_submission(submission):
-        submission.delete()
\ No newline at end of file
+    async def delete_submission(submission):
+        await sync_to_async(stats.delete_reading_submission)(submission)
\ No newline at end of file
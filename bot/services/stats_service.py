@@ -0,0 +1,18 @@
+from bot.models import CustomUser, StudentReadingStats
+from bot.utils.periods import academic_year_periods
+
+
+class StatsService:
+    @staticmethod
+    async def get_year_stats(student, today=None):
+        """The student's stats rows for the current academic year, oldest month first (at most twelve)."""
+        periods = academic_year_periods(today)
+        rows = StudentReadingStats.objects.filter(student=student, period__in=periods).order_by('period')
+        return [row async for row in rows]
+
+    @staticmethod
+    async def get_child(parent):
+        """The student a parent account was issued for; parents are named ``<student username>_p``."""
+        if not parent.username.endswith('_p'):
+            return None
+        return await CustomUser.objects.filter(username=parent.username[:-2], role='student').afirst()
@@ -1,17 +1,23 @@
-from datetime import datetime
 from asgiref.sync import sync_to_async
-from django.core.files.base import ContentFile
-from bot.models import StudentTask
+from bot import stats
+from bot.utils.executors import run_blocking
+from bot.utils.files import to_django_file
 
 class TaskService:
     @staticmethod
-    @sync_to_async
-    def save_video_task_submission(student, task_name, video_bytes, filename):
-        submission = StudentTask(
+    async def create_pending_video_submission(student, task_name, telegram_file_id):
+        """Record the submission now; the media queue copies the video into storage afterwards."""
+        return await sync_to_async(stats.create_task_submission)(
             student=student,
             task_name=task_name,
-            submission_date=datetime.now()
+            telegram_file_id=telegram_file_id,
+            media_status='pending',
         )
-        submission.video_file.save(filename, ContentFile(video_bytes))
-        submission.save()
-        return submission
\ No newline at end of file
+
+    @staticmethod
+    async def save_task_video_file(task, filename, video):
+        """``video`` may be bytes, a file-like object or an iterable of chunks."""
+        await run_blocking(task.video_file.save, filename, to_django_file(video, filename), save=False)
+        task.media_status = 'stored'
+        await task.asave(update_fields=['video_file', 'media_status'])
+        return task
@@ -1,32 +1,120 @@
 # services/user_service.py
 from asgiref.sync import sync_to_async
-from django.contrib.auth import authenticate
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.cache import cache
 from bot.models import CustomUser
+from bot.utils.cache import MISSING, TTLCache
+from bot.utils.executors import run_password_hashing
+
+# Telegram id -> CustomUser. Per process, so kept short-lived. Unknown chats are not cached, so
+# a login handled by another process is seen on the very next message.
+_user_cache = TTLCache(maxsize=settings.BOT_USER_CACHE_SIZE, ttl=settings.BOT_USER_CACHE_TTL)
+
+
+class TooManyLoginAttempts(Exception):
+    """Raised instead of checking a password once a chat has used up its failed logins."""
+
+
+def _login_failures_key(telegram_id):
+    return f"login:failures:{telegram_id}"
+
+
+def invalidate_cached_user(user):
+    """Forget ``user`` under both its current and any previous Telegram id."""
+    if user.telegram_id is not None:
+        _user_cache.pop(int(user.telegram_id))
+    _user_cache.discard_where(lambda cached: cached is not None and cached.pk == user.pk)
+
 
 class UserService:
     @staticmethod
-    @sync_to_async
-    def get_user_by_telegram_id(telegram_id):
-        return CustomUser.objects.filter(telegram_id=telegram_id).first()
+    async def get_user_by_telegram_id(telegram_id):
+        key = int(telegram_id)
+        user = _user_cache.get(key)
+        if user is MISSING:
+            user = await CustomUser.objects.filter(telegram_id=telegram_id).afirst()
+            if user is not None:
+                _user_cache.set(key, user)
+        return user
 
     @staticmethod
-    @sync_to_async
-    def authenticate_user(username, password):
-        return authenticate(username=username, password=password)
+    async def authenticate_user(username, password, telegram_id=None):
+        """Same outcome as ModelBackend.authenticate, with the hashing done on the password pool.
+
+        With ``telegram_id`` every attempt takes a slot in the chat's budget before
+        anything is hashed, so messages handled concurrently cannot all slip under the
+        limit. Once BOT_LOGIN_MAX_FAILURES slots are used within BOT_LOGIN_FAILURE_WINDOW,
+        further attempts raise TooManyLoginAttempts. A successful login gives back its
+        own slot but does not clear earlier failures, so logging into one's own account
+        between guesses does not buy more guesses.
+        """
+        key = _login_failures_key(telegram_id) if telegram_id is not None else None
+        if key and await UserService._reserve_login_attempt(key) > settings.BOT_LOGIN_MAX_FAILURES:
+            raise TooManyLoginAttempts
+
+        user = await UserService._check_credentials(username, password)
+        if key and user is not None:
+            try:
+                await sync_to_async(cache.decr)(key)
+            except ValueError:
+                pass  # the window has expired meanwhile
+        return user
+
+    @staticmethod
+    async def _reserve_login_attempt(key):
+        """Count one attempt against ``key`` and return the count so far in this window.
+
+        The sync incr()/decr() are used on purpose: they map to an atomic INCR, while the
+        async aincr() is a get followed by a set that loses concurrent updates.
+        """
+        while True:
+            if await cache.aadd(key, 1, timeout=settings.BOT_LOGIN_FAILURE_WINDOW):
+                return 1
+            try:
+                return await sync_to_async(cache.incr)(key)
+            except ValueError:
+                continue  # expired between the add and the incr: start a new window
+
+    @staticmethod
+    async def _check_credentials(username, password):
+        user = await CustomUser.objects.filter(username=username).afirst()
+        if user is None:
+            # Hash anyway so unknown usernames take as long as wrong passwords
+            await run_password_hashing(make_password, password)
+            return None
+
+        outdated = []
+        valid = await run_password_hashing(check_password, password, user.password, outdated.append)
+        if not valid or not user.is_active:
+            return None
+        if outdated:
+            # Stored with an older hasher or iteration count: re-hash with the current default
+            await run_password_hashing(user.set_password, password)
+            await user.asave(update_fields=['password'])
+        return user
 
+    # ``user`` is usually the instance shared through _user_cache, so it is dropped from the
+    # cache even when the save fails: otherwise the rejected change would outlive the error.
     @staticmethod
-    @sync_to_async
-    def save_user(user):
-        user.save()
+    async def save_user(user):
+        try:
+            await user.asave()
+        finally:
+            invalidate_cached_user(user)
 
     @staticmethod
-    @sync_to_async
-    def set_user_password(user, new_password):
-        user.set_password(new_password)
-        user.save()
+    async def set_user_password(user, new_password):
+        try:
+            await run_password_hashing(user.set_password, new_password)
+            await user.asave()
+        finally:
+            invalidate_cached_user(user)
 
     @staticmethod
-    @sync_to_async
-    def update_user_field(user, field, value):
-        setattr(user, field, value)
-        user.save()
\ No newline at end of file
+    async def update_user_field(user, field, value):
+        try:
+            setattr(user, field, value)
+            await user.asave()
+        finally:
+            invalidate_cached_user(user)
\ No newline at end of file
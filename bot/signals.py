@@ -1,7 +1,15 @@
 from django_celery_beat.models import PeriodicTask, IntervalSchedule
-from django.db.models.signals import post_migrate
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_init, post_migrate, post_save
 from django.dispatch import receiver
 
+from .models import Book, MediaBlob, ReadingSubmission, StudentTask
+from .storage import ContentAddressedStorage
+from .services.book_service import invalidate_book_catalog
+
 def create_daily_notification_task():
     schedule, created = IntervalSchedule.objects.get_or_create(
         every=1,
@@ -19,3 +27,85 @@ def create_daily_notification_task():
 @receiver(post_migrate)
 def create_periodic_tasks(sender, **kwargs):
     create_daily_notification_task()
+
+@receiver(post_save, sender=Book)
+def warm_new_book_file(sender, instance, **kwargs):
+    """Books saved without a Telegram file_id (e.g. from the admin) are uploaded once in the background."""
+    if instance.telegram_file_id or not instance.file or not settings.TELEGRAM_STORAGE_CHAT_ID:
+        return
+
+    from .tasks import warm_book_file_ids
+    book_id = instance.pk
+    transaction.on_commit(lambda: warm_book_file_ids.delay([book_id]))
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_catalog_on_book_change(sender, **kwargs):
+    transaction.on_commit(invalidate_book_catalog)
+
+MEDIA_FIELDS = {Book: 'file', StudentTask: 'video_file', ReadingSubmission: 'voice_file'}
+
+
+def _media_file(instance):
+    """The instance's FieldFile if it lives in deduplicated storage, else None."""
+    field_file = getattr(instance, MEDIA_FIELDS[type(instance)])
+    return field_file if isinstance(field_file.storage, ContentAddressedStorage) else None
+
+
+def _add_blob_reference(storage, name):
+    sha256 = storage.blob_sha256(name)
+    if sha256 is None:
+        return
+    blob, _ = MediaBlob.objects.get_or_create(sha256=sha256, defaults={'size': storage.size(name)})
+    MediaBlob.objects.filter(pk=blob.pk).update(refcount=F('refcount') + 1)
+
+
+def _release_blob_reference(storage, name):
+    """Remove ``name`` and drop its blob's reference; the sweep_media_blobs task deletes unreferenced blobs."""
+    sha256 = storage.blob_sha256(name)
+    if sha256 is None:
+        return  # stored before deduplication; left alone as it always was
+    storage.delete(name)
+    MediaBlob.objects.filter(pk=sha256, refcount__gt=0).update(refcount=F('refcount') - 1)
+
+@receiver(post_init, sender=Book)
+@receiver(post_init, sender=StudentTask)
+@receiver(post_init, sender=ReadingSubmission)
+def remember_media_name(sender, instance, **kwargs):
+    field_file = _media_file(instance)
+    if field_file is not None:
+        instance._saved_media_name = field_file.name
+
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=StudentTask)
+@receiver(post_save, sender=ReadingSubmission)
+def count_media_references(sender, instance, **kwargs):
+    """Reference the newly saved file's blob and release the one it replaced (e.g. a new PDF from the admin)."""
+    field_file = _media_file(instance)
+    if field_file is None:
+        return
+    previous = getattr(instance, '_saved_media_name', None)
+    if field_file.name != previous:
+        if field_file.name:
+            _add_blob_reference(field_file.storage, field_file.name)
+        if previous:
+            transaction.on_commit(lambda: _release_blob_reference(field_file.storage, previous))
+    instance._saved_media_name = field_file.name
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=StudentTask)
+@receiver(post_delete, sender=ReadingSubmission)
+def release_deleted_media(sender, instance, **kwargs):
+    field_file = _media_file(instance)
+    if field_file is not None and field_file.name:
+        name = field_file.name
+        transaction.on_commit(lambda: _release_blob_reference(field_file.storage, name))
+
+@receiver(connection_created)
+def tune_sqlite_connection(sender, connection, **kwargs):
+    """WAL lets the bot, Celery and the admin read while one of them writes; NORMAL sync is safe under WAL."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
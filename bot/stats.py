@@ -0,0 +1,163 @@
+from collections import defaultdict
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .leaderboards import record_pages
+from .models import ReadingSubmission, StudentReadingStats, StudentTask
+
+SUBMISSION_FIELDS = ('student_id', 'student__student_class', 'student__branch', 'period', 'submission_date', 'page_count')
+
+
+def _period_of(submitted_at, period=None):
+    """Month a submission counts towards: its reading period, else the month it was sent in."""
+    if period is not None:
+        return period.replace(day=1)
+    return timezone.localdate(submitted_at).replace(day=1)
+
+
+def _increment(student_id, period, day=None, **deltas):
+    """Add ``deltas`` to the (student, period) row in one UPDATE; ``day`` counts towards submission_days once."""
+    StudentReadingStats.objects.get_or_create(student_id=student_id, period=period)
+    # Clamped at 0: a row created after the stats were (re)built can be asked to
+    # uncount pages or a book it never counted, and the counters are unsigned
+    updates = {
+        field: F(field) + delta if delta >= 0 else Greatest(F(field) + delta, 0)
+        for field, delta in deltas.items()
+    }
+    if day is not None:
+        updates['submission_days'] = F('submission_days') + Case(
+            When(last_submission_date=day, then=Value(0)), default=Value(1)
+        )
+        updates['last_submission_date'] = day
+    StudentReadingStats.objects.filter(student_id=student_id, period=period).update(
+        updated_at=timezone.now(), **updates
+    )
+
+
+def record_reading_submission(submission):
+    """Count a new submission; call inside the transaction that created it."""
+    _increment(
+        submission.student_id,
+        _period_of(submission.submission_date, submission.period),
+        day=timezone.localdate(submission.submission_date),
+        books_read=1,
+        pages_read=submission.page_count or 0,
+    )
+
+
+def record_task_submission(task):
+    _increment(
+        task.student_id,
+        _period_of(task.submission_date),
+        day=timezone.localdate(task.submission_date),
+        tasks_submitted=1,
+    )
+
+
+def _update_leaderboards(row, pages):
+    """Move the student's leaderboard scores once the transaction commits."""
+    transaction.on_commit(partial(
+        record_pages,
+        row['student_id'],
+        row['student__student_class'],
+        row['student__branch'],
+        timezone.localdate(row['submission_date']),
+        pages,
+    ))
+
+
+def _lock_submission(submission_id):
+    return (
+        ReadingSubmission.objects.select_for_update(of=('self',))
+        .filter(id=submission_id)
+        .values(*SUBMISSION_FIELDS)
+        .first()
+    )
+
+
+def set_page_count(submission_id, page_count):
+    """Store the submission's page count and move the month's pages_read by the difference."""
+    with transaction.atomic():
+        row = _lock_submission(submission_id)
+        if row is None:
+            return 0
+        ReadingSubmission.objects.filter(id=submission_id).update(page_count=page_count)
+        delta = page_count - (row['page_count'] or 0)
+        if delta:
+            _increment(row['student_id'], _period_of(row['submission_date'], row['period']), pages_read=delta)
+            _update_leaderboards(row, delta)
+        return 1
+
+
+def create_reading_submission(**fields):
+    with transaction.atomic():
+        submission = ReadingSubmission.objects.create(**fields)
+        record_reading_submission(submission)
+    return submission
+
+
+def create_task_submission(**fields):
+    with transaction.atomic():
+        task = StudentTask.objects.create(**fields)
+        record_task_submission(task)
+    return task
+
+
+def delete_reading_submission(submission):
+    """Delete and uncount a submission. Its day stays in submission_days until the next rebuild."""
+    with transaction.atomic():
+        # The page count may have been set after this instance was loaded
+        row = _lock_submission(submission.id)
+        submission.delete()
+        if row is not None:
+            _increment(
+                row['student_id'],
+                _period_of(row['submission_date'], row['period']),
+                books_read=-1,
+                pages_read=-(row['page_count'] or 0),
+            )
+            _update_leaderboards(row, -(row['page_count'] or 0))
+
+
+def rebuild_stats(student_ids=None):
+    """Recompute the stats rows from the raw submissions; returns the number of rows written."""
+    with transaction.atomic():
+        readings = ReadingSubmission.objects.all()
+        tasks = StudentTask.objects.all()
+        if student_ids is not None:
+            readings = readings.filter(student_id__in=student_ids)
+            tasks = tasks.filter(student_id__in=student_ids)
+
+        totals = defaultdict(lambda: {'books_read': 0, 'pages_read': 0, 'tasks_submitted': 0, 'days': set()})
+        for row in readings.values('student_id', 'period', 'submission_date', 'page_count').iterator(chunk_size=2000):
+            entry = totals[row['student_id'], _period_of(row['submission_date'], row['period'])]
+            entry['books_read'] += 1
+            entry['pages_read'] += row['page_count'] or 0
+            entry['days'].add(timezone.localdate(row['submission_date']))
+        for row in tasks.values('student_id', 'submission_date').iterator(chunk_size=2000):
+            entry = totals[row['student_id'], _period_of(row['submission_date'])]
+            entry['tasks_submitted'] += 1
+            entry['days'].add(timezone.localdate(row['submission_date']))
+
+        rows = [
+            StudentReadingStats(
+                student_id=student_id,
+                period=period,
+                books_read=entry['books_read'],
+                pages_read=entry['pages_read'],
+                tasks_submitted=entry['tasks_submitted'],
+                submission_days=len(entry['days']),
+                last_submission_date=max(entry['days']),
+            )
+            for (student_id, period), entry in totals.items()
+        ]
+        stale = StudentReadingStats.objects.all()
+        if student_ids is not None:
+            stale = stale.filter(student_id__in=student_ids)
+        stale.delete()
+        StudentReadingStats.objects.bulk_create(rows, batch_size=1000)
+        return len(rows)
@@ -0,0 +1,148 @@
+import hashlib
+import os
+import shutil
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+
+BLOB_DIR = 'blobs'
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def blob_name(sha256):
+    return f'{BLOB_DIR}/{sha256[:2]}/{sha256[2:4]}/{sha256}'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Stores each distinct file content once, under its SHA-256, and links names to it.
+
+    A field keeps its usual name (``books/October/x.pdf``), which on disk is a relative
+    symlink to ``blobs/ab/cd/<sha256>``; opening, serving and ``path`` work unchanged.
+    Where symlinks are not allowed (Windows without Developer Mode or admin rights) the
+    name is a hard link to the blob instead, or failing that a copy; such names are
+    plain files to the reference counting and never free their blob.
+    Storage itself never touches the database: MediaBlob reference counts are kept
+    by the model signals in bot.signals, on the ORM's thread.
+
+    Releasing the last reference does not delete the blob; the sweep_media_blobs task
+    does, once it has gone unreferenced and untouched for MEDIA_BLOB_GRACE. Every save
+    touches the blob it links to, so a blob that is being linked while its row is not
+    saved yet is never swept. ``QuerySet.update()`` and ``QuerySet.delete()`` skip the
+    signals: blobs of rows deleted that way are never freed, and a name written with
+    ``update()`` holds no reference, so its blob can be swept once unused elsewhere.
+    """
+
+    def _save(self, name, content):
+        # ChunkSpool uploads arrive already hashed; anything else is hashed while it is copied
+        sha256 = getattr(content, 'sha256', None)
+        temp_name = None
+        if sha256 is None:
+            sha256, temp_name = self._spool_and_hash(content)
+
+        target = blob_name(sha256)
+        try:
+            temp_name = self._ensure_blob(target, content, temp_name)
+            link = super().path(name)
+            os.makedirs(os.path.dirname(link), exist_ok=True)
+            self._link(target, link)
+            if not super().exists(target):
+                temp_name = self._ensure_blob(target, content, temp_name)  # swept just before the link
+        finally:
+            if temp_name:
+                super().delete(temp_name)
+        return name
+
+    def _link(self, target, link):
+        """Make ``link`` a relative symlink to the blob; a hard link or a copy where symlinks are refused."""
+        blob = super().path(target)
+        try:
+            os.symlink(os.path.relpath(blob, os.path.dirname(link)), link)
+        except FileExistsError:
+            raise
+        except OSError:
+            try:
+                os.link(blob, link)
+            except FileExistsError:
+                raise
+            except OSError:
+                shutil.copyfile(blob, link)
+
+    def _ensure_blob(self, target, content, temp_name):
+        """Write the blob unless it exists, and mark it as just used. Returns ``temp_name`` if still unused."""
+        try:
+            os.utime(super().path(target))  # a fresh mtime keeps the sweep away
+            return temp_name
+        except FileNotFoundError:
+            pass
+        if temp_name:
+            os.makedirs(os.path.dirname(super().path(target)), exist_ok=True)
+            os.replace(super().path(temp_name), super().path(target))
+            return None
+        saved = super()._save(target, content)
+        if saved != target:
+            super().delete(saved)  # another upload of the same content won the race
+        return temp_name
+
+    def _spool_and_hash(self, content):
+        """Copy ``content`` into a temporary blob file in one pass, hashing it on the way."""
+        temp_name = f'{BLOB_DIR}/tmp/{uuid.uuid4().hex}'
+        path = super().path(temp_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        digest = hashlib.sha256()
+        with open(path, 'wb') as out:
+            for chunk in content.chunks(HASH_CHUNK_SIZE):
+                digest.update(chunk)
+                out.write(chunk)
+        return digest.hexdigest(), temp_name
+
+    def blob_sha256(self, name):
+        """SHA-256 of the blob behind ``name``, or None for files stored before deduplication."""
+        try:
+            target = os.readlink(self.path(name))
+        except (OSError, ValueError):
+            return None
+        sha256 = os.path.basename(target)
+        return sha256 if len(sha256) == 64 else None
+
+    def remove_unused_blob(self, sha256, unused_since):
+        """Delete the blob unless a save touched it after ``unused_since`` (a timestamp); True if it is gone.
+
+        The blob is moved aside before the final check, so a save racing the sweep
+        either sees it missing and writes it again, or leaves a fresh mtime and the
+        blob is put back.
+        """
+        path = super().path(blob_name(sha256))
+        try:
+            if os.stat(path).st_mtime > unused_since:
+                return False
+        except FileNotFoundError:
+            return True
+        aside = super().path(f'{BLOB_DIR}/tmp/{sha256}.{uuid.uuid4().hex}')
+        os.makedirs(os.path.dirname(aside), exist_ok=True)
+        try:
+            os.replace(path, aside)
+        except FileNotFoundError:
+            return True
+        if os.stat(aside).st_mtime > unused_since:
+            try:
+                os.link(aside, path)
+            except FileExistsError:
+                pass  # the racing save has written it again already
+            os.remove(aside)
+            return False
+        os.remove(aside)
+        return True
+
+
+_media_storage = None
+
+
+def media_storage():
+    """Storage for uploaded media. A callable, so migrations don't record which backend MEDIA_DEDUPLICATION picked."""
+    global _media_storage
+    if not settings.MEDIA_DEDUPLICATION:
+        return default_storage
+    if _media_storage is None:
+        _media_storage = ContentAddressedStorage()
+    return _media_storage
@@ -1,23 +1,148 @@
-from celery import shared_task
-from datetime import date
-from .models import CustomUser, StudentTask
-from .utils.telegram import send_message_to_user
-
-@shared_task(bind=True, max_retries=3)
-def send_daily_reminders(self):
-    today = date.today()
-    students = CustomUser.objects.filter(role='student').exclude(telegram_id__isnull=True)
-
-    for student in students:
-        submitted = StudentTask.objects.filter(
-            student=student,
-            submission_date__date=today
-        ).exists()
-
-        if not submitted:
-            success = send_message_to_user(
-                telegram_id=student.telegram_id,
-                message="📌 Salom! Bugun hali hech qanday vazifa topshirmadingiz. Iltimos, unutmaslikka harakat qiling!"
-            )
-            if not success:
-                self.retry(countdown=60)  # Retry after 60 seconds if failed
\ No newline at end of file
+import logging
+import os
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+
+from celery import chord, group, shared_task
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, Max, Min, OuterRef
+from django.utils import timezone
+from .leaderboards import WINDOWS, rebuild_window
+from .models import Book, CustomUser, MediaBlob, StudentTask
+from .outbox import deliver_outbox, due_notifications, enqueue_notifications
+from .services.book_service import invalidate_book_catalog
+from .storage import ContentAddressedStorage, media_storage
+from .utils.telegram import send_document_to_chat
+
+logger = logging.getLogger(__name__)
+
+REMINDER_MESSAGE = "📌 Salom! Bugun hali hech qanday vazifa topshirmadingiz. Iltimos, unutmaslikka harakat qiling!"
+
+def local_day_bounds(day):
+    """[start, end) datetimes of ``day`` in the current time zone."""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+    return start, end
+
+
+def get_reminder_recipients(day):
+    """(id, telegram_id) of linked students with no task submitted on ``day``, as a single query."""
+    # A plain range (not submission_date__date) so the (student, submission_date) index applies
+    start, end = local_day_bounds(day)
+    submitted = StudentTask.objects.filter(
+        student=OuterRef('pk'), submission_date__gte=start, submission_date__lt=end
+    )
+    return (
+        CustomUser.objects
+        .filter(role='student', telegram_id__isnull=False)
+        .filter(~Exists(submitted))
+        .values_list('id', 'telegram_id')
+    )
+
+
+@shared_task
+def send_daily_reminders():
+    """Split today's reminder run into student-id ranges and fan them out as a Celery chord."""
+    today = timezone.localdate()
+    run_key = f"daily-reminder:{today.isoformat()}"
+
+    bounds = CustomUser.objects.filter(role='student', telegram_id__isnull=False).aggregate(
+        first=Min('id'), last=Max('id')
+    )
+    if bounds['first'] is None:
+        return {'run_key': run_key, 'chunks': 0}
+
+    size = settings.REMINDER_CHUNK_SIZE
+    chunks = [
+        send_reminder_chunk.s(run_key, today.isoformat(), start, min(start + size, bounds['last'] + 1))
+        for start in range(bounds['first'], bounds['last'] + 1, size)
+    ]
+    chord(group(chunks))(summarize_reminder_run.s(run_key))
+    return {'run_key': run_key, 'chunks': len(chunks)}
+
+
+@shared_task
+def send_reminder_chunk(run_key, day, start_id, end_id):
+    """Remind the students with ids in [start_id, end_id) and return sent/skipped/failed counts."""
+    recipients = get_reminder_recipients(date.fromisoformat(day)).filter(id__gte=start_id, id__lt=end_id)
+
+    # Re-running the same day only adds missing rows; anyone already reminded is not messaged again
+    enqueue_notifications(run_key, recipients.iterator(chunk_size=500), REMINDER_MESSAGE)
+    due = due_notifications(run_key).filter(recipient_id__gte=start_id, recipient_id__lt=end_id)
+
+    # Chunks run side by side, so each gets its share of the bot-wide Telegram rate limit
+    rate = settings.TELEGRAM_BROADCAST_RATE / max(settings.REMINDER_FANOUT_WORKERS, 1)
+    return deliver_outbox(due, rate=rate)
+
+
+@shared_task
+def summarize_reminder_run(results, run_key):
+    totals = Counter(sent=0, skipped=0, failed=0)
+    for chunk_result in results:
+        totals.update(chunk_result)
+    logger.info(f"Daily reminders {run_key}: {dict(totals)} across {len(results)} chunks")
+    return dict(totals)
+
+
+@shared_task
+def retry_pending_notifications():
+    """Drain pending and failed outbox rows from every run, including ones a crashed worker left behind."""
+    return deliver_outbox()
+
+
+@shared_task
+def warm_book_file_ids(book_ids=None):
+    """Upload books that have no cached Telegram file_id yet, so students get them by file_id."""
+    chat_id = settings.TELEGRAM_STORAGE_CHAT_ID
+    if not chat_id:
+        logger.info("TELEGRAM_STORAGE_CHAT_ID is not set, skipping book warm-up")
+        return 0
+
+    books = Book.objects.filter(telegram_file_id='').exclude(file='')
+    if book_ids:
+        books = books.filter(id__in=book_ids)
+
+    warmed = 0
+    for book in books.iterator():
+        try:
+            with book.file.open('rb') as fh:
+                file_id = send_document_to_chat(chat_id, fh, os.path.basename(book.file.name), caption=book.title)
+        except FileNotFoundError:
+            logger.warning(f"Book file missing on disk: {book.file.name}")
+            continue
+
+        if file_id:
+            # Only fill an empty slot; the bot may have cached one in the meantime
+            Book.objects.filter(pk=book.pk, telegram_file_id='').update(telegram_file_id=file_id)
+            warmed += 1
+
+    if warmed:
+        invalidate_book_catalog()
+    return warmed
+
+
+@shared_task
+def reconcile_leaderboards():
+    """Rebuild the current week's and month's leaderboards from the submissions."""
+    today = timezone.localdate()
+    return {window: rebuild_window(window, today) for window in WINDOWS}
+
+
+@shared_task
+def sweep_media_blobs():
+    """Delete media blobs that have had no reference and no new link for MEDIA_BLOB_GRACE seconds."""
+    storage = media_storage()
+    if not isinstance(storage, ContentAddressedStorage):
+        return 0
+    unused_since = timezone.now().timestamp() - settings.MEDIA_BLOB_GRACE
+    removed = 0
+    for sha256 in MediaBlob.objects.filter(refcount=0).values_list('sha256', flat=True).iterator():
+        with transaction.atomic():
+            # Re-check under the row lock: a save may have referenced it again since the listing
+            if not MediaBlob.objects.select_for_update().filter(pk=sha256, refcount=0).exists():
+                continue
+            if storage.remove_unused_blob(sha256, unused_since):
+                MediaBlob.objects.filter(pk=sha256).delete()
+                removed += 1
+    return removed
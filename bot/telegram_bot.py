@@ -2,6 +2,7 @@
 import asyncio
 import logging
 from aiogram import Bot, Dispatcher
+from aiohttp import web
 
 from bot.handlers.start_handlers import start_router as start_router
 from bot.handlers.profile_handlers import profile_router as profile_router
@@ -9,13 +10,24 @@ from bot.handlers.student_task_handlers import student_task_router as student_ta
 from bot.handlers.student_reading_handlers import student_reading_router as student_reading_router
 from bot.handlers.coordinator_book_handlers import coordinator_book_router as coordinator_book_router
 from bot.handlers.common_handlers import common_router as common_router
+from bot.bot.fsm import create_fsm_storage
+from bot.bot.media_queue import create_media_queue
+from bot.bot.middlewares import UserMiddleware
+from bot.bot.webhook import create_webhook_app
 from bot.utils.telegram import BOT_TOKEN
 
 logger = logging.getLogger(__name__)
 
-async def main():
-    bot = Bot(token=BOT_TOKEN)
-    dp = Dispatcher()
+def create_dispatcher():
+    storage, events_isolation = create_fsm_storage()
+    dp = Dispatcher(storage=storage, events_isolation=events_isolation)
+    dp.update.outer_middleware(UserMiddleware())
+
+    # Handlers receive it as ``media_queue``; workers start and stop with the dispatcher
+    media_queue = create_media_queue()
+    dp['media_queue'] = media_queue
+    dp.startup.register(media_queue.start)
+    dp.shutdown.register(media_queue.stop)
 
     # Barcha routerlarni Dispatcher ga qo'shamiz
     dp.include_router(start_router)
@@ -24,10 +36,25 @@ async def main():
     dp.include_router(student_reading_router)
     dp.include_router(coordinator_book_router)
     dp.include_router(common_router)
+    return dp
+
+async def main():
+    bot = Bot(token=BOT_TOKEN)
+    dp = create_dispatcher()
 
     logging.basicConfig(level=logging.INFO)
 
+    # Telegram refuses getUpdates while a webhook is registered
+    await bot.delete_webhook()
     await dp.start_polling(bot)
 
+def run_webhook(host, port):
+    bot = Bot(token=BOT_TOKEN)
+    dp = create_dispatcher()
+
+    logging.basicConfig(level=logging.INFO)
+
+    web.run_app(create_webhook_app(dp, bot), host=host, port=port)
+
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
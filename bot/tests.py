@@ -1,3 +1,1230 @@
-from django.test import TestCase
+import asyncio
+import csv
+import hashlib
+import fnmatch
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.fsm.storage.memory import DisabledEventIsolation, MemoryStorage
+from aiogram.fsm.storage.redis import RedisEventIsolation, RedisStorage
+from aiogram.types import FSInputFile
+from aiohttp.test_utils import TestClient, TestServer
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import global_settings, settings
+from django.contrib import admin
+from django.contrib.auth.hashers import check_password
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from redis.exceptions import WatchError
+import requests
+
+from schoolbot.celery import app as celery_app
+
+from .bot.fsm import create_fsm_storage
+from .bot.media_queue import MediaJob, MediaPersistenceQueue
+from .bot.utils import download_telegram_file, pack_lines
+from .bot.webhook import create_webhook_app
+from .management.commands.import_students import hash_passwords
+from .handlers.student_reading_handlers import book_selected
+from . import stats
+from .leaderboards import RedisLeaderboards, get_leaderboards, rebuild_window, student_boards
+from .models import (
+    Book, CustomBook, CustomUser, MediaBlob, NotificationOutbox, ReadingSubmission, StudentReadingStats, StudentTask,
+    normalize_period,
+)
+from .tasks import (
+    get_reminder_recipients, retry_pending_notifications, send_daily_reminders, summarize_reminder_run,
+    sweep_media_blobs, warm_book_file_ids,
+)
+from .services.book_service import BookService
+from .services.leaderboard_service import LeaderboardService
+from .services.menu_service import MenuService
+from .services.reading_service import ReadingService
+from .services.task_service import TaskService
+from .services.user_service import TooManyLoginAttempts, UserService, _user_cache
+from .utils.broadcast import BroadcastResult, OutgoingMessage, broadcast
+from .utils.files import ChunkSpool, UploadTooLarge, to_django_file
+from .utils.periods import academic_period
+from .utils.telegram import send_document_to_chat
+from .voice_cache import evict_voices
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class LocalCacheTestCase(TestCase):
+    """Runs against a per-process cache instead of the configured Redis."""
+
+
+class MediaTestCase(LocalCacheTestCase):
+    """Also stores uploaded files under a throwaway MEDIA_ROOT."""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+
+class DailyReminderTargetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        def student(username, telegram_id):
+            return CustomUser.objects.create(username=username, role='student', telegram_id=telegram_id)
+
+        cls.idle = student('idle', 1001)
+        cls.submitted = student('submitted', 1002)
+        cls.submitted_yesterday = student('yesterday', 1003)
+        student('unlinked', None)
+        CustomUser.objects.create(username='parent', role='parent', telegram_id=2001)
+
+        StudentTask.objects.create(student=cls.submitted, task_name='Task 1')
+        old = StudentTask.objects.create(student=cls.submitted_yesterday, task_name='Task 1')
+        StudentTask.objects.filter(pk=old.pk).update(submission_date=timezone.now() - timedelta(days=1))
+
+    def test_only_linked_students_without_submission_today(self):
+        recipients = {telegram_id for _, telegram_id in get_reminder_recipients(timezone.localdate())}
+        self.assertEqual(recipients, {1001, 1003})
+
+    def test_target_selection_is_a_single_query(self):
+        for i in range(20):
+            CustomUser.objects.create(username=f'extra{i}', role='student', telegram_id=3000 + i)
+
+        with self.assertNumQueries(1):
+            recipients = list(get_reminder_recipients(timezone.localdate()).iterator(chunk_size=500))
+        self.assertEqual(len(recipients), 22)
+
+
+class NotificationOutboxTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i, telegram_id in enumerate((1001, 1002, 1003)):
+            CustomUser.objects.create(username=f'student{i}', role='student', telegram_id=telegram_id)
+
+    @staticmethod
+    def fake_broadcast(outcome):
+        def run(messages, **kwargs):
+            result = BroadcastResult()
+            for message in messages:
+                getattr(result, outcome(message.chat_id)).append(message.key)
+            return result
+        return run
+
+    def run_reminders(self):
+        eager = celery_app.conf.task_always_eager
+        celery_app.conf.task_always_eager = True
+        try:
+            return send_daily_reminders()
+        finally:
+            celery_app.conf.task_always_eager = eager
+
+    def test_rerun_does_not_message_anyone_twice(self):
+        with mock.patch('bot.outbox.run_broadcast', side_effect=self.fake_broadcast(lambda chat_id: 'sent')) as send:
+            self.run_reminders()
+            self.run_reminders()
+        self.assertEqual(send.call_count, 1)
+        self.assertEqual(NotificationOutbox.objects.filter(status='sent').count(), 3)
+
+    def test_retry_worker_only_resends_failed_rows(self):
+        flaky = self.fake_broadcast(lambda chat_id: 'failed' if chat_id == '1002' else 'sent')
+        with mock.patch('bot.outbox.run_broadcast', side_effect=flaky):
+            self.run_reminders()
+        self.assertEqual(NotificationOutbox.objects.get(status='failed').chat_id, '1002')
+
+        NotificationOutbox.objects.filter(status='failed').update(next_attempt_at=timezone.now())
+        with mock.patch('bot.outbox.run_broadcast', side_effect=self.fake_broadcast(lambda chat_id: 'sent')):
+            self.assertEqual(retry_pending_notifications()['sent'], 1)
+        self.assertEqual(NotificationOutbox.objects.get(chat_id='1002').attempts, 2)
+
+    @override_settings(REMINDER_CHUNK_SIZE=2)
+    def test_run_is_split_into_id_range_chunks(self):
+        with mock.patch('bot.outbox.run_broadcast', side_effect=self.fake_broadcast(lambda chat_id: 'sent')) as send:
+            self.assertEqual(self.run_reminders()['chunks'], 2)
+        self.assertEqual(send.call_count, 2)
+        self.assertEqual(NotificationOutbox.objects.filter(status='sent').count(), 3)
+
+    def test_chunk_counts_are_combined(self):
+        totals = summarize_reminder_run([{'sent': 2, 'skipped': 0, 'failed': 1}, {'sent': 1, 'skipped': 1, 'failed': 0}], 'run')
+        self.assertEqual(totals, {'sent': 3, 'skipped': 1, 'failed': 1})
+
+
+class BroadcastTests(SimpleTestCase):
+    async def test_flood_limit_is_retried_and_blocked_chats_are_skipped(self):
+        calls = []
+
+        async def send_message(request):
+            chat_id = (await request.json())['chat_id']
+            calls.append(chat_id)
+            if chat_id == 1 and calls.count(1) == 1:
+                return web.json_response(
+                    {'ok': False, 'description': 'Too Many Requests', 'parameters': {'retry_after': 1}}, status=429
+                )
+            if chat_id == 2:
+                return web.json_response({'ok': False, 'description': 'bot was blocked by the user'}, status=403)
+            return web.json_response({'ok': True, 'result': {}})
+
+        app = web.Application()
+        app.router.add_post('/bottoken/sendMessage', send_message)
+        async with TestServer(app) as server:
+            result = await broadcast(
+                [OutgoingMessage(chat_id=i, text='hi') for i in (1, 2, 3)],
+                rate=100, concurrency=2, token='token', api_url=str(server.make_url('')).rstrip('/'),
+            )
+
+        self.assertEqual(sorted(result.sent), [1, 3])
+        self.assertEqual(result.skipped, [2])
+        self.assertEqual(result.failed, [])
+        self.assertEqual(calls.count(1), 2)
+
+    async def test_unexpected_body_fails_the_message_without_stopping_the_others(self):
+        async def send_message(request):
+            chat_id = (await request.json())['chat_id']
+            if chat_id == 1:
+                return web.Response(status=502)  # empty body from a proxy
+            if chat_id == 2:
+                return web.json_response([])
+            return web.json_response({'ok': True, 'result': {}})
+
+        app = web.Application()
+        app.router.add_post('/bottoken/sendMessage', send_message)
+        async with TestServer(app) as server:
+            result = await broadcast(
+                [OutgoingMessage(chat_id=i, text='hi') for i in (1, 2, 3, 4, 5)],
+                rate=100, concurrency=1, max_attempts=1, token='token',
+                api_url=str(server.make_url('')).rstrip('/'),
+            )
+
+        self.assertEqual(result.sent, [3, 4, 5])
+        self.assertEqual(result.failed, [1, 2])
+        self.assertEqual(result.errors[1], '502 - unexpected response body')
+
+
+@override_settings(BOT_FSM_STORAGE='memory', BOT_WEBHOOK_URL=None, BOT_WEBHOOK_SECRET='s3cret')
+class WebhookTests(SimpleTestCase):
+    async def test_redelivered_update_is_handled_once(self):
+        handled = []
+        dp = Dispatcher()
+
+        @dp.message()
+        async def record(message):
+            handled.append(message.message_id)
+
+        update = {
+            'update_id': 7,
+            'message': {
+                'message_id': 1, 'date': 0, 'text': 'hi',
+                'chat': {'id': 1, 'type': 'private'}, 'from': {'id': 1, 'is_bot': False, 'first_name': 'A'},
+            },
+        }
+        headers = {'X-Telegram-Bot-Api-Secret-Token': 's3cret'}
+        app = create_webhook_app(dp, Bot(token='42:TEST'))
+        async with TestClient(TestServer(app)) as client:
+            self.assertEqual((await client.post('/telegram/webhook/', json=update)).status, 401)
+            for _ in range(2):
+                self.assertEqual((await client.post('/telegram/webhook/', json=update, headers=headers)).status, 200)
+
+        self.assertEqual(handled, [1])
+
+
+class UserCacheTests(TestCase):
+    def setUp(self):
+        _user_cache.clear()
+        self.addCleanup(_user_cache.clear)
+
+    async def test_user_is_cached_until_logout(self):
+        user = await CustomUser.objects.acreate(username='reader', role='student', telegram_id=555)
+
+        cached = await UserService.get_user_by_telegram_id(555)
+        self.assertEqual(cached.pk, user.pk)
+        self.assertIs(await UserService.get_user_by_telegram_id(555), cached)
+
+        cached.telegram_id = None
+        await UserService.save_user(cached)
+        self.assertIsNone(await UserService.get_user_by_telegram_id(555))
+
+    async def test_unknown_chat_is_not_cached(self):
+        self.assertIsNone(await UserService.get_user_by_telegram_id(777))
+
+        # Logged in through another process, which cannot clear this one's cache
+        user = await CustomUser.objects.acreate(username='newcomer', role='student', telegram_id=777)
+        self.assertEqual((await UserService.get_user_by_telegram_id(777)).pk, user.pk)
+
+    async def test_rejected_change_does_not_stay_cached(self):
+        await CustomUser.objects.acreate(username='alice', role='student', telegram_id=556)
+        cached = await UserService.get_user_by_telegram_id(556)
+
+        cached.username = 'bob'
+        with mock.patch.object(CustomUser, 'asave', side_effect=IntegrityError('username taken')):
+            with self.assertRaises(IntegrityError):
+                await UserService.save_user(cached)
+
+        self.assertEqual((await UserService.get_user_by_telegram_id(556)).username, 'alice')
+
+
+class AuthenticationTests(LocalCacheTestCase):
+    async def test_password_is_checked_off_the_orm_thread(self):
+        user = CustomUser(username='login', role='student')
+        user.set_password('correct horse')
+        await user.asave()
+
+        self.assertEqual((await UserService.authenticate_user('login', 'correct horse')).pk, user.pk)
+        self.assertIsNone(await UserService.authenticate_user('login', 'wrong'))
+        self.assertIsNone(await UserService.authenticate_user('nobody', 'correct horse'))
+
+        user.is_active = False
+        await user.asave()
+        self.assertIsNone(await UserService.authenticate_user('login', 'correct horse'))
+
+    @override_settings(BOT_LOGIN_MAX_FAILURES=2)
+    async def test_failed_logins_are_limited_before_hashing(self):
+        user = CustomUser(username='login', role='student')
+        user.set_password('correct horse')
+        await user.asave()
+
+        self.assertIsNone(await UserService.authenticate_user('login', 'wrong', telegram_id=9))
+        self.assertEqual((await UserService.authenticate_user('login', 'correct horse', telegram_id=9)).pk, user.pk)
+        # A success doesn't count, but doesn't clear the earlier failure either
+        self.assertIsNone(await UserService.authenticate_user('login', 'wrong', telegram_id=9))
+
+        with mock.patch('bot.services.user_service.check_password') as check:
+            with self.assertRaises(TooManyLoginAttempts):
+                await UserService.authenticate_user('login', 'correct horse', telegram_id=9)
+        check.assert_not_called()
+        # Other chats are unaffected
+        self.assertIsNotNone(await UserService.authenticate_user('login', 'correct horse', telegram_id=10))
+
+    @override_settings(BOT_LOGIN_MAX_FAILURES=2)
+    async def test_concurrent_attempts_share_the_budget(self):
+        hashed = []
+
+        async def slow_check(username, password):
+            hashed.append(password)
+            await asyncio.sleep(0.01)
+            return None
+
+        with mock.patch.object(UserService, '_check_credentials', side_effect=slow_check):
+            results = await asyncio.gather(
+                *(UserService.authenticate_user('login', str(i), telegram_id=11) for i in range(5)),
+                return_exceptions=True,
+            )
+        self.assertEqual(len(hashed), 2)
+        self.assertEqual(sum(isinstance(result, TooManyLoginAttempts) for result in results), 3)
+
+
+class BookCatalogCacheTests(LocalCacheTestCase):
+    october = date(2026, 10, 1)
+
+    def books_for(self, period):
+        return async_to_sync(BookService.get_books_for_period)(period)
+
+    def test_catalog_is_served_from_cache_until_a_book_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            book = Book.objects.create(title='Alpomish', period=date(2026, 10, 15), file='books/October/alpomish.pdf')
+
+        self.assertEqual([row.title for row in self.books_for(self.october)], ['Alpomish'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.books_for(self.october)[0].id, book.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            book.delete()
+        self.assertEqual(self.books_for(self.october), [])
+
+    def test_book_change_survives_a_cache_outage(self):
+        with mock.patch('bot.services.book_service.cache') as outage:
+            outage.set.side_effect = ConnectionError('cache is down')
+            with self.assertLogs('bot.services.book_service', 'WARNING'), self.captureOnCommitCallbacks(execute=True):
+                Book.objects.create(title='Alpomish', period=self.october, file='books/October/alpomish.pdf')
+        self.assertTrue(Book.objects.filter(title='Alpomish').exists())
+
+    def test_empty_month_is_cached(self):
+        self.assertEqual(self.books_for(date(2026, 7, 1)), [])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.books_for(date(2026, 7, 1)), [])
+
+    def test_same_month_of_another_year_is_kept_apart(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.create(title='Alpomish', period=date(2025, 10, 1), file='books/October/a.pdf')
+            Book.objects.create(title='Alpomish', period=self.october, file='books/October/b.pdf')
+            Book.objects.create(title='Kecha va kunduz', period=date(2027, 3, 1), file='books/March/c.pdf')
+
+        self.assertEqual(len(self.books_for(self.october)), 1)
+        periods = async_to_sync(BookService.get_available_periods)()
+        self.assertEqual(periods, [date(2025, 10, 1), self.october, date(2027, 3, 1)])
+
+
+@override_settings(BOT_BOOK_MENU_PAGE_SIZE=2)
+class BookMenuTests(LocalCacheTestCase):
+    october = date(2026, 10, 1)
+
+    def menu(self, page=0):
+        return async_to_sync(MenuService.get_book_menu)(self.october, page)
+
+    def test_pages_are_cached_and_rebuilt_when_the_catalog_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for title in ('A', 'B', 'C'):
+                Book.objects.create(title=title, period=self.october, file=f'books/October/{title}.pdf')
+
+        first = self.menu()
+        self.assertEqual([row[0].text for row in first.inline_keyboard], ['A', 'B', '1/2', 'Boshqa kitob'])
+        self.assertEqual(first.inline_keyboard[2][-1].callback_data, 'bookpage_2026-10_1')
+        with self.assertNumQueries(0):
+            self.assertEqual([row[0].text for row in self.menu(1).inline_keyboard], ['C', '⬅️', 'Boshqa kitob'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.filter(title='C').get().delete()
+        self.assertEqual([row[0].text for row in self.menu().inline_keyboard], ['A', 'B', 'Boshqa kitob'])
+        self.assertIsNone(self.menu(1))
+
+
+class BookListingTests(TestCase):
+    async def test_listing_filters_by_period_and_uploader(self):
+        alice = await CustomUser.objects.acreate(username='alice', role='coordinator')
+        bob = await CustomUser.objects.acreate(username='bob', role='coordinator')
+        for title, period, uploader in (('A', date(2026, 10, 1), alice), ('B', date(2026, 10, 1), bob),
+                                        ('C', date(2026, 11, 1), alice)):
+            await Book.objects.acreate(title=title, period=period, uploaded_by=uploader, file=f'books/{title}.pdf')
+
+        async def titles(**filters):
+            return [row[1] async for row in BookService.iter_book_listing(**filters)]
+
+        self.assertEqual(await titles(), ['A', 'B', 'C'])
+        self.assertEqual(await titles(period=date(2026, 10, 1)), ['A', 'B'])
+        self.assertEqual(await titles(period=date(2026, 10, 1), uploader='alice'), ['A'])
+
+    async def test_lines_are_packed_under_the_message_limit(self):
+        async def lines():
+            for i in range(100):
+                yield f"- Book {i:03}"  # 10 characters, so 9 fit per message
+
+        texts = [text async for text in pack_lines(lines(), limit=100)]
+        self.assertTrue(all(len(text) <= 100 for text in texts))
+        self.assertEqual(len(texts), 12)
+        self.assertEqual("\n".join(texts).split("\n"), [f"- Book {i:03}" for i in range(100)])
+
+
+class BookFileIdTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.book = Book(title='Alpomish', period=date(2026, 10, 1), telegram_file_id='cached-id')
+        normalize_period(self.book)
+        self.book.file.save('alpomish.pdf', ContentFile(b'%PDF book'), save=False)
+        self.book.save()
+
+    def select_book(self, bot):
+        callback = mock.AsyncMock(data=f'book_{self.book.id}')
+        callback.message.chat.id = 42
+        async_to_sync(book_selected)(callback, mock.AsyncMock(), bot)
+
+    def test_cached_file_id_is_sent_without_uploading(self):
+        bot = mock.AsyncMock()
+        self.select_book(bot)
+        bot.send_document.assert_awaited_once()
+        self.assertEqual(bot.send_document.await_args.kwargs['document'], 'cached-id')
+
+    def test_rejected_file_id_falls_back_to_an_upload_and_is_replaced(self):
+        bot = mock.AsyncMock()
+        bot.send_document.side_effect = [
+            TelegramBadRequest(method=mock.Mock(), message='wrong file identifier'),
+            mock.Mock(document=mock.Mock(file_id='fresh-id')),
+        ]
+        with self.assertLogs('bot.handlers.student_reading_handlers', 'WARNING'):
+            self.select_book(bot)
+
+        uploaded = bot.send_document.await_args_list[1].kwargs['document']
+        self.assertIsInstance(uploaded, FSInputFile)
+        self.assertEqual(uploaded.path, self.book.file.path)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.telegram_file_id, 'fresh-id')
+
+    def test_replacing_the_file_in_the_admin_forgets_the_file_id(self):
+        self.book.file.save('alpomish-2.pdf', ContentFile(b'%PDF new edition'), save=False)
+        form = mock.Mock(changed_data=['file'])
+        admin.site._registry[Book].save_model(mock.Mock(), self.book, form, change=True)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.telegram_file_id, '')
+
+    @override_settings(TELEGRAM_STORAGE_CHAT_ID='-100')
+    def test_books_without_a_file_id_are_warmed(self):
+        book = Book(title='Kecha va kunduz', period=date(2026, 10, 1))
+        normalize_period(book)
+        book.file.save('kecha.pdf', ContentFile(b'%PDF other'), save=False)
+        with mock.patch('bot.tasks.warm_book_file_ids.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                book.save()
+        delay.assert_called_once_with([book.id])
+
+        with mock.patch('bot.tasks.send_document_to_chat', return_value='warm-id') as send:
+            self.assertEqual(warm_book_file_ids([book.id]), 1)
+        self.assertEqual(send.call_args.args[0], '-100')
+        book.refresh_from_db()
+        self.assertEqual(book.telegram_file_id, 'warm-id')
+        self.assertEqual(Book.objects.get(id=self.book.id).telegram_file_id, 'cached-id')
+
+    def test_upload_errors_are_logged_without_the_bot_token(self):
+        url = 'https://api.telegram.org/bot42:SECRET/sendDocument'
+        error = requests.exceptions.ConnectionError(f"HTTPSConnectionPool: Max retries exceeded with url: {url}")
+        with mock.patch('bot.utils.telegram.BOT_TOKEN', '42:SECRET'), \
+                mock.patch('bot.utils.telegram.requests.post', side_effect=error), \
+                self.assertLogs('bot.utils.telegram', 'WARNING') as logs:
+            self.assertIsNone(send_document_to_chat('-100', b'%PDF', 'book.pdf'))
+        self.assertIn('/bot<token>/sendDocument', logs.output[0])
+        self.assertNotIn('SECRET', logs.output[0])
+
+
+class MediaDeduplicationTests(MediaTestCase):
+    def upload(self, title, period, content):
+        book = Book(title=title, period=period)
+        normalize_period(book)
+        book.file.save(f'{title}.pdf', ContentFile(content), save=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            book.save()
+        return book
+
+    def test_identical_uploads_share_one_blob(self):
+        first = self.upload('Alpomish', date(2026, 10, 1), b'%PDF same bytes')
+        second = self.upload('Alpomish', date(2026, 11, 1), b'%PDF same bytes')
+
+        self.assertNotEqual(first.file.name, second.file.name)
+        self.assertEqual(os.path.realpath(first.file.path), os.path.realpath(second.file.path))
+        with second.file.open('rb') as f:
+            self.assertEqual(f.read(), b'%PDF same bytes')
+        blob = MediaBlob.objects.get()
+        self.assertEqual((blob.refcount, blob.size), (2, 15))
+
+        blob_path = os.path.realpath(first.file.path)
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(MediaBlob.objects.get().refcount, 1)
+        self.assertTrue(os.path.exists(blob_path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertEqual(MediaBlob.objects.get().refcount, 0)
+        self.assertEqual(sweep_media_blobs(), 0)  # released just now, still within the grace period
+        self.assertTrue(os.path.exists(blob_path))
+
+        with override_settings(MEDIA_BLOB_GRACE=0):
+            self.assertEqual(sweep_media_blobs(), 1)
+        self.assertFalse(MediaBlob.objects.exists())
+        self.assertFalse(os.path.exists(blob_path))
+
+    def test_upload_falls_back_to_a_hard_link_without_symlink_rights(self):
+        with mock.patch('bot.storage.os.symlink', side_effect=OSError('A required privilege is not held')):
+            book = self.upload('Alpomish', date(2026, 10, 1), b'%PDF same bytes')
+
+        self.assertFalse(os.path.islink(book.file.path))
+        self.assertEqual(os.stat(book.file.path).st_nlink, 2)
+        with book.file.open('rb') as f:
+            self.assertEqual(f.read(), b'%PDF same bytes')
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def test_sweep_keeps_a_blob_linked_again_before_its_row_is_saved(self):
+        first = self.upload('Alpomish', date(2026, 10, 1), b'%PDF same bytes')
+        blob_path = os.path.realpath(first.file.path)
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        os.utime(blob_path, (0, 0))  # unused for ages
+
+        second = Book(title='Alpomish', period=date(2026, 11, 1))
+        normalize_period(second)
+        second.file.save('Alpomish.pdf', ContentFile(b'%PDF same bytes'), save=False)
+        with override_settings(MEDIA_BLOB_GRACE=60):
+            self.assertEqual(sweep_media_blobs(), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            second.save()
+
+        self.assertEqual(MediaBlob.objects.get().refcount, 1)
+        with second.file.open('rb') as f:
+            self.assertEqual(f.read(), b'%PDF same bytes')
+
+    def test_file_linked_before_its_row_is_saved_keeps_the_blob(self):
+        first = self.upload('Alpomish', date(2026, 10, 1), b'%PDF same bytes')
+        second = Book(title='Alpomish', period=date(2026, 11, 1))
+        normalize_period(second)
+        second.file.save('Alpomish.pdf', ContentFile(b'%PDF same bytes'), save=False)
+
+        # The other row's release lands between the link and the row save
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            second.save()
+
+        self.assertEqual(MediaBlob.objects.get().refcount, 1)
+        with second.file.open('rb') as f:
+            self.assertEqual(f.read(), b'%PDF same bytes')
+
+
+class MediaQueueTests(MediaTestCase):
+    async def wait_until_settled(self, task):
+        for _ in range(200):
+            await task.arefresh_from_db()
+            if task.media_status not in ('pending', 'copying'):
+                return
+            await asyncio.sleep(0.01)
+        self.fail('media copy never finished')
+
+    async def test_video_is_stored_in_the_background_after_a_retry(self):
+        student = await CustomUser.objects.acreate(username='pupil', role='student', telegram_id=42)
+        task = await StudentTask.objects.acreate(
+            student=student, task_name='Task 1', telegram_file_id='tg-video', media_status='pending'
+        )
+        calls = []
+
+        async def flaky_download(bot, file_id, filename, content_type=None):
+            calls.append(file_id)
+            if len(calls) == 1:
+                raise ConnectionError('Telegram timed out')
+            return ContentFile(b'video bytes', name=filename)
+
+        queue = MediaPersistenceQueue(maxsize=1, workers=1, max_attempts=3, retry_delay=0, download=flaky_download)
+        with self.assertLogs('bot.bot.media_queue', 'ERROR'):
+            await queue.start(bot=None)  # picks up the pending row by itself
+            try:
+                await self.wait_until_settled(task)
+            finally:
+                await queue.stop()
+
+        self.assertEqual(calls, ['tg-video', 'tg-video'])
+        self.assertEqual(task.media_status, 'stored')
+        with task.video_file.open('rb') as f:
+            self.assertEqual(f.read(), b'video bytes')
+
+    async def test_refused_job_is_swept_up_and_exhausted_retries_fail(self):
+        async def broken_download(*args, **kwargs):
+            raise ConnectionError('Telegram is down')
+
+        student = await CustomUser.objects.acreate(username='pupil', role='student', telegram_id=42)
+        first, second = [
+            await StudentTask.objects.acreate(
+                student=student, task_name=name, telegram_file_id='tg-video', media_status='pending'
+            )
+            for name in ('Task 1', 'Task 2')
+        ]
+        queue = MediaPersistenceQueue(
+            maxsize=1, workers=1, max_attempts=2, retry_delay=0, sweep_interval=0.01, download=broken_download
+        )
+        self.assertTrue(queue.offer('task', first.id))
+        self.assertTrue(queue.full())
+        with self.assertLogs('bot.bot.media_queue', 'WARNING'):
+            self.assertFalse(queue.offer('task', second.id))
+
+        with self.assertLogs('bot.bot.media_queue', 'ERROR'):
+            await queue.start(bot=None)
+            try:
+                await self.wait_until_settled(first)
+                await self.wait_until_settled(second)
+            finally:
+                await queue.stop()
+        self.assertEqual((first.media_status, second.media_status), ('failed', 'failed'))
+
+    async def test_row_claimed_by_another_process_is_left_alone_until_its_lease_ends(self):
+        calls = []
+
+        async def download(bot, file_id, filename, content_type=None):
+            calls.append(file_id)
+            return ContentFile(b'video bytes', name=filename)
+
+        student = await CustomUser.objects.acreate(username='pupil', role='student', telegram_id=42)
+        task = await StudentTask.objects.acreate(
+            student=student, task_name='Task 1', telegram_file_id='tg-video', media_status='copying',
+            media_lease_until=timezone.now() + timedelta(minutes=5),
+        )
+        queue = MediaPersistenceQueue(maxsize=10, workers=1, max_attempts=1, retry_delay=0, download=download)
+        await queue._persist(MediaJob('task', task.id))
+        self.assertEqual(calls, [])
+
+        await StudentTask.objects.filter(id=task.id).aupdate(media_lease_until=timezone.now() - timedelta(seconds=1))
+        await queue._persist(MediaJob('task', task.id))
+        await task.arefresh_from_db()
+        self.assertEqual((calls, task.media_status), (['tg-video'], 'stored'))
+
+
+class ProtectedFileTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        coordinator = CustomUser.objects.create(username='coord', role='coordinator', is_staff=True)
+        self.client.force_login(coordinator)
+        book = Book(title='Alpomish', period=date(2026, 10, 1), uploaded_by=coordinator)
+        normalize_period(book)
+        book.file.save('alpomish.pdf', ContentFile(b'0123456789'), save=False)
+        book.save()
+        self.url = reverse('view_book_file', args=[book.id])
+
+    def test_byte_ranges_and_conditional_requests(self):
+        response = self.client.get(self.url, secure=True, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+
+        response = self.client.get(self.url, secure=True, HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+
+        response = self.client.get(self.url, secure=True, HTTP_RANGE='bytes=20-')
+        self.assertEqual((response.status_code, response['Content-Range']), (416, 'bytes */10'))
+
+        full = self.client.get(self.url, secure=True)
+        self.assertEqual(b''.join(full.streaming_content), b'0123456789')
+        response = self.client.get(self.url, secure=True, HTTP_IF_NONE_MATCH=full['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        # A stale If-Range gets the whole current file rather than a slice of it
+        response = self.client.get(self.url, secure=True, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(FILE_SERVING_BACKEND='nginx')
+    def test_transfer_is_handed_to_nginx(self):
+        response = self.client.get(self.url, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/books/October/alpomish.pdf')
+        self.assertEqual(response.content, b'')
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        admin_user = CustomUser.objects.create(username='admin', role='coordinator', is_staff=True, is_superuser=True)
+        self.client.force_login(admin_user)
+
+    def add_submissions(self, count):
+        for i in range(count):
+            student = CustomUser.objects.create(username=f'student{CustomUser.objects.count()}', role='student')
+            book = CustomBook.objects.create(name=f'Book {i}', created_by=student, period=date(2026, 10, 1))
+            ReadingSubmission.objects.create(student=student, custom_book=book, voice_message_id=f'file-{i}')
+
+    def changelist_queries(self):
+        url = reverse('admin:bot_readingsubmission_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, secure=True)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_reading_changelist_query_count_does_not_grow_with_rows(self):
+        self.add_submissions(1)
+        few, _ = self.changelist_queries()
+        self.add_submissions(5)
+        many, response = self.changelist_queries()
+        self.assertEqual(few, many)
+        self.assertContains(response, 'preload="none"', count=6)
+
+    def test_title_search_ignores_case(self):
+        Book.objects.create(title='Alpomish', period=date(2026, 10, 1), file='books/October/alpomish.pdf')
+        Book.objects.create(title='Kecha va kunduz', period=date(2026, 10, 1), file='books/October/kecha.pdf')
+        response = self.client.get(reverse('admin:bot_book_changelist'), {'q': 'alpo'}, secure=True)
+        self.assertContains(response, 'Alpomish')
+        self.assertNotContains(response, 'Kecha va kunduz')
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ImportStudentsTests(TestCase):
+    def test_students_and_parents_are_created_with_working_credentials(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        source, output = os.path.join(directory, 'students.csv'), os.path.join(directory, 'credentials.csv')
+        with open(source, 'w', newline='') as f:
+            f.write('first_name,last_name,branch,student_class\nAli,Valiyev,Chilonzor,7-A\nLola,Karimova,,8-B\n')
+
+        call_command('import_students', source, output=output, workers=2, stdout=StringIO())
+
+        with open(output, newline='') as f:
+            sheet = list(csv.DictReader(f))
+        self.assertEqual([row['first_name'] for row in sheet], ['Ali', 'Lola'])
+        for row in sheet:
+            student = CustomUser.objects.get(username=row['student_login'], role='student')
+            parent = CustomUser.objects.get(username=row['parent_login'], role='parent')
+            self.assertEqual(parent.username, f'{student.username}_p')
+            self.assertTrue(student.check_password(row['student_password']))
+            self.assertTrue(parent.check_password(row['parent_password']))
+        self.assertIsNone(CustomUser.objects.get(username=sheet[1]['student_login']).branch)
+
+    # Spawned workers read the settings module, not this class's MD5 override
+    @override_settings(PASSWORD_HASHERS=global_settings.PASSWORD_HASHERS)
+    def test_passwords_hash_in_spawned_workers(self):
+        # The only start method on Windows; the workers must find the settings on their own
+        spawn = multiprocessing.get_context('spawn')
+        with mock.patch('bot.management.commands.import_students.multiprocessing.get_context', return_value=spawn):
+            hashes = hash_passwords(['first', 'second'], workers=2)
+        self.assertEqual([check_password(password, hashed) for password, hashed in zip(['first', 'second'], hashes)],
+                         [True, True])
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_long_names_and_a_sheet_written_meanwhile_are_refused(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        source, output = os.path.join(directory, 'students.csv'), os.path.join(directory, 'credentials.csv')
+        with open(source, 'w', newline='') as f:
+            f.write(f'first_name,last_name\nAli,Valiyev\n{"A" * 31},Karimova\n')
+        with self.assertRaisesMessage(CommandError, 'Line 3: first_name is longer than 30 characters'):
+            call_command('import_students', source, output=output, workers=1, stdout=StringIO())
+
+        with open(source, 'w', newline='') as f:
+            f.write('first_name,last_name\nAli,Valiyev\n')
+
+        bulk_create = CustomUser.objects.bulk_create
+
+        def other_run_writes_its_sheet(*args, **kwargs):
+            with open(output, 'w') as f:
+                f.write('credentials of another run')
+            return bulk_create(*args, **kwargs)
+
+        with mock.patch.object(CustomUser.objects, 'bulk_create', side_effect=other_run_writes_its_sheet):
+            with self.assertRaises(CommandError):
+                call_command('import_students', source, output=output, workers=1, stdout=StringIO())
+        with open(output) as f:
+            self.assertEqual(f.read(), 'credentials of another run')
+        self.assertFalse(CustomUser.objects.exists())
+
+
+class ReadingStatsTests(TestCase):
+    async def test_stats_follow_submissions_and_match_a_rebuild(self):
+        student = await CustomUser.objects.acreate(username='reader', role='student')
+        october = date(2026, 10, 1)
+        books = [
+            await CustomBook.objects.acreate(name=name, created_by=student, period=october)
+            for name in ('Alpomish', 'Kecha va kunduz')
+        ]
+
+        first = await ReadingService.create_reading_submission(student, october, 'file-1', custom_book=books[0])
+        await ReadingService.update_submission_page_count(first.id, 40)
+        await ReadingService.update_submission_page_count(first.id, 45)  # corrected
+        second = await ReadingService.create_reading_submission(student, october, 'file-2', custom_book=books[1])
+        await ReadingService.update_submission_page_count(second.id, 30)
+        task = await TaskService.create_pending_video_submission(student, 'Task 1', 'file-3')
+
+        task_period = timezone.localdate(task.submission_date).replace(day=1)
+        stats = {row.period: row async for row in StudentReadingStats.objects.filter(student=student)}
+        self.assertEqual(
+            (stats[october].books_read, stats[october].pages_read, stats[october].submission_days), (2, 75, 1)
+        )
+        self.assertEqual(stats[task_period].tasks_submitted, 1)
+
+        def snapshot():
+            return list(StudentReadingStats.objects.order_by('period').values_list(
+                'period', 'books_read', 'pages_read', 'tasks_submitted', 'submission_days', 'last_submission_date'
+            ))
+
+        incremental = await sync_to_async(snapshot)()
+        await sync_to_async(call_command)('rebuild_reading_stats', stdout=StringIO())
+        self.assertEqual(await sync_to_async(snapshot)(), incremental)
+
+        await ReadingService.delete_submission(second)
+        row = await StudentReadingStats.objects.aget(student=student, period=october)
+        self.assertEqual((row.books_read, row.pages_read), (1, 45))
+
+    def test_uncounting_a_submission_the_stats_never_saw_stops_at_zero(self):
+        student = CustomUser.objects.create(username='reader', role='student')
+        october = date(2026, 10, 1)
+        book = CustomBook.objects.create(name='Alpomish', created_by=student, period=october)
+        # Sent before the stats table existed: nothing counted it
+        submission = ReadingSubmission.objects.create(
+            student=student, period=october, voice_message_id='file-1', custom_book=book, page_count=40
+        )
+
+        stats.set_page_count(submission.id, 10)
+        stats.delete_reading_submission(submission)
+        row = StudentReadingStats.objects.get(student=student, period=october)
+        self.assertEqual((row.books_read, row.pages_read), (0, 0))
+
+
+class FakeRedis:
+    """The sorted-set, scan and WATCH/MULTI commands RedisLeaderboards uses, kept in a dict."""
+
+    def __init__(self):
+        self.sets = {}
+        self.versions = defaultdict(int)  # bumped on every write, for WATCH
+
+    @staticmethod
+    def _key(key):
+        return key if isinstance(key, bytes) else str(key).encode()
+
+    def _write(self, key):
+        self.versions[self._key(key)] += 1
+        return self.sets.setdefault(self._key(key), {})
+
+    def zincrby(self, key, amount, member):
+        board = self._write(key)
+        member = self._key(member)
+        board[member] = board.get(member, 0) + amount
+        return board[member]
+
+    def zremrangebyscore(self, key, low, high):
+        board = self._write(key)
+        for member in [member for member, score in board.items() if score <= high]:
+            del board[member]
+
+    def zadd(self, key, mapping):
+        self._write(key).update({self._key(member): score for member, score in mapping.items()})
+
+    def expire(self, key, seconds):
+        self.versions[self._key(key)] += 1
+
+    def delete(self, *keys):
+        for key in keys:
+            self.versions[self._key(key)] += 1
+            self.sets.pop(self._key(key), None)
+
+    def exists(self, *keys):
+        return sum(self._key(key) in self.sets for key in keys)
+
+    def _ordered(self, key):
+        return sorted(self.sets.get(self._key(key), {}).items(), key=lambda item: (item[1], item[0]), reverse=True)
+
+    def zrevrange(self, key, start, end, withscores=False):
+        return self._ordered(key)[start:end + 1]
+
+    def zrevrank(self, key, member):
+        members = [name for name, _ in self._ordered(key)]
+        return members.index(self._key(member)) if self._key(member) in members else None
+
+    def zscore(self, key, member):
+        return self.sets.get(self._key(key), {}).get(self._key(member))
+
+    def scan_iter(self, match, count=None):
+        return [key for key in list(self.sets) if fnmatch.fnmatchcase(key.decode(), match)]
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.watched = {}
+        self.immediate = False
+        self.commands = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.watched, self.immediate, self.commands = {}, False, []
+
+    def watch(self, *keys):
+        self.immediate = True
+        self.watched.update({self.redis._key(key): self.redis.versions[self.redis._key(key)] for key in keys})
+
+    def multi(self):
+        self.immediate = False
+
+    def __getattr__(self, name):
+        command = getattr(self.redis, name)
+        if self.immediate:
+            return command
+        return lambda *args, **kwargs: self.commands.append((command, args, kwargs))
+
+    def execute(self):
+        changed = any(self.redis.versions[key] != version for key, version in self.watched.items())
+        commands, self.commands, self.watched = self.commands, [], {}
+        if changed:
+            raise WatchError
+        return [command(*args, **kwargs) for command, args, kwargs in commands]
+
+
+class RedisLeaderboardTests(SimpleTestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.leaderboards = RedisLeaderboards(self.redis)
+        self.boards = student_boards('7-A', 'Chilonzor', date(2026, 10, 7))
+        self.class_week = self.boards[0][1]
+
+    def test_scores_ranks_and_withdrawn_students(self):
+        self.leaderboards.add(self.boards, '1', 20)
+        self.leaderboards.add(self.boards, '2', 35)
+        self.leaderboards.add(self.boards, '3', 10)
+        self.leaderboards.add(self.boards, '3', -10)
+
+        self.assertEqual(self.leaderboards.top(self.class_week, 10), [('2', 35), ('1', 20)])
+        self.assertEqual(self.leaderboards.rank(self.class_week, '1'), (2, 20))
+        self.assertIsNone(self.leaderboards.rank(self.class_week, '3'))
+
+    def test_swap_is_retried_when_an_increment_lands_after_the_snapshot(self):
+        self.leaderboards.add(self.boards, '1', 20)
+        snapshots = []
+
+        def snapshot():
+            snapshots.append(True)
+            if len(snapshots) == 1:
+                self.leaderboards.add(self.boards, '1', 15)  # committed after the database was read
+                return {self.class_week: {'1': 20}}
+            return {self.class_week: {'1': 35}}
+
+        prefix = self.class_week.rsplit(':', 2)[0] + ':'
+        self.assertEqual(self.leaderboards.replace(prefix, snapshot, 60), {self.class_week: {'1': 35}})
+        self.assertEqual(len(snapshots), 2)
+        self.assertEqual(self.leaderboards.top(self.class_week, 10), [('1', 35)])
+        # The other boards of the window had no rows in the snapshot
+        self.assertEqual(self.redis.exists(*(key for _, key in self.boards if key.startswith(prefix))), 1)
+
+
+@override_settings(LEADERBOARD_BACKEND='memory')
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        self.enterContext(mock.patch('bot.leaderboards._leaderboards', None))
+
+    def read(self, student, pages):
+        book = CustomBook.objects.create(name=f'Book {pages}', created_by=student, period=date(2026, 10, 1))
+        submission = stats.create_reading_submission(
+            student=student, custom_book=book, period=book.period, voice_message_id='file'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            stats.set_page_count(submission.id, pages)
+        return submission
+
+    def test_boards_follow_page_counts_and_match_a_rebuild(self):
+        ali = CustomUser.objects.create(username='ali', first_name='Ali', role='student', student_class='7-A', branch='Chilonzor')
+        lola = CustomUser.objects.create(username='lola', first_name='Lola', role='student', student_class='7-A', branch='Chilonzor')
+        other = CustomUser.objects.create(username='other', role='student', student_class='8-B', branch='Chilonzor')
+        self.read(ali, 20)
+        self.read(lola, 35)
+        self.read(other, 50)
+        dropped = self.read(ali, 30)
+        with self.captureOnCommitCallbacks(execute=True):
+            stats.delete_reading_submission(dropped)
+
+        boards = async_to_sync(LeaderboardService.get_boards)(ali, 'week')
+        by_scope = {board.scope: board for board in boards}
+        self.assertEqual(by_scope['class'].top, [('Lola', 35), ('Ali', 20)])
+        self.assertEqual(by_scope['class'].own, (2, 20))
+        self.assertEqual([pages for _, pages in by_scope['branch'].top], [50, 35, 20])
+        self.assertEqual(by_scope['branch'].own, (3, 20))
+
+        leaderboards = get_leaderboards()
+        today = timezone.localdate()
+        incremental = {key: board.order[:] for key, board in leaderboards.boards.items()}
+        rebuild_window('week', today)
+        rebuild_window('month', today)
+        self.assertEqual({key: board.order for key, board in leaderboards.boards.items()}, incremental)
+
+
+class LazyVoiceTests(TestCase):
+    def setUp(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        self.enterContext(override_settings(
+            VOICE_CACHE_DIR=cache_dir, VOICE_CACHE_MAX_BYTES=10, VOICE_CACHE_GRACE=0,
+        ))
+        self.student = CustomUser.objects.create(username='reader', role='student')
+        self.client.force_login(self.student)
+
+    def voice(self, unique_id):
+        book = CustomBook.objects.create(name=f'Book {unique_id}', created_by=self.student, period=date(2026, 10, 1))
+        return ReadingSubmission.objects.create(
+            student=self.student, custom_book=book, period=book.period,
+            voice_message_id=f'file-{unique_id}', voice_file_unique_id=unique_id, media_status='remote',
+        )
+
+    def test_voice_is_fetched_once_and_least_recently_played_is_evicted(self):
+        def fake_download(file_id, destination):
+            with open(destination, 'wb') as out:
+                out.write(b'OggS' + file_id[-1].encode())  # 5 bytes: two voices fit in the cache
+            return True
+
+        first, second, third = self.voice('a'), self.voice('b'), self.voice('c')
+        with mock.patch('bot.utils.telegram.download_file', side_effect=fake_download) as download:
+            for submission in (first, second, first, third):
+                response = self.client.get(reverse('view_reading_voice', args=[submission.id]), secure=True)
+                self.assertEqual(b''.join(response.streaming_content), b'OggS' + submission.voice_file_unique_id.encode())
+                response.close()
+                time.sleep(0.02)  # keep access times distinct on coarse filesystem clocks
+
+        self.assertEqual([call.args[0] for call in download.call_args_list], ['file-a', 'file-b', 'file-c'])
+        self.assertEqual(sorted(os.listdir(settings.VOICE_CACHE_DIR)), ['a.ogg', 'c.ogg'])
+
+    def test_failed_fetch_is_reported(self):
+        with mock.patch('bot.utils.telegram.download_file', return_value=False):
+            response = self.client.get(reverse('view_reading_voice', args=[self.voice('a').id]), secure=True)
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(os.listdir(settings.VOICE_CACHE_DIR), [])
+
+    @override_settings(VOICE_CACHE_GRACE=60)
+    def test_eviction_spares_recently_played_voices_and_sweeps_abandoned_downloads(self):
+        def cached(name, age):
+            path = os.path.join(settings.VOICE_CACHE_DIR, name)
+            with open(path, 'wb') as out:
+                out.write(b'OggS!')
+            then = time.time() - age
+            os.utime(path, (then, then))
+            return name
+
+        # 20 bytes of voices against a 10 byte limit, but only one has gone unplayed long enough
+        old = cached('old.ogg', 300)
+        cached('resolved.ogg', 5)
+        cached('playing.ogg', 1)
+        keep = cached('new.ogg', 0)
+        cached(f'{keep}.{"a" * 32}.part', 5)  # a download still being written
+        cached(f'{old}.{"b" * 32}.part', 300)  # left by a crashed worker
+
+        evict_voices(keep=os.path.join(settings.VOICE_CACHE_DIR, keep))
+
+        self.assertEqual(
+            sorted(os.listdir(settings.VOICE_CACHE_DIR)),
+            ['new.ogg', f'new.ogg.{"a" * 32}.part', 'playing.ogg', 'resolved.ogg'],
+        )
+
+
+class FSMStorageTests(SimpleTestCase):
+    @override_settings(BOT_FSM_STORAGE='memory')
+    def test_memory_storage_needs_no_isolation(self):
+        storage, isolation = create_fsm_storage()
+        self.assertIsInstance(storage, MemoryStorage)
+        self.assertIsInstance(isolation, DisabledEventIsolation)
+
+    @override_settings(
+        BOT_FSM_STORAGE='redis', BOT_FSM_REDIS_URL='redis://redis.invalid:6379/3',
+        BOT_FSM_STATE_TTL=600, BOT_FSM_DATA_TTL=900,
+    )
+    async def test_redis_storage_expires_sessions_and_isolates_users_across_processes(self):
+        storage, isolation = create_fsm_storage()
+        try:
+            self.assertIsInstance(storage, RedisStorage)
+            self.assertEqual((storage.state_ttl, storage.data_ttl), (600, 900))
+            self.assertEqual(storage.key_builder.prefix, 'fsm')
+            self.assertEqual(storage.redis.connection_pool.connection_kwargs['db'], 3)
+            self.assertIsInstance(isolation, RedisEventIsolation)
+            self.assertIs(isolation.redis, storage.redis)
+        finally:
+            await storage.close()
+
+    @override_settings(BOT_FSM_STORAGE='mongo')
+    def test_unknown_backend_is_a_configuration_error(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, "Unknown BOT_FSM_STORAGE 'mongo'"):
+            create_fsm_storage()
+
+
+class ChunkedUploadTests(SimpleTestCase):
+    def record_spools(self, target):
+        """Patch ``target`` so every ChunkSpool it creates is kept in the returned list."""
+        created = []
+
+        def spool(*args, **kwargs):
+            created.append(ChunkSpool(*args, **kwargs))
+            return created[-1]
+
+        self.enterContext(mock.patch(target, spool))
+        return created
+
+    def test_chunks_are_spooled_with_their_hash_and_size(self):
+        chunks = [b'first chunk ', b'second chunk']
+        upload = to_django_file(iter(chunks), 'voice.ogg')
+        self.addCleanup(upload.close)
+
+        self.assertEqual(upload.size, 24)
+        self.assertEqual(upload.sha256, hashlib.sha256(b''.join(chunks)).hexdigest())
+        self.assertEqual(upload.read(), b''.join(chunks))
+
+    def test_oversized_upload_is_refused_and_its_temporary_file_removed(self):
+        created = self.record_spools('bot.utils.files.ChunkSpool')
+        with self.assertRaises(UploadTooLarge):
+            to_django_file(iter([b'12345', b'67890']), 'voice.ogg', max_size=8)
+        self.assertFalse(os.path.exists(created[0].upload.temporary_file_path()))
+
+    def test_bytes_and_file_objects_are_wrapped_without_spooling(self):
+        self.assertEqual(to_django_file(b'bytes', 'a.ogg').read(), b'bytes')
+        handle = StringIO('text')
+        self.assertIs(to_django_file(handle, 'a.txt').file, handle)
+        already = ContentFile(b'x', name='a.ogg')
+        self.assertIs(to_django_file(already), already)
+
+    async def test_telegram_download_streams_into_a_spool(self):
+        async def stream_content(url, timeout, chunk_size):
+            self.assertEqual(url, 'https://files/voice/1.oga')
+            yield b'ab'
+            yield b'cd'
+
+        bot = mock.Mock(token='token')
+        bot.get_file = mock.AsyncMock(return_value=mock.Mock(file_path='voice/1.oga'))
+        bot.session.api.file_url = lambda token, path: f'https://files/{path}'
+        bot.session.stream_content = stream_content
+
+        upload = await download_telegram_file(bot, 'file-id', '1.ogg', content_type='audio/ogg')
+        self.addCleanup(upload.close)
+        self.assertEqual((upload.size, upload.sha256), (4, hashlib.sha256(b'abcd').hexdigest()))
+        self.assertEqual(upload.content_type, 'audio/ogg')
+
+    async def test_failed_telegram_download_leaves_no_temporary_file(self):
+        async def stream_content(url, timeout, chunk_size):
+            yield b'ab'
+            raise ConnectionError('connection reset')
+
+        bot = mock.Mock(token='token')
+        bot.get_file = mock.AsyncMock(return_value=mock.Mock(file_path='voice/1.oga'))
+        bot.session.stream_content = stream_content
+
+        created = self.record_spools('bot.bot.utils.ChunkSpool')
+        with self.assertLogs('bot.bot.utils', 'ERROR'):
+            with self.assertRaises(ConnectionError):
+                await download_telegram_file(bot, 'file-id', '1.ogg')
+        self.assertFalse(os.path.exists(created[0].upload.temporary_file_path()))
+
+
+class AcademicPeriodTests(SimpleTestCase):
+    def test_month_name_maps_into_the_current_academic_year(self):
+        self.assertEqual(academic_period('October', today=date(2027, 3, 5)), date(2026, 10, 1))
+        self.assertEqual(academic_period('march', today=date(2026, 9, 1)), date(2027, 3, 1))
+        self.assertEqual(academic_period('August', today=date(2026, 8, 31)), date(2026, 8, 1))
+        self.assertIsNone(academic_period('Oktabr'))
+
+
+class MigrationTests(TransactionTestCase):
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([('bot', target)])
+        return executor.loader.project_state([('bot', target)]).apps
+
+    def test_books_that_collide_on_period_are_renamed(self):
+        apps = self.migrate('0006_add_academic_period')
+        self.addCleanup(call_command, 'migrate', verbosity=0)
+        Book = apps.get_model('bot', 'Book')
+        CustomBook = apps.get_model('bot', 'CustomBook')
+        User = apps.get_model('bot', 'CustomUser')
+        student = User.objects.create(username='pupil', role='student')
+        october = timezone.make_aware(datetime(2026, 10, 5))
+        for month in ('October', 'october', 'Oktabr'):  # the unknown name falls back to the upload month
+            book = Book.objects.create(title='Alpomish', month=month)
+            Book.objects.filter(pk=book.pk).update(upload_date=october)
+            custom_book = CustomBook.objects.create(name='Kitob', month=month, created_by=student)
+            CustomBook.objects.filter(pk=custom_book.pk).update(creation_date=october)
+
+        apps = self.migrate('0008_academic_period_constraints')
+        Book = apps.get_model('bot', 'Book')
+        CustomBook = apps.get_model('bot', 'CustomBook')
+        self.assertEqual(
+            list(Book.objects.order_by('id').values_list('title', 'period')),
+            [('Alpomish', date(2026, 10, 1)), ('Alpomish (2)', date(2026, 10, 1)), ('Alpomish (3)', date(2026, 10, 1))],
+        )
+        self.assertEqual(
+            list(CustomBook.objects.order_by('id').values_list('name', flat=True)), ['Kitob', 'Kitob (2)', 'Kitob (3)']
+        )
+
+    def test_reading_stats_are_backfilled(self):
+        apps = self.migrate('0014_media_claims')
+        self.addCleanup(call_command, 'migrate', verbosity=0)
+        User = apps.get_model('bot', 'CustomUser')
+        CustomBook = apps.get_model('bot', 'CustomBook')
+        ReadingSubmission = apps.get_model('bot', 'ReadingSubmission')
+        october = date(2026, 10, 1)
+        student = User.objects.create(username='reader', role='student')
+        for name, pages in (('Alpomish', 40), ('Kecha va kunduz', 30)):
+            book = CustomBook.objects.create(name=name, month='October', period=october, created_by=student)
+            ReadingSubmission.objects.create(
+                student=student, custom_book=book, period=october, voice_message_id=name, page_count=pages
+            )
+
+        apps = self.migrate('0015_backfill_reading_stats')
+        row = apps.get_model('bot', 'StudentReadingStats').objects.get(student_id=student.id, period=october)
+        self.assertEqual((row.books_read, row.pages_read, row.submission_days), (2, 70, 1))
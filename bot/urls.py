@@ -1,8 +1,9 @@
 from django.urls import path
-from .views import view_task_video, view_book_file, test_task_view
+from .views import view_task_video, view_reading_voice, view_book_file, test_task_view
 
 urlpatterns = [
     path('task/video/<int:pk>/', view_task_video, name='view_task_video'),
+    path('reading/voice/<int:pk>/', view_reading_voice, name='view_reading_voice'),
     path('books/<int:pk>/file/', view_book_file, name='view_book_file'),
     path('test-celery/', test_task_view, name='test_celery'),
 
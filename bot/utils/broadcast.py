@@ -0,0 +1,166 @@
+# utils/broadcast.py
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+
+import aiohttp
+from django.conf import settings
+
+from .telegram import BOT_TOKEN
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_API_URL = "https://api.telegram.org"
+
+
+@dataclass
+class OutgoingMessage:
+    chat_id: int | str
+    text: str
+    key: object = None  # caller's handle for the outcome, defaults to chat_id
+
+    def __post_init__(self):
+        if self.key is None:
+            self.key = self.chat_id
+
+
+@dataclass
+class BroadcastResult:
+    sent: list = field(default_factory=list)
+    skipped: list = field(default_factory=list)  # permanent errors: bot blocked, chat not found
+    failed: list = field(default_factory=list)   # still failing after all attempts
+    errors: dict = field(default_factory=dict)
+
+    def summary(self):
+        return {"sent": len(self.sent), "skipped": len(self.skipped), "failed": len(self.failed)}
+
+
+class TokenBucket:
+    """Global send-rate limiter shared by every broadcast worker.
+
+    A 429 from Telegram pauses the whole bucket for ``retry_after`` seconds,
+    since the flood limit applies to the bot, not to a single chat.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+async def _deliver(session, url, bucket, message, result, max_attempts, parse_mode):
+    payload = {"chat_id": message.chat_id, "text": message.text}
+    if parse_mode:
+        payload["parse_mode"] = parse_mode
+
+    attempts = 0
+    error = None
+    while attempts < max_attempts:
+        await bucket.acquire()
+        try:
+            async with session.post(url, json=payload) as response:
+                status = response.status
+                body = await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            attempts += 1
+            error = f"connection error: {e}"
+            await asyncio.sleep(2 ** attempts)
+            continue
+
+        if not isinstance(body, dict):
+            # Empty or non-object body, e.g. an error page from a proxy in front of the API
+            attempts += 1
+            error = f"{status} - unexpected response body"
+            await asyncio.sleep(2 ** attempts)
+            continue
+
+        if status == 200 and body.get("ok"):
+            result.sent.append(message.key)
+            return
+
+        description = body.get("description", "")
+        if status == 429:
+            # Flood control: wait as told, without spending an attempt
+            retry_after = (body.get("parameters") or {}).get("retry_after", 1)
+            logger.warning(f"Telegram flood limit hit, pausing broadcast for {retry_after}s")
+            bucket.pause(retry_after)
+            continue
+        if status in (400, 403):
+            result.skipped.append(message.key)
+            result.errors[message.key] = f"{status} - {description}"
+            return
+
+        attempts += 1
+        error = f"{status} - {description}"
+        await asyncio.sleep(2 ** attempts)
+
+    result.failed.append(message.key)
+    result.errors[message.key] = error
+
+
+async def broadcast(messages, *, rate=None, concurrency=None, max_attempts=3, parse_mode="HTML",
+                    token=None, api_url=TELEGRAM_API_URL):
+    """Send ``messages`` (an iterable of OutgoingMessage) over one pooled HTTP session.
+
+    Throughput is capped by a global token bucket (TELEGRAM_BROADCAST_RATE per second)
+    and by TELEGRAM_BROADCAST_CONCURRENCY in-flight requests.
+    """
+    rate = rate or settings.TELEGRAM_BROADCAST_RATE
+    concurrency = concurrency or settings.TELEGRAM_BROADCAST_CONCURRENCY
+    url = f"{api_url}/bot{token or BOT_TOKEN}/sendMessage"
+
+    bucket = TokenBucket(rate)
+    result = BroadcastResult()
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=15)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        async def worker():
+            while True:
+                message = await queue.get()
+                if message is None:
+                    return
+                try:
+                    await _deliver(session, url, bucket, message, result, max_attempts, parse_mode)
+                except Exception as e:
+                    # A dead worker would leave the producer blocked on the full queue
+                    logger.exception(f"Broadcast to {message.chat_id} failed")
+                    result.failed.append(message.key)
+                    result.errors[message.key] = f"unexpected error: {e}"
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        for message in messages:
+            await queue.put(message)
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+
+    return result
+
+
+def run_broadcast(messages, **kwargs):
+    """Blocking entry point for Celery tasks and management commands."""
+    return asyncio.run(broadcast(messages, **kwargs))
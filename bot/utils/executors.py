@@ -0,0 +1,49 @@
+# utils/executors.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+_executors = {}
+_lock = threading.Lock()
+
+
+def _get_executor(name, max_workers):
+    executor = _executors.get(name)
+    if executor is None:
+        with _lock:
+            executor = _executors.get(name)
+            if executor is None:
+                executor = _executors[name] = ThreadPoolExecutor(
+                    max_workers=max_workers,
+                    thread_name_prefix=f"bot-{name}",
+                )
+    return executor
+
+
+def get_blocking_executor():
+    """Shared pool for blocking work that must not queue behind the ORM's single thread."""
+    return _get_executor("blocking", settings.BOT_BLOCKING_WORKERS)
+
+
+def get_password_executor():
+    """Pool reserved for password hashing, so a burst of logins cannot hold up file writes.
+
+    Threads are enough: hashlib's PBKDF2 releases the GIL while it runs.
+    """
+    return _get_executor("passwords", settings.BOT_PASSWORD_WORKERS)
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run ``func`` on the bounded blocking pool instead of the thread-sensitive executor.
+
+    Meant for storage writes and file system checks; database queries
+    belong on the async ORM so they keep using the request's connection.
+    """
+    return await sync_to_async(func, thread_sensitive=False, executor=get_blocking_executor())(*args, **kwargs)
+
+
+async def run_password_hashing(func, *args, **kwargs):
+    """Run a make_password/check_password style call on the password pool."""
+    return await sync_to_async(func, thread_sensitive=False, executor=get_password_executor())(*args, **kwargs)
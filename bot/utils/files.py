@@ -0,0 +1,58 @@
+# utils/files.py
+import hashlib
+
+from django.core.files.base import ContentFile, File
+from django.core.files.uploadedfile import TemporaryUploadedFile
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+class ChunkSpool:
+    """Writes incoming chunks to a temporary upload, hashing and size-checking them on the way.
+
+    Only one chunk is held in memory at a time. With FileSystemStorage the finished
+    upload is moved into MEDIA_ROOT instead of being copied.
+    """
+
+    def __init__(self, name, content_type=None, max_size=None):
+        self.upload = TemporaryUploadedFile(name, content_type, 0, None)
+        self.max_size = max_size
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+
+    def write(self, chunk):
+        self.size += len(chunk)
+        if self.max_size is not None and self.size > self.max_size:
+            raise UploadTooLarge(f"File exceeds {self.max_size} bytes")
+        self._sha256.update(chunk)
+        self.upload.write(chunk)
+
+    def finish(self):
+        self.upload.size = self.size
+        self.upload.sha256 = self._sha256.hexdigest()
+        self.upload.seek(0)
+        return self.upload
+
+    def abort(self):
+        self.upload.close()
+
+
+def to_django_file(content, name=None, max_size=None):
+    """Accept bytes, a file-like object or an iterable of byte chunks and return a Django File."""
+    if isinstance(content, File):
+        return content
+    if isinstance(content, (bytes, bytearray)):
+        return ContentFile(content, name=name)
+    if hasattr(content, 'read'):
+        return File(content, name=name)
+
+    spool = ChunkSpool(name or 'upload', max_size=max_size)
+    try:
+        for chunk in content:
+            spool.write(chunk)
+    except BaseException:
+        spool.abort()
+        raise
+    return spool.finish()
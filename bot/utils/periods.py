@@ -0,0 +1,48 @@
+# utils/periods.py
+from datetime import date
+
+from django.utils import timezone
+
+MONTHS = ["January", "February", "March", "April", "May", "June",
+          "July", "August", "September", "October", "November", "December"]
+
+ACADEMIC_YEAR_START_MONTH = 9  # the school year runs September to August
+
+
+def academic_period(month_name, today=None):
+    """First day of the named month within the academic year that contains ``today``.
+
+    "October" picked in March 2026 is October 2025; picked in September 2026 it is October 2026.
+    Returns None for anything that is not an English month name.
+    """
+    try:
+        month = [name.lower() for name in MONTHS].index(month_name.strip().lower()) + 1
+    except (AttributeError, ValueError):
+        return None
+    today = today or timezone.localdate()
+    start_year = today.year if today.month >= ACADEMIC_YEAR_START_MONTH else today.year - 1
+    return date(start_year if month >= ACADEMIC_YEAR_START_MONTH else start_year + 1, month, 1)
+
+
+def academic_year_periods(today=None):
+    """The twelve periods of the current academic year, September first."""
+    return [academic_period(name, today) for name in
+            MONTHS[ACADEMIC_YEAR_START_MONTH - 1:] + MONTHS[:ACADEMIC_YEAR_START_MONTH - 1]]
+
+
+def month_name(period):
+    return MONTHS[period.month - 1]
+
+
+def period_label(period):
+    return f"{month_name(period)} {period.year}"
+
+
+def period_to_key(period):
+    """Compact form for callback data, e.g. ``2026-10``."""
+    return period.strftime("%Y-%m")
+
+
+def period_from_key(key):
+    year, month = key.split("-")
+    return date(int(year), int(month), 1)
@@ -1,22 +1,55 @@
+import logging
 import os
 
 import requests
 
+logger = logging.getLogger(__name__)
+
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 
-def send_message_to_user(telegram_id, message):
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-    payload = {
-        "chat_id": telegram_id,
-        "text": message,
-        "parse_mode": "HTML"  # Optional: enables basic formatting
-    }
+def _redacted(error):
+    """The error's text without the bot token, which requests includes in the failed URL."""
+    text = str(error)
+    return text.replace(BOT_TOKEN, "<token>") if BOT_TOKEN else text
+
+def send_document_to_chat(chat_id, file_obj, filename, caption=None):
+    """Upload a document once and return the Telegram file_id for reuse."""
+    url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendDocument"
+    data = {"chat_id": chat_id, "disable_notification": True}
+    if caption:
+        data["caption"] = caption
+    try:
+        response = requests.post(url, data=data, files={"document": (filename, file_obj)}, timeout=300)
+        response.raise_for_status()
+        return response.json()["result"]["document"]["file_id"]
+    except requests.exceptions.HTTPError as e:
+        logger.warning("Telegram API error: %s - %s", e.response.status_code, e.response.text)
+    except requests.exceptions.RequestException as e:
+        logger.warning("Telegram connection error: %s", _redacted(e))
+    except (KeyError, ValueError) as e:
+        logger.warning("Unexpected Telegram response: %s", e)
+    return None
+
+def download_file(file_id, destination):
+    """Stream a Telegram file to the ``destination`` path. Returns True once it is fully written."""
     try:
-        response = requests.post(url, json=payload, timeout=10)  # Using json instead of data
+        response = requests.get(
+            f"https://api.telegram.org/bot{BOT_TOKEN}/getFile", params={"file_id": file_id}, timeout=10
+        )
         response.raise_for_status()
+        file_path = response.json()["result"]["file_path"]
+        with requests.get(
+            f"https://api.telegram.org/file/bot{BOT_TOKEN}/{file_path}", stream=True, timeout=60
+        ) as response:
+            response.raise_for_status()
+            with open(destination, "wb") as out:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    out.write(chunk)
         return True
     except requests.exceptions.HTTPError as e:
-        print(f"Telegram API error: {e.response.status_code} - {e.response.text}")
+        logger.warning("Telegram API error: %s - %s", e.response.status_code, e.response.text)
     except requests.exceptions.RequestException as e:
-        print(f"Telegram connection error: {e}")
-    return False
\ No newline at end of file
+        logger.warning("Telegram connection error: %s", _redacted(e))
+    except (KeyError, ValueError) as e:
+        logger.warning("Unexpected Telegram response: %s", e)
+    return False
@@ -1,9 +1,100 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404
-from django.http import FileResponse, HttpResponse, HttpResponseForbidden
+from django.http import FileResponse, HttpResponse, HttpResponseForbidden, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
 import os
+import re
+from urllib.parse import quote
+
+from .models import StudentTask, Book, ReadingSubmission
+from .voice_cache import cached_voice_path
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+RANGE_CHUNK_SIZE = 64 * 1024
+
+
+def _requested_range(request, size, etag, last_modified):
+    """(start, end) of a single satisfiable byte range, None to send the whole file, or False for 416."""
+    header = request.headers.get('Range')
+    if not header or size == 0:
+        return None
+    if_range = request.headers.get('If-Range')
+    if if_range and if_range != etag and parse_http_date_safe(if_range) != last_modified:
+        return None  # the client's copy is stale: send it the current file
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None  # several ranges, or a form we don't serve; a full response is always allowed
+    first, last = match.groups()
+    if not first:
+        start, end = max(size - int(last), 0), size - 1  # suffix range: the last N bytes
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(RANGE_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def serve_file_path(request, path, content_type=None, filename=None, internal_url=None):
+    """Serve a file that has passed the view's permission check.
+
+    Answers If-None-Match/If-Modified-Since with 304 and single byte ranges with 206,
+    so browsers can seek through videos without fetching them whole. With
+    FILE_SERVING_BACKEND set to 'nginx' or 'sendfile' the transfer itself is handed
+    to the web server, which then handles ranges.
+    """
+    try:
+        stat = os.stat(path)  # follows deduplicated media links to their blob
+    except FileNotFoundError:
+        return HttpResponse("File not found on server", status=404)
 
-from .models import StudentTask, Book
+    etag = quote_etag(f'{stat.st_size:x}-{stat.st_mtime_ns:x}')
+    last_modified = int(stat.st_mtime)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    content_type = content_type or 'application/octet-stream'
+    backend = settings.FILE_SERVING_BACKEND
+    if backend == 'nginx' and internal_url:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = internal_url
+    elif backend == 'sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = os.path.realpath(path)
+    else:
+        byte_range = _requested_range(request, stat.st_size, etag, last_modified)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+        if byte_range:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                _read_range(path, start, end - start + 1), status=206, content_type=content_type
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+            response['Content-Length'] = str(end - start + 1)
+        else:
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+        response['Accept-Ranges'] = 'bytes'
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Content-Disposition'] = f'inline; filename="{filename or os.path.basename(path)}"'
+    return response
 
 
 def serve_protected_file(file_field, request, content_type=None):
@@ -11,15 +102,13 @@ def serve_protected_file(file_field, request, content_type=None):
     if not file_field:
         return HttpResponse("File not found", status=404)
 
-    if not os.path.exists(file_field.path):
-        return HttpResponse("File not found on server", status=404)
-
-    response = FileResponse(
-        file_field.open('rb'),
-        content_type=content_type or 'application/octet-stream'
+    return serve_file_path(
+        request,
+        file_field.path,
+        content_type=content_type,
+        filename=os.path.basename(file_field.name),
+        internal_url=settings.FILE_ACCEL_REDIRECT_PREFIX + quote(file_field.name),
     )
-    response['Content-Disposition'] = f'inline; filename="{os.path.basename(file_field.name)}"'
-    return response
 
 
 @login_required
@@ -37,6 +126,24 @@ def view_task_video(request, pk):
     )
 
 
+@login_required
+def view_reading_voice(request, pk):
+    submission = get_object_or_404(ReadingSubmission, pk=pk)
+
+    # Permission check
+    if not (request.user.is_staff or request.user == submission.student):
+        return HttpResponseForbidden("You don't have permission to listen to this voice")
+
+    if submission.voice_file or not submission.voice_message_id:
+        return serve_protected_file(submission.voice_file, request, content_type='audio/ogg')
+
+    # Kept on Telegram (VOICE_STORAGE_MODE='lazy'): play it from the local voice cache
+    path = cached_voice_path(submission)
+    if path is None:
+        return HttpResponse("Could not fetch the voice from Telegram", status=502)
+    return serve_file_path(request, path, content_type='audio/ogg', filename=f"{submission.id}.ogg")
+
+
 @login_required
 def view_book_file(request, pk):
     book = get_object_or_404(Book, pk=pk)
@@ -0,0 +1,76 @@
+import hashlib
+import os
+import time
+import uuid
+
+from django.conf import settings
+
+from .utils import telegram
+
+
+def _cache_path(submission):
+    # file_unique_id is the same for every copy of a voice; older rows only have the file_id
+    key = submission.voice_file_unique_id or hashlib.sha256(submission.voice_message_id.encode()).hexdigest()
+    return os.path.join(settings.VOICE_CACHE_DIR, f'{key}.ogg')
+
+
+def cached_voice_path(submission):
+    """Local path of a voice kept on Telegram, fetched into the cache on first access.
+
+    Returns None when Telegram could not provide the file. Each hit refreshes the
+    file's mtime, so eviction drops the least recently played voices first.
+    """
+    path = _cache_path(submission)
+    try:
+        os.utime(path)
+        return path
+    except FileNotFoundError:
+        pass
+
+    os.makedirs(settings.VOICE_CACHE_DIR, exist_ok=True)
+    temp_path = f'{path}.{uuid.uuid4().hex}.part'
+    try:
+        if not telegram.download_file(submission.voice_message_id, temp_path):
+            return None
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    evict_voices(keep=path)
+    return path
+
+
+def evict_voices(keep=None):
+    """Delete least recently used voices until the cache fits in VOICE_CACHE_MAX_BYTES.
+
+    Voices played within VOICE_CACHE_GRACE seconds are kept even over the limit, since a
+    request that has just resolved one may not have opened it yet. Partial downloads older
+    than that were left behind by a crashed worker and are removed.
+    """
+    stale_before = time.time() - settings.VOICE_CACHE_GRACE
+    entries = []
+    with os.scandir(settings.VOICE_CACHE_DIR) as scan:
+        for entry in scan:
+            if not entry.is_file():
+                continue
+            stat = entry.stat()
+            if entry.name.endswith('.ogg'):
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+            elif entry.name.endswith('.part') and stat.st_mtime < stale_before:
+                _remove(entry.path)
+
+    total = sum(size for _, size, _ in entries)
+    for mtime, size, path in sorted(entries):
+        if total <= settings.VOICE_CACHE_MAX_BYTES or mtime >= stale_before:
+            break
+        if path == keep:
+            continue
+        _remove(path)
+        total -= size
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass  # evicted by a concurrent request
@@ -22,4 +22,20 @@ app.conf.beat_schedule = {
         'task': 'bot.tasks.send_daily_reminders',
         'schedule': crontab(minute=54, hour=10),  # 9:00 AM daily
     },
+    'retry-pending-notifications': {
+        'task': 'bot.tasks.retry_pending_notifications',
+        'schedule': crontab(minute='*/5'),
+    },
+    'warm-book-file-ids': {
+        'task': 'bot.tasks.warm_book_file_ids',
+        'schedule': crontab(minute=0, hour=3),  # catch books the post_save hook missed
+    },
+    'reconcile-leaderboards': {
+        'task': 'bot.tasks.reconcile_leaderboards',
+        'schedule': crontab(minute=30, hour=3),  # undo drift from admin edits and missed updates
+    },
+    'sweep-media-blobs': {
+        'task': 'bot.tasks.sweep_media_blobs',
+        'schedule': crontab(minute=0, hour=4),
+    },
 }
\ No newline at end of file
@@ -1,6 +1,7 @@
 import os
 from pathlib import Path
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -71,6 +72,58 @@ DATABASES = {
         'PASSWORD': os.getenv('DB_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
         'PORT': os.getenv('DB_PORT', ''),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+# Which kind of process loaded the settings: 'web', 'bot' or 'celery'; sizes its database connection pool
+PROCESS_ROLE = os.getenv('PROCESS_ROLE', 'web')
+# Seconds a SQLite connection waits for another writer before failing with "database is locked"
+SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', '20'))
+# Tasks a Celery worker runs at once (its -c option; Celery's own default is the CPU count)
+CELERY_WORKER_CONCURRENCY = int(os.getenv('CELERY_WORKER_CONCURRENCY', str(os.cpu_count() or 1)))
+
+if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    # One psycopg pool per process. The bot queries from a single ORM thread and the web process
+    # serves several requests at once. The worker runs with -P eventlet (see README), so all of its
+    # tasks share one process and each running task can hold a connection.
+    DB_POOL_SIZES = {
+        'web': (2, int(os.getenv('DB_POOL_MAX_WEB', '10'))),
+        'bot': (1, int(os.getenv('DB_POOL_MAX_BOT', '4'))),
+        'celery': (1, int(os.getenv('DB_POOL_MAX_CELERY', str(CELERY_WORKER_CONCURRENCY)))),
+    }
+    if PROCESS_ROLE not in DB_POOL_SIZES:
+        raise ImproperlyConfigured(
+            f"Unknown PROCESS_ROLE {PROCESS_ROLE!r}; expected one of: {', '.join(DB_POOL_SIZES)}"
+        )
+    min_size, max_size = DB_POOL_SIZES[PROCESS_ROLE]
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': min_size,
+            'max_size': max_size,
+            'timeout': int(os.getenv('DB_POOL_TIMEOUT', '10')),
+            'max_idle': 300,
+        },
+    }
+    DATABASES['default']['CONN_MAX_AGE'] = 0  # required with a pool, which does the reuse itself
+elif DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # IMMEDIATE takes the write lock when a transaction starts, so a transaction that reads and then
+    # writes waits for the lock instead of failing. WAL and synchronous=NORMAL are set in bot.signals.
+    DATABASES['default']['OPTIONS'] = {
+        'transaction_mode': 'IMMEDIATE',
+        'timeout': SQLITE_BUSY_TIMEOUT,
+    }
+
+# Cache
+# Shared by the bot, Celery and web processes. LocMemCache gives each process its own copy, so like
+# BOT_FSM_STORAGE and LEADERBOARD_BACKEND it is only the default for development
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache' if DEBUG
+                             else 'django.core.cache.backends.redis.RedisCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'redis://localhost:6379/1'),
+        'KEY_PREFIX': 'schoolbot',
     }
 }
 
@@ -109,6 +162,23 @@ STATICFILES_DIRS = [BASE_DIR / 'assets']
 # Media files (user-uploaded content)
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Store uploaded books, videos and voices once per distinct content (see bot.storage)
+MEDIA_DEDUPLICATION = os.getenv('MEDIA_DEDUPLICATION', 'true').lower() == 'true'
+# Seconds a blob must go unreferenced and untouched before sweep_media_blobs deletes it
+MEDIA_BLOB_GRACE = int(os.getenv('MEDIA_BLOB_GRACE', str(24 * 60 * 60)))
+# 'eager' copies every reading voice into MEDIA_ROOT; 'lazy' keeps only the Telegram file_id and
+# fetches a voice into VOICE_CACHE_DIR the first time it is played (see bot.voice_cache)
+VOICE_STORAGE_MODE = os.getenv('VOICE_STORAGE_MODE', 'eager')
+VOICE_CACHE_DIR = os.getenv('VOICE_CACHE_DIR', str(BASE_DIR / 'voice_cache'))
+VOICE_CACHE_MAX_BYTES = int(os.getenv('VOICE_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+# Seconds a cached voice is safe from eviction after it was last played, and after which an
+# unfinished *.part download is treated as abandoned
+VOICE_CACHE_GRACE = int(os.getenv('VOICE_CACHE_GRACE', '300'))
+# Who sends protected media once a view has checked permissions: 'django', 'nginx'
+# (X-Accel-Redirect to FILE_ACCEL_REDIRECT_PREFIX + file name; map it to MEDIA_ROOT as an
+# internal location) or 'sendfile' (X-Sendfile with the absolute path, Apache/lighttpd)
+FILE_SERVING_BACKEND = os.getenv('FILE_SERVING_BACKEND', 'django')
+FILE_ACCEL_REDIRECT_PREFIX = os.getenv('FILE_ACCEL_REDIRECT_PREFIX', '/protected-media/')
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/stable/ref/settings/#default-auto-field
@@ -130,6 +200,60 @@ CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 minutes
 CELERY_TASK_SOFT_TIME_LIMIT = 25 * 60  # 25 minutes
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
 
+# Daily reminders are split into chunks of this many student ids, one subtask each
+REMINDER_CHUNK_SIZE = int(os.getenv('REMINDER_CHUNK_SIZE', '500'))
+# Worker processes expected to run chunks at once; they share TELEGRAM_BROADCAST_RATE
+REMINDER_FANOUT_WORKERS = int(os.getenv('REMINDER_FANOUT_WORKERS', '4'))
+
+# Telegram
+# Private chat/channel the bot may post to; used to obtain file_ids for books added via the admin
+TELEGRAM_STORAGE_CHAT_ID = os.getenv('TELEGRAM_STORAGE_CHAT_ID')
+# Bulk notifications: Telegram allows roughly 30 messages/sec per bot
+TELEGRAM_BROADCAST_RATE = float(os.getenv('TELEGRAM_BROADCAST_RATE', '30'))
+TELEGRAM_BROADCAST_CONCURRENCY = int(os.getenv('TELEGRAM_BROADCAST_CONCURRENCY', '20'))
+
+# Bot conversation (FSM) storage: 'redis' for production/several bot processes, 'memory' for development
+BOT_FSM_STORAGE = os.getenv('BOT_FSM_STORAGE', 'memory' if DEBUG else 'redis')
+BOT_FSM_REDIS_URL = os.getenv('BOT_FSM_REDIS_URL', CELERY_BROKER_URL)
+BOT_FSM_STATE_TTL = int(os.getenv('BOT_FSM_STATE_TTL', str(24 * 60 * 60)))
+BOT_FSM_DATA_TTL = int(os.getenv('BOT_FSM_DATA_TTL', str(24 * 60 * 60)))
+# Per-process cache of the CustomUser behind each Telegram id
+BOT_USER_CACHE_SIZE = int(os.getenv('BOT_USER_CACHE_SIZE', '5000'))
+BOT_USER_CACHE_TTL = int(os.getenv('BOT_USER_CACHE_TTL', '60'))
+# Threads for blocking bot work (file storage writes) kept off the ORM's thread
+BOT_BLOCKING_WORKERS = int(os.getenv('BOT_BLOCKING_WORKERS', '8'))
+# Threads that hash login passwords; more than the CPU count only adds contention
+BOT_PASSWORD_WORKERS = int(os.getenv('BOT_PASSWORD_WORKERS', str(min(4, os.cpu_count() or 1))))
+# Failed logins allowed per Telegram user within the window before further attempts are refused unhashed
+BOT_LOGIN_MAX_FAILURES = int(os.getenv('BOT_LOGIN_MAX_FAILURES', '5'))
+BOT_LOGIN_FAILURE_WINDOW = int(os.getenv('BOT_LOGIN_FAILURE_WINDOW', str(15 * 60)))
+# Books per page in the student reading menu
+BOT_BOOK_MENU_PAGE_SIZE = int(os.getenv('BOT_BOOK_MENU_PAGE_SIZE', '8'))
+# Weekly/monthly pages-read leaderboards per class and branch (bot.leaderboards): 'redis' sorted sets
+# shared by every process, or 'memory' for a single development process
+LEADERBOARD_BACKEND = os.getenv('LEADERBOARD_BACKEND', 'memory' if DEBUG else 'redis')
+LEADERBOARD_REDIS_URL = os.getenv('LEADERBOARD_REDIS_URL', CELERY_BROKER_URL)
+LEADERBOARD_SIZE = int(os.getenv('LEADERBOARD_SIZE', '10'))
+# Background copying of submitted videos/voices from Telegram into storage (bot.bot.media_queue)
+BOT_MEDIA_QUEUE_SIZE = int(os.getenv('BOT_MEDIA_QUEUE_SIZE', '200'))
+BOT_MEDIA_WORKERS = int(os.getenv('BOT_MEDIA_WORKERS', '4'))
+BOT_MEDIA_MAX_ATTEMPTS = int(os.getenv('BOT_MEDIA_MAX_ATTEMPTS', '5'))
+BOT_MEDIA_RETRY_DELAY = float(os.getenv('BOT_MEDIA_RETRY_DELAY', '2'))  # seconds, doubled after each failure
+# A worker's claim on a row expires after BOT_MEDIA_LEASE seconds (e.g. its process died), and every
+# BOT_MEDIA_SWEEP_INTERVAL seconds each process queues the unclaimed and expired rows again
+BOT_MEDIA_LEASE = int(os.getenv('BOT_MEDIA_LEASE', '600'))
+BOT_MEDIA_SWEEP_INTERVAL = int(os.getenv('BOT_MEDIA_SWEEP_INTERVAL', '60'))
+
+# Webhook mode (manage.py runbot --webhook)
+BOT_WEBHOOK_URL = os.getenv('BOT_WEBHOOK_URL')  # public base URL; the webhook is registered on startup when set
+BOT_WEBHOOK_PATH = os.getenv('BOT_WEBHOOK_PATH', '/telegram/webhook/')
+BOT_WEBHOOK_SECRET = os.getenv('BOT_WEBHOOK_SECRET')
+BOT_WEBHOOK_HOST = os.getenv('BOT_WEBHOOK_HOST', '0.0.0.0')
+BOT_WEBHOOK_PORT = int(os.getenv('BOT_WEBHOOK_PORT', '8080'))
+BOT_WEBHOOK_QUEUE_SIZE = int(os.getenv('BOT_WEBHOOK_QUEUE_SIZE', '1000'))
+BOT_WEBHOOK_WORKERS = int(os.getenv('BOT_WEBHOOK_WORKERS', '16'))
+BOT_UPDATE_DEDUP_TTL = int(os.getenv('BOT_UPDATE_DEDUP_TTL', str(60 * 60)))
+
 # Security settings
 SECURE_SSL_REDIRECT = not DEBUG
 SECURE_HSTS_SECONDS = 31536000 if not DEBUG else 0